@@ -0,0 +1,2 @@
+from .pool import get_async_Pool, destroy_async_Pool
+from .base import execute_read_query, execute_write_query, stream_rows
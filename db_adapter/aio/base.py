@@ -0,0 +1,138 @@
+import time
+import traceback
+
+from db_adapter.logger import logger
+from db_adapter.base.bulk_writer import WriteStats
+from db_adapter.base.columnar import rows_to_return_type
+from db_adapter.aio.pool import aiomysql
+
+
+async def execute_read_query(pool, query, params):
+    """
+    :param pool: aiomysql connection pool
+    :param query: sql query with wild cards
+    :param params: tuple, parameters need to be passed in to the sql query
+    :return: list of dict rows, None if there are no rows
+    """
+
+    async with pool.acquire() as connection:
+        try:
+            async with connection.cursor() as cursor:
+                row_count = await cursor.execute(query, params)
+                if row_count > 0:
+                    return await cursor.fetchall()
+            return None
+        except Exception as exception:
+            error_message = "Executing sql query {} with params {} failed".format(query, params)
+            logger.error(error_message)
+            traceback.print_exc()
+            raise exception
+
+
+async def execute_write_query(pool, query, params):
+    """
+    :param pool: aiomysql connection pool
+    :param query: sql query with wild cards
+    :param params: tuple, parameters need to be passed in to the sql query
+    :return: affected row count
+    """
+
+    async with pool.acquire() as connection:
+        try:
+            async with connection.cursor() as cursor:
+                row_count = await cursor.execute(query, params)
+            await connection.commit()
+            return row_count
+        except Exception as exception:
+            await connection.rollback()
+            error_message = "Executing sql query {} with params {} failed".format(query, params)
+            logger.error(error_message)
+            traceback.print_exc()
+            raise exception
+
+
+async def fetch_one_value(pool, query, params, column):
+    """
+    :return: value of the given column of the first row, None if there are no rows
+    """
+
+    async with pool.acquire() as connection:
+        async with connection.cursor() as cursor:
+            row_count = await cursor.execute(query, params)
+            if row_count > 0:
+                return (await cursor.fetchone())[column]
+            return None
+
+
+async def fetch_timeseries(connection, query, params, return_type):
+    """
+    Run a (time, value) query on a tuple cursor and return the rows in the requested ReturnType
+    """
+
+    async with connection.cursor(aiomysql.Cursor) as cursor:
+        await cursor.execute(query, params)
+        return rows_to_return_type(await cursor.fetchall(), return_type)
+
+
+async def write_rows(connection, writer, rows, commit=True):
+    """
+    Async counterpart of BulkWriter.write: send the multi-row statements of the writer on an aiomysql connection
+    :param connection: aiomysql connection (rolling back on failure is left to the caller)
+    :param writer: db_adapter.base.BulkWriter
+    :param rows: list of rows
+    :param commit: if False nothing is committed (the caller owns the transaction and must have begun it, as
+    pool connections are in autocommit mode), else the rows are written in one transaction, or in one per batch
+    if writer.commit_per_batch
+    :return: WriteStats
+    """
+
+    stats = WriteStats()
+    start = time.perf_counter()
+
+    if commit and not writer.commit_per_batch:
+        await connection.begin()
+
+    async with connection.cursor() as cursor:
+        for sql_statement, params, batch_row_count in writer.iter_batches(rows):
+            stats.row_count += await cursor.execute(sql_statement, params)
+            stats.rows_sent += batch_row_count
+            stats.batch_count += 1
+
+            if commit and writer.commit_per_batch:
+                await connection.commit()
+
+    if commit and not writer.commit_per_batch:
+        await connection.commit()
+
+    stats.elapsed = time.perf_counter() - start
+    return stats
+
+
+async def stream_rows(pool, query, params, block_size=None, as_dict=True, fetch_size=1000):
+    """
+    Async counterpart of execute_streaming_read_query: stream rows through an unbuffered (server side) cursor
+    :param block_size: if given yield lists of up to block_size rows, else yield rows one by one
+    :param as_dict: if True rows are dicts, else tuples
+    :return: async generator of rows (or blocks of rows)
+    """
+
+    cursor_class = aiomysql.SSDictCursor if as_dict else aiomysql.SSCursor
+
+    async with pool.acquire() as connection:
+        try:
+            async with connection.cursor(cursor_class) as cursor:
+                await cursor.execute(query, params)
+                while True:
+                    rows = await cursor.fetchmany(block_size or fetch_size)
+                    if not rows:
+                        break
+                    if block_size:
+                        yield list(rows)
+                    else:
+                        for row in rows:
+                            yield row
+        except Exception as exception:
+            error_message = "Streaming sql query {} with params {} failed".format(query, params)
+            logger.error(error_message)
+            traceback.print_exc()
+            raise exception
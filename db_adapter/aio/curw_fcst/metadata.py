@@ -0,0 +1,134 @@
+from db_adapter.base.lookup_cache import cached_async_lookup
+from db_adapter.aio.base import execute_read_query, fetch_one_value
+from db_adapter.curw_fcst.station.station_utils import station_cache
+from db_adapter.curw_fcst.source.source_utils import source_cache
+from db_adapter.curw_fcst.variable.variable_utils import variable_cache
+from db_adapter.curw_fcst.unit.unit_utils import unit_cache
+
+"""
+Async counterparts of the curw_fcst station, source, variable and unit lookups.
+Results share the lookup caches of the synchronous utils.
+"""
+
+
+async def _get_by_id(pool, table, id_):
+
+    rows = await execute_read_query(pool, "SELECT * FROM `{}` WHERE `id`=%s".format(table), id_)
+    return rows[0] if rows else None
+
+
+async def get_station_by_id(pool, id_):
+    """
+    Retrieve station by id
+    :param pool: aiomysql connection pool
+    :param id_: station id
+    :return: Station if the stations exists in the database, else None
+    """
+    return await _get_by_id(pool, 'station', id_)
+
+
+@cached_async_lookup(station_cache)
+async def get_station_id(pool, latitude, longitude, station_type) -> str:
+    """
+    Retrieve station id
+    :param pool: aiomysql connection pool
+    :param latitude:
+    :param longitude:
+    :param station_type: StationEnum: which defines the station type
+    such as 'CUrW', 'WRF'
+    :return: str: station id, if station exists in the db, else None
+    """
+
+    initial_value = str(station_type.value)
+
+    if len(initial_value) == 6:
+        pattern = "{}_____".format(initial_value[0])
+    elif len(initial_value) == 7:
+        pattern = "{}{}_____".format(initial_value[0], initial_value[1])
+
+    sql_statement = "SELECT `id` FROM `station` WHERE `id` like %s and `latitude`=%s and `longitude`=%s"
+    return await fetch_one_value(pool, sql_statement, (pattern, latitude, longitude), 'id')
+
+
+async def get_source_by_id(pool, id_):
+    """
+    Retrieve source by id
+    :param pool: aiomysql connection pool
+    :param id_: source id
+    :return: Source if source exists in the database, else None
+    """
+    return await _get_by_id(pool, 'source', id_)
+
+
+@cached_async_lookup(source_cache)
+async def get_source_id(pool, model, version) -> str:
+    """
+    Retrieve Source id
+    :param pool: aiomysql connection pool
+    :param model:
+    :param version:
+    :return: str: source id if source exists in the database, else None
+    """
+
+    sql_statement = "SELECT `id` FROM `source` WHERE `model`=%s and `version`=%s"
+    return await fetch_one_value(pool, sql_statement, (model, version), 'id')
+
+
+@cached_async_lookup(source_cache)
+async def get_source_parameters(pool, model, version):
+    """
+    Retrieve Source parameters
+    :param pool: aiomysql connection pool
+    :param model:
+    :param version:
+    :return: str: json object parameters if source exists in the database, else None
+    """
+
+    sql_statement = "SELECT `parameters` FROM `source` WHERE `model`=%s and `version`=%s"
+    return await fetch_one_value(pool, sql_statement, (model, version), 'parameters')
+
+
+async def get_variable_by_id(pool, id_):
+    """
+    Retrieve variable by id
+    :param pool: aiomysql connection pool
+    :param id_: variable id
+    :return: Variable if variable exists in the database, else None
+    """
+    return await _get_by_id(pool, 'variable', id_)
+
+
+@cached_async_lookup(variable_cache)
+async def get_variable_id(pool, variable) -> str:
+    """
+    Retrieve Variable id
+    :param pool: aiomysql connection pool
+    :param variable:
+    :return: str: variable id if variable exists in the db, else None
+    """
+
+    return await fetch_one_value(pool, "SELECT `id` FROM `variable` WHERE `variable`=%s", variable, 'id')
+
+
+async def get_unit_by_id(pool, id_):
+    """
+    Retrieve unit by id
+    :param pool: aiomysql connection pool
+    :param id_: unit id
+    :return: Unit if unit exists in the db, else None
+    """
+    return await _get_by_id(pool, 'unit', id_)
+
+
+@cached_async_lookup(unit_cache)
+async def get_unit_id(pool, unit, unit_type) -> str:
+    """
+    Retrieve Unit id
+    :param pool: aiomysql connection pool
+    :param unit:
+    :param unit_type: UnitType enum value. This value can be any of {Accumulative, Instantaneous, Mean} set
+    :return: str: unit id if unit exists in the db, else None
+    """
+
+    sql_statement = "SELECT `id` FROM `unit` WHERE `unit`=%s and `type`=%s"
+    return await fetch_one_value(pool, sql_statement, (unit, unit_type.value), 'id')
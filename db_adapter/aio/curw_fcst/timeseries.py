@@ -0,0 +1,283 @@
+import traceback
+from datetime import datetime
+
+from db_adapter.logger import logger
+from db_adapter.constants import COMMON_DATE_TIME_FORMAT
+from db_adapter.base.bulk_writer import BulkWriter, WriteMode
+from db_adapter.base.columnar import ReturnType
+from db_adapter.curw_fcst.timeseries import Timeseries as SyncTimeseries
+from db_adapter.aio.base import fetch_one_value, fetch_timeseries, write_rows, stream_rows
+
+
+class Timeseries:
+    """
+    asyncio counterpart of db_adapter.curw_fcst.timeseries.Timeseries, on an aiomysql pool (see get_async_Pool)
+    """
+
+    generate_timeseries_id = staticmethod(SyncTimeseries.generate_timeseries_id)
+    generate_timeseries_ids = staticmethod(SyncTimeseries.generate_timeseries_ids)
+
+    def __init__(self, pool, run_id_index=None):
+        """
+        :param pool: aiomysql connection pool
+        :param run_id_index: optional, loaded RunIdIndex of the run table (lookups it can not answer from memory
+        fall back to an async query)
+        """
+        self.pool = pool
+        self.run_id_index = run_id_index
+
+    async def get_timeseries_id_if_exists(self, meta_data):
+        """
+        Check whether a timeseries id exists in the database for a given set of meta data
+        :param meta_data: Dict with 'sim_tag', 'latitude', 'longitude', 'model', 'version', 'variable',
+        'unit', 'unit_type' keys
+        :return: timeseries id if exist else None
+        """
+        event_id = self.generate_timeseries_id(meta_data)
+        return event_id if await self.is_id_exists(event_id) else None
+
+    async def is_id_exists(self, id_):
+        """
+        Check whether a given timeseries id exists in the database
+        :param id_:
+        :return: True, if id is in the database, False otherwise
+        """
+        if self.run_id_index is not None:
+            # answered from memory only, loading the index or confirming a bloom filter hit would block the loop
+            exists = self.run_id_index.contains_local(id_)
+            if exists is not None:
+                return exists
+
+        return await fetch_one_value(self.pool, "SELECT 1 AS `exists` FROM `run` WHERE `id`=%s", id_,
+                'exists') is not None
+
+    async def insert_run(self, run_meta):
+        """
+        Insert new run entry
+        :param run_meta: dictionary like
+        {
+            'tms_id'  : '',
+            'sim_tag' : '',
+            'start_date': '',
+            'end_date': '',
+            'station_id'  : '',
+            'source_id' : '',
+            'unit_id'     : '',
+            'variable_id': ''
+        }
+        :return: timeseries id if insertion was successful, else raise the exception
+        """
+
+        async with self.pool.acquire() as connection:
+            try:
+                async with connection.cursor() as cursor:
+                    sql_statement = "INSERT INTO `run` (`id`, `sim_tag`, `start_date`, `end_date`, `station`, " \
+                                    "`source`, `variable`, `unit`) " \
+                                    "VALUES ( %s, %s, %s, %s, %s, %s, %s, %s)"
+                    await cursor.execute(sql_statement, (run_meta.get('tms_id'), run_meta.get('sim_tag'),
+                            run_meta.get('start_date'), run_meta.get('end_date'), run_meta.get('station_id'),
+                            run_meta.get('source_id'), run_meta.get('variable_id'), run_meta.get('unit_id')))
+                await connection.commit()
+                if self.run_id_index is not None:
+                    self.run_id_index.add(run_meta.get('tms_id'))
+                return run_meta.get('tms_id')
+            except Exception as exception:
+                await connection.rollback()
+                error_message = "Insertion failed for run entry with tms_id={}, sim_tag={}, station_id={}, " \
+                                "source_id={}, variable_id={}, unit_id={}" \
+                    .format(run_meta.get('tms_id'), run_meta.get('sim_tag'), run_meta.get('station_id'),
+                        run_meta.get('source_id'), run_meta.get('variable_id'), run_meta.get('unit_id'))
+                logger.error(error_message)
+                traceback.print_exc()
+                raise exception
+
+    async def insert_formatted_data(self, timeseries, upsert=False, batch_size=None, commit_per_batch=False):
+        """
+        Insert timeseries to Data table in the database
+        :param timeseries: list of [tms_id, time, fgt, value] lists
+        :param boolean upsert: If True, upsert existing values ON DUPLICATE KEY. Default is False.
+        :param batch_size: number of rows per multi-row INSERT statement (default DEFAULT_BATCH_SIZE)
+        :param commit_per_batch: if True commit after every batch, else commit once after all the rows are written
+        :return: row count if insertion was successful, else raise the exception
+        """
+
+        writer = BulkWriter(table='data', columns=('id', 'time', 'fgt', 'value'),
+                mode=WriteMode.UPSERT if upsert else WriteMode.INSERT, batch_size=batch_size,
+                commit_per_batch=commit_per_batch)
+
+        async with self.pool.acquire() as connection:
+            try:
+                return (await write_rows(connection, writer, timeseries)).row_count
+            except Exception as exception:
+                await connection.rollback()
+                error_message = "Data insertion to data table for tms id {}, upsert={} failed."\
+                    .format(timeseries[0][0], upsert)
+                logger.error(error_message)
+                traceback.print_exc()
+                raise exception
+
+    async def insert_data(self, timeseries, tms_id, fgt, upsert=False, batch_size=None, commit_per_batch=False):
+        """
+        Insert timeseries to Data table in the database
+        :param tms_id: hash value
+        :param fgt: forecast generated time
+        :param timeseries: list of [time, value] lists
+        :param boolean upsert: If True, upsert existing values ON DUPLICATE KEY. Default is False.
+        :return: row count if insertion was successful, else raise the exception
+        """
+
+        new_timeseries = []
+        for t in timeseries:
+            if len(t) > 1:
+                new_timeseries.append([tms_id, t[0], fgt, t[1]])
+            else:
+                logger.warning('Invalid timeseries data:: %s', t)
+
+        return await self.insert_formatted_data(new_timeseries, upsert=upsert, batch_size=batch_size,
+                commit_per_batch=commit_per_batch)
+
+    async def _update_run_date(self, id_, column, date, later):
+
+        if type(date) is str:
+            date = datetime.strptime(date, COMMON_DATE_TIME_FORMAT)
+
+        if later:
+            sql_statement = "UPDATE `run` SET `{0}`=%s WHERE `id`=%s AND (`{0}` IS NULL OR `{0}` < %s)".format(column)
+        else:
+            sql_statement = "UPDATE `run` SET `{0}`=%s WHERE `id`=%s AND (`{0}` IS NULL OR `{0}` > %s)".format(column)
+
+        async with self.pool.acquire() as connection:
+            try:
+                async with connection.cursor() as cursor:
+                    await cursor.execute(sql_statement, (date, id_, date))
+                await connection.commit()
+            except Exception as exception:
+                await connection.rollback()
+                error_message = "Updating {} for id={} failed.".format(column, id_)
+                logger.error(error_message)
+                traceback.print_exc()
+                raise exception
+
+    async def update_latest_fgt(self, id_, fgt):
+        """
+        Update fgt for inserted timeseries, if new fgt is latest date than the existing
+        :param id_: timeseries id
+        """
+        await self._update_run_date(id_, 'end_date', fgt, later=True)
+
+    async def update_start_date(self, id_, start_date):
+        """
+        Update (very first fgt) start_date for inserted timeseries, if new start_date is earlier than the existing
+        :param id_: timeseries id
+        """
+        await self._update_run_date(id_, 'start_date', start_date, later=False)
+
+    async def get_latest_fgt(self, id_):
+        """
+        Retrieve latest fgt for given id
+        :param id_: timeseries id
+        :return: latest fgt, None if the id does not exist
+        """
+        return await fetch_one_value(self.pool, "SELECT `end_date` FROM `run` WHERE `id`=%s", id_, 'end_date')
+
+    async def get_latest_timeseries(self, sim_tag, station_id, source_id, variable_id, unit_id, start=None,
+                                    return_type=ReturnType.LIST):
+        """
+        Retrieve the latest fcst timeseries available for the given parameters
+        :param start: expected beginning of the timeseries
+        :param return_type: ReturnType
+        :return: list of [time, value] lists ((times, values) arrays or DataFrame for the ARRAYS and DATAFRAME
+        return types), None if there is no such timeseries
+        """
+
+        async with self.pool.acquire() as connection:
+            try:
+                async with connection.cursor() as cursor:
+                    sql_statement = "SELECT `id`, `end_date` FROM `run` WHERE `source`=%s AND `station`=%s " \
+                                    "AND `sim_tag`=%s AND `variable`=%s AND `unit`=%s;"
+                    is_exist = await cursor.execute(sql_statement,
+                            (source_id, station_id, sim_tag, variable_id, unit_id))
+                    if is_exist == 0:
+                        return None
+                    meta_data = await cursor.fetchone()
+
+                if start:
+                    sql_statement = "SELECT `time`, `value` FROM `data` WHERE `id`=%s AND `fgt`=%s AND `time` >= %s;"
+                    sql_values = (meta_data.get('id'), meta_data.get('end_date'), start)
+                else:
+                    sql_statement = "SELECT `time`, `value` FROM `data` WHERE `id`=%s AND `fgt`=%s;"
+                    sql_values = (meta_data.get('id'), meta_data.get('end_date'))
+
+                return await fetch_timeseries(connection, sql_statement, sql_values, return_type)
+            except Exception as exception:
+                error_message = "Retrieving latest timeseries failed."
+                logger.error(error_message)
+                traceback.print_exc()
+                raise exception
+
+    async def get_timeseries(self, id_, fgt, start=None, end=None, return_type=ReturnType.LIST):
+        """
+        Retrieve the timeseries of a given id and fgt
+        :param start: optional, inclusive lower bound of time
+        :param end: optional, inclusive upper bound of time
+        :param return_type: ReturnType
+        :return: list of [time, value] lists ((times, values) arrays or DataFrame for the ARRAYS and DATAFRAME
+        return types)
+        """
+
+        sql_statement = "SELECT `time`, `value` FROM `data` WHERE `id`=%s AND `fgt`=%s"
+        sql_values = [id_, fgt]
+        if start is not None:
+            sql_statement += " AND `time` >= %s"
+            sql_values.append(start)
+        if end is not None:
+            sql_statement += " AND `time` <= %s"
+            sql_values.append(end)
+        sql_statement += " ORDER BY `time`;"
+
+        async with self.pool.acquire() as connection:
+            try:
+                return await fetch_timeseries(connection, sql_statement, sql_values, return_type)
+            except Exception as exception:
+                error_message = "Retrieving timeseries for id={}, fgt={} failed.".format(id_, fgt)
+                logger.error(error_message)
+                traceback.print_exc()
+                raise exception
+
+    def stream_timeseries(self, id_, fgt, start=None, end=None, block_size=None):
+        """
+        Stream the (time, value) tuples of a given id and fgt, ordered by time, through a server side cursor
+        :param block_size: if given yield lists of up to block_size tuples, else yield tuples one by one
+        :return: async generator
+        """
+
+        sql_statement = "SELECT `time`, `value` FROM `data` WHERE `id`=%s AND `fgt`=%s"
+        sql_values = [id_, fgt]
+        if start is not None:
+            sql_statement += " AND `time` >= %s"
+            sql_values.append(start)
+        if end is not None:
+            sql_statement += " AND `time` <= %s"
+            sql_values.append(end)
+        sql_statement += " ORDER BY `time`"
+
+        return stream_rows(self.pool, sql_statement, sql_values, block_size=block_size, as_dict=False)
+
+    async def delete_timeseries(self, id_, fgt):
+        """
+        Delete the timeseries of a given id and fgt
+        :return: number of rows deleted
+        """
+
+        async with self.pool.acquire() as connection:
+            try:
+                async with connection.cursor() as cursor:
+                    row_count = await cursor.execute("DELETE FROM `data` WHERE `id`=%s AND `fgt`=%s", (id_, fgt))
+                await connection.commit()
+                return row_count
+            except Exception as exception:
+                await connection.rollback()
+                error_message = "Deleting timeseries for id={} and fgt={} failed.".format(id_, fgt)
+                logger.error(error_message)
+                traceback.print_exc()
+                raise exception
@@ -0,0 +1,3 @@
+from .timeseries import Timeseries
+from .metadata import get_station_id, get_station_by_id, get_source_id, get_source_by_id, get_variable_id, \
+    get_variable_by_id, get_unit_id, get_unit_by_id
@@ -0,0 +1,121 @@
+from db_adapter.base.lookup_cache import cached_async_lookup
+from db_adapter.aio.base import execute_read_query, fetch_one_value
+from db_adapter.curw_obs.station.station_enum import StationEnum
+from db_adapter.curw_obs.station.station_utils import station_cache
+from db_adapter.curw_obs.source.source_utils import source_cache
+from db_adapter.curw_obs.variable.variable_utils import variable_cache
+from db_adapter.curw_obs.unit.unit_utils import unit_cache
+
+"""
+Async counterparts of the curw_obs station, source, variable and unit lookups.
+Results share the lookup caches of the synchronous utils.
+"""
+
+
+async def _get_by_id(pool, table, id_):
+
+    rows = await execute_read_query(pool, "SELECT * FROM `{}` WHERE `id`=%s".format(table), id_)
+    return rows[0] if rows else None
+
+
+async def get_station_by_id(pool, id_):
+    """
+    Retrieve station by id
+    :param pool: aiomysql connection pool
+    :param id_: station id
+    :return: Station if the stations exists in the database, else None
+    """
+    return await _get_by_id(pool, 'station', id_)
+
+
+@cached_async_lookup(station_cache)
+async def get_station_id(pool, latitude, longitude, station_type) -> str:
+    """
+    Retrieve station id
+    :param pool: aiomysql connection pool
+    :param latitude:
+    :param longitude:
+    :param station_type: StationEnum: which defines the station type
+    such as 'CUrW', 'WRF'
+    :return: str: station id, if station exists in the db, else None
+    """
+
+    initial_value = str(station_type.value)
+
+    if len(initial_value) == 6:
+        pattern = "{}_____".format(initial_value[0])
+    elif len(initial_value) == 7:
+        pattern = "{}{}_____".format(initial_value[0], initial_value[1])
+
+    sql_statement = "SELECT `id` FROM `station` WHERE `id` like %s and `latitude`=%s and `longitude`=%s " \
+                    "and `station_type`=%s;"
+    return await fetch_one_value(pool, sql_statement,
+            (pattern, latitude, longitude, StationEnum.getTypeString(station_type)), 'id')
+
+
+async def get_source_by_id(pool, id_):
+    """
+    Retrieve source by id
+    :param pool: aiomysql connection pool
+    :param id_: source id
+    :return: Source if source exists in the database, else None
+    """
+    return await _get_by_id(pool, 'source', id_)
+
+
+@cached_async_lookup(source_cache)
+async def get_source_id(pool, source) -> str:
+    """
+    Retrieve Source id
+    :param pool: aiomysql connection pool
+    :param source:
+    :return: str: source id if source exists in the database, else None
+    """
+
+    return await fetch_one_value(pool, "SELECT `id` FROM `source` WHERE `source`=%s", source, 'id')
+
+
+async def get_variable_by_id(pool, id_):
+    """
+    Retrieve variable by id
+    :param pool: aiomysql connection pool
+    :param id_: variable id
+    :return: Variable if variable exists in the db, else None
+    """
+    return await _get_by_id(pool, 'variable', id_)
+
+
+@cached_async_lookup(variable_cache)
+async def get_variable_id(pool, variable) -> str:
+    """
+    Retrieve Variable id
+    :param pool: aiomysql connection pool
+    :param variable:
+    :return: str: variable id if variable exists in the db, else None
+    """
+
+    return await fetch_one_value(pool, "SELECT `id` FROM `variable` WHERE `variable`=%s", variable, 'id')
+
+
+async def get_unit_by_id(pool, id_):
+    """
+    Retrieve unit by id
+    :param pool: aiomysql connection pool
+    :param id_: unit id
+    :return: Unit if unit exists in the db, else None
+    """
+    return await _get_by_id(pool, 'unit', id_)
+
+
+@cached_async_lookup(unit_cache)
+async def get_unit_id(pool, unit, unit_type) -> str:
+    """
+    Retrieve Unit id
+    :param pool: aiomysql connection pool
+    :param unit:
+    :param unit_type: UnitType enum value. This value can be any of {Accumulative, Instantaneous, Mean} set
+    :return: str: unit id if unit exists in the db, else None
+    """
+
+    sql_statement = "SELECT `id` FROM `unit` WHERE `unit`=%s and `type`=%s"
+    return await fetch_one_value(pool, sql_statement, (unit, unit_type.value), 'id')
@@ -0,0 +1,205 @@
+import traceback
+from datetime import datetime
+
+from db_adapter.logger import logger
+from db_adapter.constants import COMMON_DATE_TIME_FORMAT
+from db_adapter.base.bulk_writer import BulkWriter, WriteMode
+from db_adapter.base.columnar import ReturnType
+from db_adapter.curw_obs.timeseries import Timeseries as SyncTimeseries
+from db_adapter.aio.base import fetch_one_value, fetch_timeseries, write_rows, stream_rows
+
+
+def _time_range_query(id_, start, end):
+
+    condition_list = ["`id`=%s"]
+    variable_list = [id_]
+
+    if start is not None:
+        condition_list.append("`time`>=%s")
+        variable_list.append(start)
+    if end is not None:
+        condition_list.append("`time`<=%s")
+        variable_list.append(end)
+
+    return "SELECT `time`, `value` FROM `data` WHERE " + " AND ".join(condition_list) + " ORDER BY `time`", \
+        tuple(variable_list)
+
+
+class Timeseries:
+    """
+    asyncio counterpart of db_adapter.curw_obs.timeseries.Timeseries, on an aiomysql pool (see get_async_Pool)
+    """
+
+    generate_timeseries_id = staticmethod(SyncTimeseries.generate_timeseries_id)
+    generate_timeseries_ids = staticmethod(SyncTimeseries.generate_timeseries_ids)
+
+    def __init__(self, pool, run_id_index=None):
+        """
+        :param pool: aiomysql connection pool
+        :param run_id_index: optional, loaded RunIdIndex of the run table (lookups it can not answer from memory
+        fall back to an async query)
+        """
+        self.pool = pool
+        self.run_id_index = run_id_index
+
+    async def get_timeseries_id_if_exists(self, meta_data):
+        """
+        Check whether a timeseries id exists in the database for a given set of meta data
+        :param meta_data: Dict with 'latitude', 'longitude', 'station_type', 'variable', 'unit', 'unit_type' keys
+        :return: timeseries id if exist else None
+        """
+        event_id = self.generate_timeseries_id(meta_data)
+        return event_id if await self.is_id_exists(event_id) else None
+
+    async def is_id_exists(self, id_):
+        """
+        Check whether a given timeseries id exists in the database
+        :param id_:
+        :return: True, if id is in the database, False otherwise
+        """
+        if self.run_id_index is not None:
+            # answered from memory only, loading the index or confirming a bloom filter hit would block the loop
+            exists = self.run_id_index.contains_local(id_)
+            if exists is not None:
+                return exists
+
+        return await fetch_one_value(self.pool, "SELECT 1 AS `exists` FROM `run` WHERE `id`=%s", id_,
+                'exists') is not None
+
+    async def insert_run(self, run_meta):
+        """
+        Insert new run entry
+        :param run_meta: dictionary like
+        {
+            'tms_id'  : '',
+            'station_id'  : '',
+            'unit_id'     : '',
+            'variable_id': ''
+        }
+        :return: timeseries id if insertion was successful, else raise the exception
+        """
+
+        async with self.pool.acquire() as connection:
+            try:
+                async with connection.cursor() as cursor:
+                    sql_statement = "INSERT INTO `run` (`id`, `station`, `variable`, `unit`) " \
+                                    "VALUES ( %s, %s, %s, %s)"
+                    await cursor.execute(sql_statement, (run_meta.get('tms_id'), run_meta.get('station_id'),
+                            run_meta.get('variable_id'), run_meta.get('unit_id')))
+                await connection.commit()
+                if self.run_id_index is not None:
+                    self.run_id_index.add(run_meta.get('tms_id'))
+                return run_meta.get('tms_id')
+            except Exception as exception:
+                await connection.rollback()
+                error_message = "Insertion failed for run entry with tms_id={}, station_id={}, " \
+                                " variable_id={}, unit_id={}" \
+                    .format(run_meta.get('tms_id'), run_meta.get('station_id'), run_meta.get('variable_id'),
+                        run_meta.get('unit_id'))
+                logger.error(error_message)
+                traceback.print_exc()
+                raise exception
+
+    async def insert_data(self, timeseries, upsert=False, batch_size=None, commit_per_batch=False):
+        """
+        Insert timeseries to Data table in the database
+        :param timeseries: list of [tms_id, time, value] lists
+        :param boolean upsert: If True, upsert existing values ON DUPLICATE KEY. Default is False.
+        :param batch_size: number of rows per multi-row INSERT statement (default DEFAULT_BATCH_SIZE)
+        :param commit_per_batch: if True commit after every batch, else commit once after all the rows are written
+        :return: row count if insertion was successful, else raise the exception
+        """
+
+        writer = BulkWriter(table='data', columns=('id', 'time', 'value'),
+                mode=WriteMode.UPSERT if upsert else WriteMode.INSERT, batch_size=batch_size,
+                commit_per_batch=commit_per_batch)
+
+        async with self.pool.acquire() as connection:
+            try:
+                return (await write_rows(connection, writer, timeseries)).row_count
+            except Exception as exception:
+                await connection.rollback()
+                error_message = "Data insertion to data table for tms id {}, upsert={} failed."\
+                    .format(timeseries[0][0], upsert)
+                logger.error(error_message)
+                traceback.print_exc()
+                raise exception
+
+    async def get_end_date(self, id_):
+        """
+        Retrieve end date
+        :param id_: timeseries id
+        :return: end_date
+        """
+        return await fetch_one_value(self.pool, "SELECT `end_date` FROM `run` WHERE `id`=%s", id_, 'end_date')
+
+    async def _update_run_date(self, id_, column, date, later):
+
+        if type(date) is str:
+            date = datetime.strptime(date, COMMON_DATE_TIME_FORMAT)
+
+        if later:
+            sql_statement = "UPDATE `run` SET `{0}`=%s WHERE `id`=%s AND (`{0}` IS NULL OR `{0}` < %s)".format(column)
+        else:
+            sql_statement = "UPDATE `run` SET `{0}`=%s WHERE `id`=%s AND (`{0}` IS NULL OR `{0}` > %s)".format(column)
+
+        async with self.pool.acquire() as connection:
+            try:
+                async with connection.cursor() as cursor:
+                    await cursor.execute(sql_statement, (date, id_, date))
+                await connection.commit()
+                return date
+            except Exception as exception:
+                await connection.rollback()
+                error_message = "Updating {} for id={} failed.".format(column, id_)
+                logger.error(error_message)
+                traceback.print_exc()
+                raise exception
+
+    async def update_end_date(self, id_, end_date):
+        """
+        Update end_date for inserted timeseries, if end date is latest date than the existing one
+        :param id_: timeseries id
+        :return: end_date
+        """
+        return await self._update_run_date(id_, 'end_date', end_date, later=True)
+
+    async def update_start_date(self, id_, start_date):
+        """
+        Update (very first obs date) start_date for inserted timeseries, if start_date is earlier date than the
+        existing one
+        :param id_: timeseries id
+        :return: start_date
+        """
+        return await self._update_run_date(id_, 'start_date', start_date, later=False)
+
+    async def get_timeseries(self, id_, start=None, end=None, return_type=ReturnType.LIST):
+        """
+        Retrieve the timeseries of a given id
+        :param start: start time inclusive (optional)
+        :param end: end time inclusive (optional)
+        :param return_type: ReturnType
+        :return: list of [time, value] lists ((times, values) arrays or DataFrame for the ARRAYS and DATAFRAME
+        return types)
+        """
+
+        sql_statement, sql_values = _time_range_query(id_, start, end)
+
+        async with self.pool.acquire() as connection:
+            try:
+                return await fetch_timeseries(connection, sql_statement, sql_values, return_type)
+            except Exception as exception:
+                error_message = "Retrieving timeseries for id={} failed.".format(id_)
+                logger.error(error_message)
+                traceback.print_exc()
+                raise exception
+
+    def stream_timeseries(self, id_, start=None, end=None, block_size=None):
+        """
+        Stream the (time, value) tuples of a given id, ordered by time, through a server side cursor
+        :param block_size: if given yield lists of up to block_size tuples, else yield tuples one by one
+        :return: async generator
+        """
+
+        sql_statement, sql_values = _time_range_query(id_, start, end)
+        return stream_rows(self.pool, sql_statement, sql_values, block_size=block_size, as_dict=False)
@@ -0,0 +1 @@
+from .timeseries import Timeseries, TideTimeseries, DischargeTimeseries, WaterLevelTimeseries
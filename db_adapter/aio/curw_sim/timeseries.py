@@ -0,0 +1,233 @@
+import traceback
+
+from db_adapter.logger import logger
+from db_adapter.base.bulk_writer import BulkWriter, WriteMode
+from db_adapter.base.columnar import ReturnType
+from db_adapter.curw_sim.timeseries import Timeseries as SyncTimeseries
+from db_adapter.aio.base import fetch_one_value, fetch_timeseries, write_rows, stream_rows
+
+
+class Timeseries:
+    """
+    asyncio counterpart of db_adapter.curw_sim.timeseries.Timeseries, on an aiomysql pool (see get_async_Pool).
+    The tide, discharge and waterlevel counterparts only differ by their run and data tables.
+    """
+
+    RUN_TABLE = 'run'
+    DATA_TABLE = 'data'
+
+    generate_timeseries_id = staticmethod(SyncTimeseries.generate_timeseries_id)
+    generate_timeseries_ids = staticmethod(SyncTimeseries.generate_timeseries_ids)
+
+    def __init__(self, pool, run_id_index=None):
+        """
+        :param pool: aiomysql connection pool
+        :param run_id_index: optional, loaded RunIdIndex of the run table (lookups it can not answer from memory
+        fall back to an async query)
+        """
+        self.pool = pool
+        self.run_id_index = run_id_index
+
+    async def get_timeseries_id_if_exists(self, meta_data):
+        """
+        Check whether a timeseries id exists in the database for a given set of meta data
+        :param meta_data: Dict with 'latitude', 'longitude', 'model', 'method' keys
+        :return: timeseries id if exist else None
+        """
+        event_id = self.generate_timeseries_id(meta_data)
+        return event_id if await self.is_id_exists(event_id) else None
+
+    async def get_timeseries_id(self, grid_id, method):
+        """
+        Retrieve the timeseries id of a given grid_id and method
+        :param grid_id: grid id (e.g.: flo2d_250_954)
+        :param method: value interpolation method
+        :return: timeseries id if exist else None
+        """
+        sql_statement = "SELECT `id` FROM `{}` WHERE `grid_id`=%s AND `method`=%s;".format(self.RUN_TABLE)
+        return await fetch_one_value(self.pool, sql_statement, (grid_id, method), 'id')
+
+    async def is_id_exists(self, id_):
+        """
+        Check whether a given timeseries id exists in the database
+        :param id_:
+        :return: True, if id is in the database, False otherwise
+        """
+        if self.run_id_index is not None:
+            # answered from memory only, loading the index or confirming a bloom filter hit would block the loop
+            exists = self.run_id_index.contains_local(id_)
+            if exists is not None:
+                return exists
+
+        sql_statement = "SELECT 1 AS `exists` FROM `{}` WHERE `id`=%s".format(self.RUN_TABLE)
+        return await fetch_one_value(self.pool, sql_statement, id_, 'exists') is not None
+
+    async def insert_run(self, meta_data):
+        """
+        Insert new run entry
+        :param meta_data: dictionary like
+        meta_data = {
+                'id'       : '',
+                'latitude' : '',
+                'longitude': '',
+                'model'    : '',
+                'method'   : '',
+                'grid_id'  : '',
+                'obs_end'  : ''
+                }
+           grid_id and obs_end keys are optional
+        :return: timeseries id if insertion was successful, else raise the exception
+        """
+
+        columns = ['id', 'latitude', 'longitude', 'model', 'method'] + \
+                  [key for key in ('grid_id', 'obs_end') if key in meta_data.keys()]
+        sql_statement = "INSERT INTO `{}` ({}) VALUES ({})".format(self.RUN_TABLE,
+                ", ".join("`{}`".format(column) for column in columns), ", ".join(["%s"] * len(columns)))
+        run_tuple = tuple(meta_data[column] for column in columns)
+
+        async with self.pool.acquire() as connection:
+            try:
+                async with connection.cursor() as cursor:
+                    await cursor.execute(sql_statement, run_tuple)
+                await connection.commit()
+                if self.run_id_index is not None:
+                    self.run_id_index.add(run_tuple[0])
+                return run_tuple[0]
+            except Exception as exception:
+                await connection.rollback()
+                error_message = "Insertion failed for timeseries with tms_id={}, latitude={}, longitude={}, " \
+                                "model={}, method={}".format(*run_tuple[:5])
+                logger.error(error_message)
+                traceback.print_exc()
+                raise exception
+
+    async def insert_data(self, timeseries, tms_id, upsert=False, batch_size=None, commit_per_batch=False):
+        """
+        Insert timeseries to Data table in the database
+        :param tms_id: hash value
+        :param timeseries: list of [time, value] lists
+        :param boolean upsert: If True, upsert existing values ON DUPLICATE KEY. Default is False.
+        :param batch_size: number of rows per multi-row INSERT statement (default DEFAULT_BATCH_SIZE)
+        :param commit_per_batch: if True commit after every batch, else commit once after all the rows are written
+        :return: row count if insertion was successful, else raise the exception
+        """
+
+        new_timeseries = []
+        for t in timeseries:
+            if len(t) > 1:
+                new_timeseries.append([tms_id, t[0], t[1]])
+            else:
+                logger.warning('Invalid timeseries data:: %s', t)
+
+        writer = BulkWriter(table=self.DATA_TABLE, columns=('id', 'time', 'value'),
+                mode=WriteMode.UPSERT if upsert else WriteMode.INSERT, batch_size=batch_size,
+                commit_per_batch=commit_per_batch)
+
+        async with self.pool.acquire() as connection:
+            try:
+                return (await write_rows(connection, writer, new_timeseries)).row_count
+            except Exception as exception:
+                await connection.rollback()
+                error_message = "Data insertion to {} table for tms id {}, upsert={} failed."\
+                    .format(self.DATA_TABLE, tms_id, upsert)
+                logger.error(error_message)
+                traceback.print_exc()
+                raise exception
+
+    async def update_latest_obs(self, id_, obs_end):
+        """
+        Update obs_end for inserted timeseries
+        :param id_: timeseries id
+        :param obs_end: end time of observations
+        :return: True if update is successful, else raise the exception
+        """
+
+        async with self.pool.acquire() as connection:
+            try:
+                async with connection.cursor() as cursor:
+                    sql_statement = "UPDATE `{}` SET `obs_end`=%s WHERE `id`=%s".format(self.RUN_TABLE)
+                    await cursor.execute(sql_statement, (obs_end, id_))
+                await connection.commit()
+                return True
+            except Exception as exception:
+                await connection.rollback()
+                error_message = "Updating obs_end for id={} failed.".format(id_)
+                logger.error(error_message)
+                traceback.print_exc()
+                raise exception
+
+    async def get_obs_end(self, id_):
+        """
+        Retrieve obs_end for a given hash id
+        :param id_:
+        :return: obs_end if exists, else None
+        """
+        sql_statement = "SELECT `obs_end` FROM `{}` WHERE `id`=%s".format(self.RUN_TABLE)
+        return await fetch_one_value(self.pool, sql_statement, id_, 'obs_end')
+
+    async def get_timeseries(self, id_, start_date, end_date, return_type=ReturnType.LIST):
+        """
+        Retrieve timeseries by id
+        :param id_:
+        :param return_type: ReturnType
+        :return: list of [time, value] pairs ((times, values) arrays or DataFrame for the ARRAYS and DATAFRAME
+        return types)
+        """
+
+        sql_statement = "SELECT `time`,`value` FROM `{}` WHERE `id`=%s AND `time` BETWEEN %s AND %s " \
+                        "ORDER BY `time`;".format(self.DATA_TABLE)
+
+        async with self.pool.acquire() as connection:
+            try:
+                return await fetch_timeseries(connection, sql_statement, (id_, start_date, end_date), return_type)
+            except Exception as exception:
+                error_message = "Retrieving timeseries for id {} failed.".format(id_)
+                logger.error(error_message)
+                traceback.print_exc()
+                raise exception
+
+    def stream_timeseries(self, id_, start_date=None, end_date=None, block_size=None):
+        """
+        Stream the (time, value) tuples of a given id, ordered by time, through a server side cursor
+        :param block_size: if given yield lists of up to block_size tuples, else yield tuples one by one
+        :return: async generator
+        """
+
+        condition_list = ["`id`=%s"]
+        variable_list = [id_]
+
+        if start_date is not None:
+            condition_list.append("`time`>=%s")
+            variable_list.append(start_date)
+        if end_date is not None:
+            condition_list.append("`time`<=%s")
+            variable_list.append(end_date)
+
+        sql_statement = "SELECT `time`, `value` FROM `{}` WHERE ".format(self.DATA_TABLE) + \
+                        " AND ".join(condition_list) + " ORDER BY `time`"
+
+        return stream_rows(self.pool, sql_statement, tuple(variable_list), block_size=block_size, as_dict=False)
+
+    async def get_timeseries_end(self, id_):
+        """
+        Retrieve the last timestamp of a timeseries
+        :param id_:
+        :return: last timestamp if id exists, else None
+        """
+        sql_statement = "SELECT max(`time`) AS `time` FROM `{}` WHERE `id`=%s ;".format(self.DATA_TABLE)
+        return await fetch_one_value(self.pool, sql_statement, id_, 'time')
+
+
+class TideTimeseries(Timeseries):
+    RUN_TABLE = 'tide_run'
+    DATA_TABLE = 'tide_data'
+
+
+class DischargeTimeseries(Timeseries):
+    RUN_TABLE = 'dis_run'
+    DATA_TABLE = 'dis_data'
+
+
+class WaterLevelTimeseries(Timeseries):
+    RUN_TABLE = 'wl_run'
+    DATA_TABLE = 'wl_data'
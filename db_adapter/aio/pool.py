@@ -0,0 +1,42 @@
+try:
+    import aiomysql
+except ImportError:
+    aiomysql = None
+
+from db_adapter.logger import logger
+
+
+def require_aiomysql():
+    if aiomysql is None:
+        raise ImportError("db_adapter.aio requires the aiomysql package. "
+                          "Install it with: pip install db_adapter[async]")
+
+
+async def get_async_Pool(host, port, user, password, db, minsize=1, maxsize=50, pool_recycle=-1, **kwargs):
+    """
+    Create an asyncio connection pool (aiomysql).
+    Unlike the 4 connection default of get_Pool, an event loop can keep hundreds of station reads and writes in
+    flight, so size maxsize for the concurrency wanted (and the max_connections of the server).
+    Connections run in autocommit mode, so that a read does not leave its connection in a transaction (aiomysql
+    closes such connections on release instead of reusing them). Multi-statement writes begin their own
+    transaction (see db_adapter.aio.base.write_rows).
+    :param minsize: number of connections opened when the pool is created
+    :param maxsize: maximum number of connections, acquire() waits for a free connection beyond it
+    :param pool_recycle: seconds after which an idle connection is recycled (-1 means never)
+    :return: aiomysql connection pool
+    """
+
+    require_aiomysql()
+
+    pool = await aiomysql.create_pool(host=host, port=port, user=user, password=password, db=db,
+            minsize=minsize, maxsize=maxsize, pool_recycle=pool_recycle, autocommit=True,
+            cursorclass=aiomysql.DictCursor, **kwargs)
+
+    logger.info("Async connection pool created for {}: minsize={}, maxsize={}".format(db, minsize, maxsize))
+    return pool
+
+
+async def destroy_async_Pool(pool):
+
+    pool.close()
+    await pool.wait_closed()
@@ -1,3 +1,14 @@
-from .pymysql_base import get_Pool, destroy_Pool, destroy_Pool, get_connection_for_iterable_cursor
-
-
+from .pymysql_base import get_Pool, destroy_Pool, destroy_Pool, get_connection_for_iterable_cursor, \
+    execute_read_query, execute_write_query, execute_streaming_read_query
+from .pool_manager import ManagedPool, PoolManager, pool_manager, get_schema_Pool, destroy_all_Pools, \
+    CURW_FCST, CURW_OBS, CURW_SIM
+from .instrumentation import InstrumentedPool, PoolMetrics, MetricsDumper, instrument_pool, get_pool_metrics, \
+    metrics_snapshot, metrics_prometheus_text
+from .columnar import ReturnType, fetch_timeseries, rows_to_timeseries_arrays, pivot_to_matrix
+from .bulk_writer import BulkWriter, WriteMode, WriteStats, DEFAULT_BATCH_SIZE
+from .bulk_loader import BulkLoader
+from .hash_id import generate_hash_id, generate_hash_ids
+from .run_id_index import BloomFilter, RunIdIndex
+from .lookup_cache import LookupCache, lookup_cache_stats, get_lookup_cache, invalidate_all_lookup_caches
+from .watermarks import reduce_watermarks, update_watermarks, apply_watermarks
+from .delta import ChecksumTracker, timeseries_checksum, changed_rows, write_delta, insert_timeseries_delta
@@ -0,0 +1,127 @@
+import os
+import tempfile
+import time
+from datetime import datetime
+
+from db_adapter.logger import logger
+from db_adapter.base.bulk_writer import WriteStats
+
+# NULL marker of the LOAD DATA default (tab separated) format
+TSV_NULL = "\\N"
+
+
+def _tsv_field(value):
+
+    if value is None:
+        return TSV_NULL
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%d %H:%M:%S")
+    if isinstance(value, float):
+        return TSV_NULL if value != value else repr(value)  # NaN -> NULL
+
+    # escape the characters special to the LOAD DATA default format
+    return str(value).replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n")
+
+
+def write_tsv(file, rows, column_count):
+    """
+    Write rows to a text file in the LOAD DATA default format (tab separated fields, newline terminated lines,
+    \\N for NULL)
+    :param file: file object opened in text mode
+    :param rows: list of rows (list/tuple of values)
+    :param column_count: number of values expected in each row
+    :return: number of rows written
+    """
+
+    row_count = 0
+    for row in rows:
+        if len(row) != column_count:
+            raise ValueError("Row {} does not have {} values".format(row, column_count))
+        file.write("\t".join([_tsv_field(value) for value in row]))
+        file.write("\n")
+        row_count += 1
+
+    return row_count
+
+
+class BulkLoader:
+    """
+    Load rows to a table with LOAD DATA LOCAL INFILE through a temporary TSV file.
+    The pool must be created with local_infile=True (and local_infile must be enabled on the server).
+
+    LOAD DATA LOCAL skips rows with duplicate keys (as INSERT IGNORE does). With upsert=True rows are first
+    loaded to a session scoped temporary staging table and merged to the target table with
+    INSERT ... SELECT ... ON DUPLICATE KEY UPDATE.
+    e.g.:
+        loader = BulkLoader(table='data', columns=('id', 'time', 'fgt', 'value'))
+        stats = loader.load(connection, [[id, time, fgt, value], ...], upsert=True)
+    """
+
+    def __init__(self, table, columns, update_columns=None, tmp_dir=None):
+        """
+        :param table: table name
+        :param columns: column names, in the order of the values of each row
+        :param update_columns: columns updated ON DUPLICATE KEY when upserting, defaults to ['value']
+        :param tmp_dir: directory for the temporary TSV files, defaults to the system temp directory
+        """
+        self.table = table
+        self.columns = tuple(columns)
+        self.update_columns = tuple(update_columns) if update_columns is not None else ('value',)
+        self.tmp_dir = tmp_dir
+        self.staging_table = "{}_staging".format(table)
+
+        self._column_list = ", ".join("`{}`".format(column) for column in self.columns)
+
+    def _load_statement(self, table):
+
+        return "LOAD DATA LOCAL INFILE %s INTO TABLE `{}` " \
+               "FIELDS TERMINATED BY '\\t' LINES TERMINATED BY '\\n' ({})".format(table, self._column_list)
+
+    def load(self, connection, rows, upsert=False, commit=True):
+        """
+        Load rows to the table
+        :param connection: database connection (rolling back on failure is left to the caller)
+        :param rows: list of rows (list/tuple of values in the order of columns)
+        :param upsert: if True update the update_columns of existing rows, else skip rows with duplicate keys
+        :param commit: if False nothing is committed (the caller owns the transaction)
+        :return: WriteStats
+        """
+
+        stats = WriteStats()
+        start = time.perf_counter()
+
+        fd, file_path = tempfile.mkstemp(prefix="db_adapter_{}_".format(self.table), suffix=".tsv",
+                dir=self.tmp_dir)
+        try:
+            with os.fdopen(fd, 'w', newline='\n', encoding='utf-8') as file:
+                stats.rows_sent = write_tsv(file, rows, len(self.columns))
+
+            if stats.rows_sent == 0:
+                return stats
+
+            with connection.cursor() as cursor:
+                if upsert:
+                    cursor.execute("DROP TEMPORARY TABLE IF EXISTS `{}`".format(self.staging_table))
+                    cursor.execute("CREATE TEMPORARY TABLE `{}` LIKE `{}`".format(self.staging_table, self.table))
+                    try:
+                        cursor.execute(self._load_statement(self.staging_table), (file_path,))
+                        sql_statement = "INSERT INTO `{}` ({}) SELECT {} FROM `{}` ON DUPLICATE KEY UPDATE {}"\
+                            .format(self.table, self._column_list, self._column_list, self.staging_table,
+                                ", ".join("`{0}`=VALUES(`{0}`)".format(column) for column in self.update_columns))
+                        stats.row_count = cursor.execute(sql_statement)
+                    finally:
+                        cursor.execute("DROP TEMPORARY TABLE IF EXISTS `{}`".format(self.staging_table))
+                else:
+                    stats.row_count = cursor.execute(self._load_statement(self.table), (file_path,))
+                stats.batch_count = 1
+
+            if commit:
+                connection.commit()
+        finally:
+            os.remove(file_path)
+
+        stats.elapsed = time.perf_counter() - start
+        logger.debug("Loaded {} rows to {} (upsert={}), {:.1f} rows/s".format(stats.rows_sent, self.table, upsert,
+                stats.rows_per_second))
+
+        return stats
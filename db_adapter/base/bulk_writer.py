@@ -0,0 +1,134 @@
+import time
+from enum import Enum
+
+from db_adapter.logger import logger
+
+# number of rows sent in a single multi-row INSERT statement, keep batch_size * row size well below the
+# max_allowed_packet of the server
+DEFAULT_BATCH_SIZE = 1000
+
+
+class WriteMode(Enum):
+    INSERT = 'INSERT'
+    UPSERT = 'UPSERT'  # INSERT ... ON DUPLICATE KEY UPDATE
+    REPLACE = 'REPLACE'
+    IGNORE = 'IGNORE'  # INSERT IGNORE
+
+
+class WriteStats:
+    def __init__(self, row_count=0, rows_sent=0, batch_count=0, elapsed=0.0):
+        self.row_count = row_count  # affected rows reported by the server
+        self.rows_sent = rows_sent
+        self.batch_count = batch_count
+        self.elapsed = elapsed
+
+    @property
+    def rows_per_second(self):
+        return self.rows_sent / self.elapsed if self.elapsed > 0 else 0.0
+
+    def __repr__(self):
+        return "WriteStats(row_count={}, rows_sent={}, batch_count={}, elapsed={:.3f}s, rows_per_second={:.1f})"\
+            .format(self.row_count, self.rows_sent, self.batch_count, self.elapsed, self.rows_per_second)
+
+
+class BulkWriter:
+    """
+    Write rows to a table as chunked multi-row INSERT / UPSERT / REPLACE statements
+    e.g.:
+        writer = BulkWriter(table='data', columns=('id', 'time', 'value'), mode=WriteMode.UPSERT)
+        stats = writer.write(connection, [[id, time, value], ...])
+    """
+
+    def __init__(self, table, columns, mode=WriteMode.INSERT, update_columns=None, batch_size=None,
+                 commit_per_batch=False):
+        """
+        :param table: table name
+        :param columns: column names, in the order of the values of each row
+        :param mode: WriteMode
+        :param update_columns: columns updated ON DUPLICATE KEY for WriteMode.UPSERT, defaults to ['value']
+        :param batch_size: number of rows per statement, defaults to DEFAULT_BATCH_SIZE
+        :param commit_per_batch: if True commit after every batch, else commit once per write() call
+        """
+        self.table = table
+        self.columns = tuple(columns)
+        self.mode = mode
+        self.update_columns = tuple(update_columns) if update_columns is not None else ('value',)
+        self.batch_size = batch_size if batch_size else DEFAULT_BATCH_SIZE
+        self.commit_per_batch = commit_per_batch
+
+        self._row_placeholder = "(" + ", ".join(["%s"] * len(self.columns)) + ")"
+        self._full_batch_statement = self._build_statement(self.batch_size)
+
+    def _build_statement(self, row_count):
+
+        if self.mode is WriteMode.REPLACE:
+            verb = "REPLACE INTO"
+        elif self.mode is WriteMode.IGNORE:
+            verb = "INSERT IGNORE INTO"
+        else:
+            verb = "INSERT INTO"
+
+        sql_statement = "{} `{}` ({}) VALUES {}".format(verb, self.table,
+                ", ".join("`{}`".format(column) for column in self.columns),
+                ", ".join([self._row_placeholder] * row_count))
+
+        if self.mode is WriteMode.UPSERT:
+            sql_statement += " ON DUPLICATE KEY UPDATE " + \
+                             ", ".join("`{0}`=VALUES(`{0}`)".format(column) for column in self.update_columns)
+
+        return sql_statement
+
+    def iter_batches(self, rows):
+        """
+        Split rows into multi-row statements
+        :param rows: list of rows (list/tuple of values in the order of columns)
+        :return: generator of (sql_statement, flattened params, number of rows) tuples
+        """
+
+        column_count = len(self.columns)
+
+        for batch_start in range(0, len(rows), self.batch_size):
+            batch = rows[batch_start:batch_start + self.batch_size]
+
+            params = []
+            for row in batch:
+                if len(row) != column_count:
+                    raise ValueError("Row {} does not match columns {} of table {}".format(row, self.columns,
+                            self.table))
+                params.extend(row)
+
+            sql_statement = self._full_batch_statement if len(batch) == self.batch_size \
+                else self._build_statement(len(batch))
+
+            yield sql_statement, params, len(batch)
+
+    def write(self, connection, rows, commit=True):
+        """
+        Write rows in batches of batch_size rows
+        :param connection: database connection (rolling back on failure is left to the caller)
+        :param rows: list of rows (list/tuple of values in the order of columns)
+        :param commit: if False nothing is committed (the caller owns the transaction),
+        else commit per batch or once at the end depending on commit_per_batch
+        :return: WriteStats
+        """
+
+        stats = WriteStats()
+        start = time.perf_counter()
+
+        with connection.cursor() as cursor:
+            for sql_statement, params, batch_row_count in self.iter_batches(rows):
+                stats.row_count += cursor.execute(sql_statement, params)
+                stats.rows_sent += batch_row_count
+                stats.batch_count += 1
+
+                if commit and self.commit_per_batch:
+                    connection.commit()
+
+        if commit and not self.commit_per_batch:
+            connection.commit()
+
+        stats.elapsed = time.perf_counter() - start
+        logger.debug("Wrote {} rows to {} in {} batches, {:.1f} rows/s".format(stats.rows_sent, self.table,
+                stats.batch_count, stats.rows_per_second))
+
+        return stats
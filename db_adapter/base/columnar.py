@@ -0,0 +1,152 @@
+from enum import Enum
+
+import numpy as np
+import pandas as pd
+
+
+class ReturnType(Enum):
+    """
+    Result formats of timeseries read methods
+        - LIST: list of [time, value] lists (default)
+        - ARRAYS: (times, values) tuple of datetime64[ns] and float64 numpy arrays
+        - DATAFRAME: pandas DataFrame with a 'value' column indexed by 'time'
+    """
+    LIST = 'list'
+    ARRAYS = 'arrays'
+    DATAFRAME = 'dataframe'
+
+    @staticmethod
+    def getType(name):
+        _nameToType = {
+                'list'     : ReturnType.LIST,
+                'arrays'   : ReturnType.ARRAYS,
+                'dataframe': ReturnType.DATAFRAME
+                }
+
+        return _nameToType.get(name, ReturnType.LIST)
+
+
+def to_datetime64(value):
+    """
+    :param value: datetime, pandas Timestamp, numpy datetime64 or 'YYYY-MM-DD HH:MM:SS' string
+    :return: numpy datetime64[ns]
+    """
+    return np.datetime64(pd.Timestamp(value).to_datetime64(), 'ns')
+
+
+def empty_timeseries_arrays():
+    return np.empty(0, dtype='datetime64[ns]'), np.empty(0, dtype='float64')
+
+
+def rows_to_timeseries_arrays(rows):
+    """
+    Fill preallocated datetime64[ns] and float64 arrays from (time, value) tuple rows of a tuple cursor.
+    NULL values become NaN.
+    :param rows: sequence of (time, value) tuples
+    :return: (times, values) numpy arrays
+    """
+
+    row_count = len(rows)
+    if row_count == 0:
+        return empty_timeseries_arrays()
+
+    times = np.empty(row_count, dtype='datetime64[ns]')
+    values = np.empty(row_count, dtype='float64')
+
+    time_column, value_column = zip(*rows)
+    times[:] = time_column
+    values[:] = value_column
+
+    return times, values
+
+
+def timeseries_arrays_to_return_type(times, values, return_type):
+    """
+    Convert (times, values) arrays into the requested ReturnType (ARRAYS or DATAFRAME)
+    """
+
+    if return_type is ReturnType.DATAFRAME:
+        return pd.DataFrame({'value': values}, index=pd.DatetimeIndex(times, name='time'))
+
+    return times, values
+
+
+def fetch_timeseries(cursor, return_type):
+    """
+    Fetch the (time, value) rows of an executed tuple cursor in the requested ReturnType,
+    without building a dict or a list per row for the ARRAYS and DATAFRAME formats.
+    :param cursor: executed (buffered) tuple cursor, i.e. pymysql.cursors.Cursor
+    :param return_type: ReturnType
+    :return: list of [time, value] lists, (times, values) arrays or DataFrame
+    """
+
+    return rows_to_return_type(cursor.fetchall(), return_type)
+
+
+def rows_to_return_type(rows, return_type):
+    """
+    Convert fetched (time, value) tuple rows into the requested ReturnType
+    :param rows: sequence of (time, value) tuples
+    :param return_type: ReturnType
+    :return: list of [time, value] lists, (times, values) arrays or DataFrame
+    """
+
+    if return_type is ReturnType.LIST:
+        return [[row[0], row[1]] for row in rows]
+
+    times, values = rows_to_timeseries_arrays(rows)
+    return timeseries_arrays_to_return_type(times, values, return_type)
+
+
+def grouped_rows_to_timeseries_arrays(blocks):
+    """
+    Split (key, time, value) tuple rows, grouped (ordered) by key, into per key (times, values) arrays.
+    The columns are filled into single arrays and sliced at the key boundaries, instead of building
+    an array per row group.
+    :param blocks: iterable of lists of (key, time, value) tuples, e.g. the blocks of a streaming query
+    :return: dict of key to (times, values) numpy arrays, in the order the keys first appear
+    """
+
+    key_column, time_column, value_column = [], [], []
+    for block in blocks:
+        for key, time_, value in block:
+            key_column.append(key)
+            time_column.append(time_)
+            value_column.append(value)
+
+    if len(key_column) == 0:
+        return {}
+
+    times = np.empty(len(time_column), dtype='datetime64[ns]')
+    values = np.empty(len(value_column), dtype='float64')
+    times[:] = time_column
+    values[:] = value_column
+
+    result = {}
+    group_start = 0
+    for i in range(1, len(key_column) + 1):
+        if i == len(key_column) or key_column[i] != key_column[group_start]:
+            result[key_column[group_start]] = (times[group_start:i], values[group_start:i])
+            group_start = i
+
+    return result
+
+
+def pivot_to_matrix(row_labels, column_labels, values):
+    """
+    Pivot long format (row label, column label, value) columns into a dense 2-D float64 matrix, NaN where there is
+    no value. Both axes are sorted and unique.
+    e.g. fgts x times matrix of the forecasts of a timeseries id
+    :param row_labels: numpy array of row labels (e.g. fgts)
+    :param column_labels: numpy array of column labels (e.g. times), same length as row_labels
+    :param values: float64 numpy array, same length as row_labels
+    :return: (row_axis, column_axis, matrix) with matrix of shape (len(row_axis), len(column_axis))
+    """
+
+    row_axis, row_positions = np.unique(row_labels, return_inverse=True)
+    column_axis, column_positions = np.unique(column_labels, return_inverse=True)
+
+    matrix = np.full((len(row_axis), len(column_axis)), np.nan)
+    matrix[row_positions, column_positions] = values
+
+    return row_axis, column_axis, matrix
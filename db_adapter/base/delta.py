@@ -0,0 +1,197 @@
+import math
+import hashlib
+import threading
+import traceback
+from collections import OrderedDict
+from datetime import datetime
+
+import pymysql
+
+from db_adapter.logger import logger
+from db_adapter.constants import COMMON_DATE_TIME_FORMAT
+from db_adapter.base.bulk_writer import BulkWriter, WriteMode
+
+
+def _normalize_time(time_):
+    if type(time_) is str:
+        return datetime.strptime(time_, COMMON_DATE_TIME_FORMAT)
+    return time_
+
+
+def _normalize_value(value):
+    if value is None:
+        return None
+    value = float(value)
+    return None if math.isnan(value) else value
+
+
+def timeseries_checksum(timeseries):
+    """
+    Content checksum of a timeseries, independent of the order of its entries and of the time format
+    (datetime or 'YYYY-MM-DD HH:MM:SS' string)
+    :param timeseries: list of [time, value] lists
+    :return: hex digest
+    """
+
+    digest = hashlib.blake2b(digest_size=16)
+    for time_, value in sorted((_normalize_time(t[0]), _normalize_value(t[1])) for t in timeseries):
+        digest.update("{}|{!r}\n".format(time_.strftime(COMMON_DATE_TIME_FORMAT), value).encode())
+    return digest.hexdigest()
+
+
+class ChecksumTracker:
+    """
+    Remembers the content checksum of the last timeseries written per key (e.g. (id, fgt)), so that re-pushing
+    an unchanged timeseries is skipped without reading the database. Keeps the maxsize most recently used keys.
+    """
+
+    def __init__(self, maxsize=100000):
+        self.maxsize = maxsize
+        self._checksums = OrderedDict()
+        self._lock = threading.Lock()
+
+    def is_unchanged(self, key, checksum):
+        with self._lock:
+            if self._checksums.get(key) != checksum:
+                return False
+            self._checksums.move_to_end(key)
+            return True
+
+    def record(self, key, checksum):
+        with self._lock:
+            self._checksums[key] = checksum
+            self._checksums.move_to_end(key)
+            while len(self._checksums) > self.maxsize:
+                self._checksums.popitem(last=False)
+
+    def discard(self, key):
+        with self._lock:
+            self._checksums.pop(key, None)
+
+    def __len__(self):
+        return len(self._checksums)
+
+
+def changed_rows(rows, existing, time_index, value_index, tolerance=0.0):
+    """
+    Select the rows that are new, or whose value differs from the existing value by more than the tolerance
+    :param rows: list of rows (values in the order of the columns of the table)
+    :param existing: dict of time to existing value
+    :param time_index: position of the time in a row
+    :param value_index: position of the value in a row
+    :param tolerance: absolute difference below which values are considered unchanged
+    :return: list of changed rows
+    """
+
+    changed = []
+    for row in rows:
+        time_ = _normalize_time(row[time_index])
+        if time_ not in existing:
+            changed.append(row)
+            continue
+
+        old_value = existing[time_]
+        new_value = _normalize_value(row[value_index])
+        if old_value is None or new_value is None:
+            if old_value is not new_value:
+                changed.append(row)
+        elif abs(new_value - old_value) > tolerance:
+            changed.append(row)
+
+    return changed
+
+
+def write_delta(connection, writer, existing_statement, existing_params, rows, tolerance=0.0, commit=True):
+    """
+    Write only the new or changed rows of a timeseries. The existing (time, value) pairs are read with one range
+    scan, the unchanged rows are dropped, and the rest is written with the writer (usually a WriteMode.UPSERT
+    BulkWriter with 'time' and 'value' columns).
+    :param connection: database connection (rolling back on failure is left to the caller)
+    :param writer: BulkWriter
+    :param existing_statement: sql statement selecting the existing `time`, `value` pairs of the rows' range
+    :param existing_params: parameters of existing_statement
+    :param rows: list of rows in the order of writer.columns
+    :param tolerance: absolute difference below which values are considered unchanged
+    :param commit: passed to BulkWriter.write
+    :return: dict with the number of rows 'written' and 'skipped'
+    """
+
+    with connection.cursor(pymysql.cursors.Cursor) as cursor:
+        cursor.execute(existing_statement, existing_params)
+        existing = {time_: _normalize_value(value) for time_, value in cursor.fetchall()}
+
+    changed = changed_rows(rows, existing, writer.columns.index('time'), writer.columns.index('value'),
+            tolerance=tolerance)
+
+    if len(changed) > 0:
+        writer.write(connection, changed, commit=commit)
+
+    return {'written': len(changed), 'skipped': len(rows) - len(changed)}
+
+
+def insert_timeseries_delta(pool, timeseries, tms_id, key=None, tolerance=0.0, checksum_tracker=None,
+                            batch_size=None, table='data'):
+    """
+    Write only the new or changed values of a timeseries of a data table (the shared body of the insert_data_delta
+    methods of the schemas). The existing values of the id (and key columns) over the time range of the timeseries
+    are read with one range scan and compared with the incoming values.
+    :param pool: connection pool
+    :param timeseries: list of [time, value] lists, times as datetime or 'YYYY-MM-DD HH:MM:SS' strings
+    :param tms_id: hash value
+    :param key: optional dict of further key columns of the rows to their value, e.g. {'fgt': fgt} for curw_fcst
+    :param tolerance: absolute difference below which values are considered unchanged
+    :param checksum_tracker: optional ChecksumTracker, a timeseries identical to the last one written for the
+    same id, key and time range is skipped without reading the database
+    :param batch_size: number of rows per multi-row INSERT statement (default DEFAULT_BATCH_SIZE)
+    :param table: data table name
+    :return: dict with the number of rows 'written' and 'skipped', else raise the exception
+    """
+
+    key = key or {}
+
+    new_timeseries = []
+    for t in timeseries:
+        if len(t) > 1:
+            new_timeseries.append([_normalize_time(t[0]), t[1]])
+        else:
+            logger.warning('Invalid timeseries data:: %s', t)
+
+    if len(new_timeseries) == 0:
+        return {'written': 0, 'skipped': 0}
+
+    start = min(t[0] for t in new_timeseries)
+    end = max(t[0] for t in new_timeseries)
+    tracker_key = (tms_id,) + tuple(key.values()) + (start, end)
+
+    checksum = None
+    if checksum_tracker is not None:
+        checksum = timeseries_checksum(new_timeseries)
+        if checksum_tracker.is_unchanged(tracker_key, checksum):
+            logger.debug("Skipping unchanged timeseries of tms id {}".format(tms_id))
+            return {'written': 0, 'skipped': len(new_timeseries)}
+
+    columns = ('id', 'time') + tuple(key.keys()) + ('value',)
+    rows = [(tms_id, t[0]) + tuple(key.values()) + (t[1],) for t in new_timeseries]
+    existing_statement = "SELECT `time`, `value` FROM `{}` WHERE `id`=%s".format(table) + \
+                         "".join(" AND `{}`=%s".format(column) for column in key.keys()) + \
+                         " AND `time` BETWEEN %s AND %s"
+    existing_params = (tms_id,) + tuple(key.values()) + (start, end)
+
+    connection = pool.connection()
+    try:
+        writer = BulkWriter(table=table, columns=columns, mode=WriteMode.UPSERT, batch_size=batch_size)
+        result = write_delta(connection, writer, existing_statement, existing_params, rows, tolerance=tolerance)
+        if checksum_tracker is not None:
+            checksum_tracker.record(tracker_key, checksum)
+        logger.debug("Delta insertion of tms id {}: {} rows written, {} unchanged rows skipped"
+                     .format(tms_id, result['written'], result['skipped']))
+        return result
+    except Exception as exception:
+        connection.rollback()
+        error_message = "Delta insertion to {} table for tms id {} failed.".format(table, tms_id)
+        logger.error(error_message)
+        traceback.print_exc()
+        raise exception
+    finally:
+        if connection is not None:
+            connection.close()
@@ -0,0 +1,76 @@
+import hashlib
+import json
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import pandas as pd
+from pandas.api.types import is_float_dtype
+
+# same serialization as json.dumps(hash_data, sort_keys=True), built once instead of per call
+_canonical_encoder = json.JSONEncoder(sort_keys=True)
+
+# records hashed per task when hashing on a process pool
+DEFAULT_CHUNK_SIZE = 2000
+
+
+def generate_hash_id(meta_data, hash_keys):
+    """
+    Generate the sha256 hash id of the given metadata
+    :param meta_data: dict (or any mapping) containing at least the hash_keys
+    :param hash_keys: keys of the metadata used to generate the id
+    :return: str: sha256 hash value in hex format (length of 64 characters)
+    """
+
+    hash_data = {key: meta_data[key] for key in hash_keys}
+    return hashlib.sha256(_canonical_encoder.encode(hash_data).encode("ascii")).hexdigest()
+
+
+def _generate_hash_id_chunk(records, hash_keys):
+    return [generate_hash_id(meta_data, hash_keys) for meta_data in records]
+
+
+def _frame_records(frame, hash_keys):
+    """
+    Rows of a DataFrame as metadata dicts of python scalars. A float column can not tell an int from an integral
+    float (an int latitude next to float ones is stored as 7.0), so integral values of float columns are given back
+    as ints, as they most likely were in the metadata dicts. Object columns keep their values untouched.
+    """
+
+    columns = []
+    for key in hash_keys:
+        values = frame[key].tolist()
+        if is_float_dtype(frame[key].dtype):
+            values = [int(value) if value.is_integer() else value for value in values]
+        columns.append(values)
+
+    return [dict(zip(hash_keys, row)) for row in zip(*columns)]
+
+
+def generate_hash_ids(records, hash_keys, processes=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Generate the sha256 hash ids of a batch of metadata records. Ids are identical to the ids
+    generated by generate_hash_id for each record.
+    :param records: pandas DataFrame (a row per record) or list of metadata dicts. Integral values of DataFrame
+    float columns are hashed as ints (see _frame_records), use an object column (or dicts) to hash floats like 7.0
+    :param hash_keys: keys of the metadata used to generate the ids
+    :param processes: number of worker processes, None or 1 to hash in the calling process
+    :param chunk_size: number of records hashed per worker task
+    :return: list of hash ids, in the order of the records
+    """
+
+    if isinstance(records, pd.DataFrame):
+        records = _frame_records(records, list(hash_keys))
+    else:
+        records = list(records)
+
+    if not processes or processes == 1 or len(records) <= chunk_size:
+        return _generate_hash_id_chunk(records, hash_keys)
+
+    chunks = [records[i:i + chunk_size] for i in range(0, len(records), chunk_size)]
+
+    hash_ids = []
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        for chunk_ids in executor.map(partial(_generate_hash_id_chunk, hash_keys=tuple(hash_keys)), chunks):
+            hash_ids.extend(chunk_ids)
+
+    return hash_ids
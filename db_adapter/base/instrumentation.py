@@ -0,0 +1,448 @@
+import os
+import re
+import threading
+import time
+import bisect
+
+from db_adapter.logger import logger
+
+"""
+Opt-in instrumentation of connection pools.
+
+    pool = get_Pool(host=HOST, port=PORT, user=USERNAME, password=PASSWORD, db=DATABASE, instrument=True,
+                    pool_name='curw_fcst')
+
+An instrumented pool records
+    - checkout wait: time spent in pool.connection() waiting for a free connection
+    - hold time: time between pool.connection() and connection.close()
+    - statement latency, call count, errors, rows returned and rows affected per sql template
+and exposes them through get_pool_metrics(pool_name).snapshot(), metrics_snapshot() and
+MetricsDumper (periodic log / Prometheus textfile dump).
+"""
+
+# histogram bucket upper bounds in seconds
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# distinct sql templates tracked per pool, further templates are recorded under OTHER_TEMPLATE
+DEFAULT_MAX_TEMPLATES = 500
+OTHER_TEMPLATE = '<other>'
+
+_READ_STATEMENT_PREFIXES = ('SELECT', 'SHOW', 'CALL', 'WITH', 'DESCRIBE', 'EXPLAIN')
+
+# placeholder lists: IN (%s, %s, ...) and the rows of multi-row VALUES
+_PLACEHOLDER_LIST = re.compile(r"\(\s*%s(?:\s*,\s*%s)*\s*\)")
+_REPEATED_LISTS = re.compile(r"\(\?\)(?:\s*,\s*\(\?\))+")
+# UNION ALL SELECT rows of derived tables (e.g. the watermark updates)
+_REPEATED_UNIONS = re.compile(r"(?:\s+UNION ALL SELECT (?:[^()]|\([^()]*\))*?(?=\s+UNION ALL|\)))+",
+        re.IGNORECASE)
+
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def snapshot(self):
+        cumulative = []
+        running = 0
+        for upper_bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            running += count
+            cumulative.append((upper_bound, running))
+
+        return {
+                'count'  : self.count,
+                'sum'    : self.sum,
+                'max'    : self.max,
+                'mean'   : self.sum / self.count if self.count > 0 else 0.0,
+                'buckets': cumulative
+                }
+
+
+class _StatementStats:
+    def __init__(self, buckets):
+        self.latency = Histogram(buckets)
+        self.errors = 0
+        self.rows_returned = 0
+        self.rows_affected = 0
+
+    def snapshot(self):
+        return {
+                'latency'      : self.latency.snapshot(),
+                'errors'       : self.errors,
+                'rows_returned': self.rows_returned,
+                'rows_affected': self.rows_affected
+                }
+
+
+class PoolMetrics:
+    """
+    Thread safe metrics store of a single pool
+    """
+
+    def __init__(self, pool_name, buckets=DEFAULT_BUCKETS, max_templates=DEFAULT_MAX_TEMPLATES):
+        self.pool_name = pool_name
+        self.buckets = buckets
+        self.max_templates = max_templates
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.checkout_wait = Histogram(self.buckets)
+            self.hold_time = Histogram(self.buckets)
+            self.checkouts_in_progress = 0
+            self.statements = {}
+
+    def record_checkout(self, wait):
+        with self._lock:
+            self.checkout_wait.observe(wait)
+            self.checkouts_in_progress += 1
+
+    def record_release(self, hold):
+        with self._lock:
+            self.hold_time.observe(hold)
+            self.checkouts_in_progress -= 1
+
+    def record_statement(self, template, latency, rows_affected=0, error=False):
+        with self._lock:
+            stats = self._statement_stats(template)
+            stats.latency.observe(latency)
+            stats.rows_affected += rows_affected
+            if error:
+                stats.errors += 1
+
+    def record_rows_returned(self, template, row_count):
+        with self._lock:
+            self._statement_stats(template).rows_returned += row_count
+
+    def _statement_stats(self, template):
+        stats = self.statements.get(template)
+        if stats is None and len(self.statements) >= self.max_templates:
+            template = OTHER_TEMPLATE
+            stats = self.statements.get(template)
+        if stats is None:
+            stats = _StatementStats(self.buckets)
+            self.statements[template] = stats
+        return stats
+
+    def snapshot(self):
+        """
+        :return: dict with 'checkout_wait', 'hold_time' histograms, 'checkouts_in_progress' and
+        'statements': {sql template: {'latency', 'errors', 'rows_returned', 'rows_affected'}}
+        """
+        with self._lock:
+            return {
+                    'pool'                 : self.pool_name,
+                    'checkout_wait'        : self.checkout_wait.snapshot(),
+                    'hold_time'            : self.hold_time.snapshot(),
+                    'checkouts_in_progress': self.checkouts_in_progress,
+                    'statements'           : {template: stats.snapshot()
+                                              for template, stats in self.statements.items()}
+                    }
+
+    def prometheus_families(self):
+        """
+        :return: dict of metric family name to (type, list of sample lines)
+        """
+
+        snapshot = self.snapshot()
+        pool_label = 'pool="{}"'.format(_escape_label(self.pool_name))
+
+        families = {
+                'db_adapter_pool_checkout_wait_seconds': ('histogram', _histogram_lines(
+                        'db_adapter_pool_checkout_wait_seconds', pool_label, snapshot['checkout_wait'])),
+                'db_adapter_pool_hold_seconds'         : ('histogram', _histogram_lines(
+                        'db_adapter_pool_hold_seconds', pool_label, snapshot['hold_time'])),
+                'db_adapter_pool_checkouts_in_progress': ('gauge', ['db_adapter_pool_checkouts_in_progress{{{}}} {}'
+                                                          .format(pool_label, snapshot['checkouts_in_progress'])]),
+                'db_adapter_query_duration_seconds'    : ('histogram', []),
+                'db_adapter_query_errors_total'        : ('counter', []),
+                'db_adapter_query_rows_returned_total' : ('counter', []),
+                'db_adapter_query_rows_affected_total' : ('counter', [])
+                }
+
+        for template, stats in snapshot['statements'].items():
+            labels = '{},template="{}"'.format(pool_label, _escape_label(template))
+            families['db_adapter_query_duration_seconds'][1].extend(
+                    _histogram_lines('db_adapter_query_duration_seconds', labels, stats['latency']))
+            for family, key in (('db_adapter_query_errors_total', 'errors'),
+                                ('db_adapter_query_rows_returned_total', 'rows_returned'),
+                                ('db_adapter_query_rows_affected_total', 'rows_affected')):
+                families[family][1].append('{}{{{}}} {}'.format(family, labels, stats[key]))
+
+        return families
+
+    def to_prometheus_text(self):
+        """
+        :return: metrics in the Prometheus text exposition format
+        """
+        return _format_prometheus_families([self.prometheus_families()])
+
+
+def _format_prometheus_families(families_list):
+    merged = {}
+    for families in families_list:
+        for family, (metric_type, lines) in families.items():
+            merged.setdefault(family, (metric_type, []))[1].extend(lines)
+
+    output = []
+    for family, (metric_type, lines) in merged.items():
+        if len(lines) > 0:
+            output.append('# TYPE {} {}'.format(family, metric_type))
+            output.extend(lines)
+
+    return "\n".join(output) + "\n"
+
+
+def _escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _histogram_lines(metric_name, labels, histogram_snapshot):
+    lines = []
+    for upper_bound, count in histogram_snapshot['buckets']:
+        le = '+Inf' if upper_bound == float('inf') else repr(upper_bound)
+        lines.append('{}_bucket{{{},le="{}"}} {}'.format(metric_name, labels, le, count))
+    lines.append('{}_sum{{{}}} {}'.format(metric_name, labels, histogram_snapshot['sum']))
+    lines.append('{}_count{{{}}} {}'.format(metric_name, labels, histogram_snapshot['count']))
+    return lines
+
+
+def sql_template(query):
+    """
+    Normalize a sql statement into a template key: whitespace is collapsed, parameters are kept as wild cards,
+    and variable length placeholder lists are collapsed, so that IN lists, multi-row VALUES and UNION ALL rows
+    of any length share one template, e.g.
+        SELECT `id` FROM `run` WHERE `id` IN (%s, %s, %s)  ->  SELECT `id` FROM `run` WHERE `id` IN (?)
+        INSERT INTO `data` VALUES (%s, %s), (%s, %s)  ->  INSERT INTO `data` VALUES (?), ...
+    """
+    template = ' '.join(str(query).split())
+    template = _PLACEHOLDER_LIST.sub('(?)', template)
+    template = _REPEATED_LISTS.sub('(?), ...', template)
+    return _REPEATED_UNIONS.sub(' UNION ALL ...', template)
+
+
+class InstrumentedCursor:
+    def __init__(self, cursor, metrics):
+        self._cursor = cursor
+        self._metrics = metrics
+        self._template = None
+
+    def _run(self, method, query, args):
+        template = sql_template(query)
+        self._template = template
+        start = time.perf_counter()
+        try:
+            result = method(query) if args is None else method(query, args)
+        except Exception:
+            self._metrics.record_statement(template, time.perf_counter() - start, error=True)
+            raise
+        latency = time.perf_counter() - start
+
+        is_read = template[:8].upper().startswith(_READ_STATEMENT_PREFIXES)
+        self._metrics.record_statement(template, latency,
+                rows_affected=result if not is_read and isinstance(result, int) else 0)
+        return result
+
+    def execute(self, query, args=None):
+        return self._run(self._cursor.execute, query, args)
+
+    def executemany(self, query, args):
+        return self._run(self._cursor.executemany, query, args)
+
+    def callproc(self, procname, args=()):
+        return self._run(self._cursor.callproc, procname, args)
+
+    def _count_rows(self, row_count):
+        if self._template is not None and row_count > 0:
+            self._metrics.record_rows_returned(self._template, row_count)
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        if row is not None:
+            self._count_rows(1)
+        return row
+
+    def fetchmany(self, size=None):
+        rows = self._cursor.fetchmany(size) if size is not None else self._cursor.fetchmany()
+        self._count_rows(len(rows))
+        return rows
+
+    def fetchall(self):
+        rows = self._cursor.fetchall()
+        self._count_rows(len(rows))
+        return rows
+
+    def __iter__(self):
+        for row in self._cursor:
+            self._count_rows(1)
+            yield row
+
+    def close(self):
+        self._cursor.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class InstrumentedConnection:
+    def __init__(self, connection, metrics, checkout_time):
+        self._connection = connection
+        self._metrics = metrics
+        self._checkout_time = checkout_time
+        self._released = False
+
+    def cursor(self, *args, **kwargs):
+        return InstrumentedCursor(self._connection.cursor(*args, **kwargs), self._metrics)
+
+    def close(self):
+        if not self._released:
+            self._released = True
+            self._metrics.record_release(time.perf_counter() - self._checkout_time)
+        self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+
+class InstrumentedPool:
+    """
+    Wraps a connection pool, every connection handed out is timed and every statement executed on it is recorded
+    """
+
+    def __init__(self, pool, pool_name, metrics=None):
+        self._pool = pool
+        self.pool_name = pool_name
+        self.metrics = metrics if metrics is not None else get_pool_metrics(pool_name)
+
+    def connection(self, *args, **kwargs):
+        start = time.perf_counter()
+        connection = self._pool.connection(*args, **kwargs)
+        checkout_time = time.perf_counter()
+        self.metrics.record_checkout(checkout_time - start)
+        return InstrumentedConnection(connection, self.metrics, checkout_time)
+
+    def __getattr__(self, name):
+        return getattr(self._pool, name)
+
+
+_metrics_registry = {}
+_metrics_registry_lock = threading.Lock()
+
+
+def get_pool_metrics(pool_name):
+    """
+    Retrieve (create if not exists) the metrics store of a pool
+    """
+    with _metrics_registry_lock:
+        metrics = _metrics_registry.get(pool_name)
+        if metrics is None:
+            metrics = PoolMetrics(pool_name)
+            _metrics_registry[pool_name] = metrics
+        return metrics
+
+
+def instrument_pool(pool, pool_name):
+    """
+    Wrap an existing pool so that its connections and statements are recorded under pool_name
+    """
+    if isinstance(pool, InstrumentedPool):
+        return pool
+    return InstrumentedPool(pool, pool_name)
+
+
+def metrics_snapshot():
+    """
+    :return: dict of pool name to snapshot of all instrumented pools
+    """
+    with _metrics_registry_lock:
+        registered = list(_metrics_registry.values())
+    return {metrics.pool_name: metrics.snapshot() for metrics in registered}
+
+
+def metrics_prometheus_text():
+    with _metrics_registry_lock:
+        registered = list(_metrics_registry.values())
+    return _format_prometheus_families([metrics.prometheus_families() for metrics in registered])
+
+
+class MetricsDumper:
+    """
+    Periodically dump the metrics of all instrumented pools to the log and/or to a Prometheus textfile
+    (for the node_exporter textfile collector).
+    """
+
+    def __init__(self, interval=60, textfile_path=None, log=True):
+        """
+        :param interval: seconds between two dumps
+        :param textfile_path: path of the .prom file to be (atomically) rewritten on every dump, None to skip
+        :param log: if True log a summary of every pool on each dump
+        """
+        self.interval = interval
+        self.textfile_path = textfile_path
+        self.log = log
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return self
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="db_adapter_metrics_dumper", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, dump=True):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        if dump:
+            self.dump()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.dump()
+            except Exception:
+                logger.exception("Dumping db adapter metrics failed")
+
+    def dump(self):
+        if self.log:
+            for pool_name, snapshot in metrics_snapshot().items():
+                logger.info("Pool {} :: checkouts={}, mean wait={:.4f}s, max wait={:.4f}s, mean hold={:.4f}s, "
+                            "in progress={}".format(pool_name, snapshot['checkout_wait']['count'],
+                        snapshot['checkout_wait']['mean'], snapshot['checkout_wait']['max'],
+                        snapshot['hold_time']['mean'], snapshot['checkouts_in_progress']))
+                for template, stats in snapshot['statements'].items():
+                    logger.info("Pool {} :: calls={}, mean={:.4f}s, max={:.4f}s, errors={}, rows returned={}, "
+                                "rows affected={} :: {}".format(pool_name, stats['latency']['count'],
+                            stats['latency']['mean'], stats['latency']['max'], stats['errors'],
+                            stats['rows_returned'], stats['rows_affected'], template))
+
+        if self.textfile_path is not None:
+            temp_path = "{}.{}.tmp".format(self.textfile_path, os.getpid())
+            with open(temp_path, 'w') as f:
+                f.write(metrics_prometheus_text())
+            os.replace(temp_path, self.textfile_path)
@@ -0,0 +1,257 @@
+import copy
+import functools
+import itertools
+import inspect
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from enum import Enum
+
+# all caches created in the process, by name
+_caches = {}
+_caches_lock = threading.Lock()
+
+# stable identities of the pools keyed by the caches (id() values are reused once a pool is garbage collected)
+_pool_tokens = weakref.WeakKeyDictionary()
+_pinned_pool_tokens = {}
+_pool_token_counter = itertools.count(1)
+_pool_tokens_lock = threading.Lock()
+
+DEFAULT_MAXSIZE = 4096
+DEFAULT_TTL = 3600  # seconds
+
+
+class LookupCache:
+    """
+    Bounded LRU cache with per entry TTL expiry for metadata lookups (station, source, variable, unit ids),
+    which rarely change but are looked up once per station per run by the ingestion scripts.
+    """
+
+    def __init__(self, name, maxsize=DEFAULT_MAXSIZE, ttl=DEFAULT_TTL):
+        """
+        :param name: cache name, e.g. 'curw_fcst.unit'
+        :param maxsize: maximum number of entries, least recently used entries are evicted beyond it
+        :param ttl: seconds an entry is served before it is looked up again (None means no expiry)
+        """
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.enabled = True
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+        with _caches_lock:
+            _caches[name] = self
+
+    def get(self, key):
+        """
+        :return: (found, value) tuple
+        """
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at is None or expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return True, value
+                del self._entries[key]
+            self.misses += 1
+            return False, None
+
+    def put(self, key, value):
+
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self):
+        """
+        Drop all the entries
+        """
+        with self._lock:
+            self._entries.clear()
+            self.invalidations += 1
+
+    def configure(self, maxsize=None, ttl=None, enabled=None):
+
+        with self._lock:
+            if maxsize is not None:
+                self.maxsize = maxsize
+            if ttl is not None:
+                self.ttl = ttl
+            if enabled is not None:
+                self.enabled = enabled
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                    'size'         : len(self._entries),
+                    'maxsize'      : self.maxsize,
+                    'ttl'          : self.ttl,
+                    'hits'         : self.hits,
+                    'misses'       : self.misses,
+                    'evictions'    : self.evictions,
+                    'invalidations': self.invalidations
+                    }
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def _normalize(value):
+    # enum members (e.g. aenum NoAlias StationEnum members) are keyed by type and name
+    if isinstance(value, Enum):
+        return type(value).__name__, value.name
+    return value
+
+
+def _pool_token(pool):
+    """
+    :return: number identifying the pool for as long as the process runs, never given to another pool
+    """
+
+    with _pool_tokens_lock:
+        try:
+            token = _pool_tokens.get(pool)
+            if token is None:
+                token = _pool_tokens[pool] = next(_pool_token_counter)
+            return token
+        except TypeError:
+            # not weak referenceable: the pool is kept alive, so that its id is not reused
+            entry = _pinned_pool_tokens.get(id(pool))
+            if entry is None:
+                entry = _pinned_pool_tokens[id(pool)] = (pool, next(_pool_token_counter))
+            return entry[1]
+
+
+def _copy_value(value):
+    # cached dicts (e.g. source parameters) are shared between callers, each gets its own copy
+    if isinstance(value, (dict, list)):
+        return copy.deepcopy(value)
+    return value
+
+
+def _make_key(function, signature, args, kwargs):
+
+    bound = signature.bind(*args, **kwargs)
+    bound.apply_defaults()
+    arguments = bound.arguments
+    return (function.__name__, _pool_token(arguments['pool'])) + \
+        tuple(_normalize(value) for name, value in arguments.items() if name != 'pool')
+
+
+def cached_lookup(cache):
+    """
+    Decorator caching the results of a lookup function taking the connection pool as its first (pool)
+    argument. Entries are keyed by the pool identity and the normalized remaining arguments, and dict or list
+    results are copied in and out of the cache. None results (i.e. not found) are not cached, so that newly
+    added rows are found on the next call.
+    """
+
+    def decorator(function):
+        signature = inspect.signature(function)
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not cache.enabled:
+                return function(*args, **kwargs)
+
+            key = _make_key(function, signature, args, kwargs)
+
+            found, value = cache.get(key)
+            if found:
+                return _copy_value(value)
+
+            value = function(*args, **kwargs)
+            if value is not None:
+                cache.put(key, _copy_value(value))
+            return value
+
+        wrapper.cache = cache
+        return wrapper
+
+    return decorator
+
+
+def cached_async_lookup(cache):
+    """
+    cached_lookup for coroutine functions (db_adapter.aio). Sharing the cache of the matching synchronous
+    lookup lets the synchronous add/delete helpers invalidate the async entries too.
+    """
+
+    def decorator(function):
+        signature = inspect.signature(function)
+
+        @functools.wraps(function)
+        async def wrapper(*args, **kwargs):
+            if not cache.enabled:
+                return await function(*args, **kwargs)
+
+            key = _make_key(function, signature, args, kwargs)
+
+            found, value = cache.get(key)
+            if found:
+                return _copy_value(value)
+
+            value = await function(*args, **kwargs)
+            if value is not None:
+                cache.put(key, _copy_value(value))
+            return value
+
+        wrapper.cache = cache
+        return wrapper
+
+    return decorator
+
+
+def invalidates(cache):
+    """
+    Decorator invalidating the cache after the decorated (add/delete) function runs, whether it succeeds or not
+    """
+
+    def decorator(function):
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            try:
+                return function(*args, **kwargs)
+            finally:
+                cache.invalidate()
+
+        return wrapper
+
+    return decorator
+
+
+def get_lookup_cache(name):
+    with _caches_lock:
+        return _caches.get(name)
+
+
+def lookup_cache_stats():
+    """
+    :return: dict of cache name to hit/miss/eviction counters of all the lookup caches
+    """
+    with _caches_lock:
+        caches = list(_caches.values())
+    return {cache.name: cache.stats() for cache in caches}
+
+
+def invalidate_all_lookup_caches():
+    with _caches_lock:
+        caches = list(_caches.values())
+    for cache in caches:
+        cache.invalidate()
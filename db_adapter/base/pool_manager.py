@@ -0,0 +1,247 @@
+import threading
+import time
+
+import pymysql
+from DBUtils.PooledDB import PooledDB
+
+from db_adapter.logger import logger
+from db_adapter.constants import connection as db_config
+from db_adapter.base.instrumentation import instrument_pool
+
+
+CURW_FCST = "curw_fcst"
+CURW_OBS = "curw_obs"
+CURW_SIM = "curw_sim"
+
+
+class ManagedPool(PooledDB):
+    """
+    PooledDB which remembers when each cached connection became idle, so that connections idling for longer
+    than max_idle_time can be closed (reaped) while keeping at least mincached connections warm.
+    """
+
+    def __init__(self, creator, mincached=0, maxcached=0, maxconnections=4, blocking=True, maxusage=None,
+                 max_idle_time=None, name=None, **kwargs):
+        # must be set before PooledDB.__init__, which warms up the mincached connections through cache()
+        self.name = name
+        self._min_cached = mincached or 0
+        self._max_idle_time = max_idle_time
+
+        PooledDB.__init__(self, creator, mincached=mincached, maxcached=maxcached, maxconnections=maxconnections,
+                blocking=blocking, maxusage=maxusage, **kwargs)
+
+    def cache(self, con):
+        """
+        Put a dedicated connection back into the idle cache and stamp the time it became idle
+        """
+        con._idle_since = time.time()
+        PooledDB.cache(self, con)
+
+    def reap_idle_connections(self):
+        """
+        Close cached connections which have been idle for longer than max_idle_time.
+        At least mincached connections are left in the idle cache.
+        :return: number of connections closed
+        """
+
+        if not self._max_idle_time:
+            return 0
+
+        expired_before = time.time() - self._max_idle_time
+        reaped = []
+
+        with self._lock:
+            # idle cache is FIFO, i.e. the connection idling for the longest time is at the front
+            while len(self._idle_cache) > self._min_cached and \
+                    getattr(self._idle_cache[0], '_idle_since', 0) < expired_before:
+                reaped.append(self._idle_cache.pop(0))
+
+        for con in reaped:
+            try:
+                con.close()
+            except Exception:
+                pass
+
+        if len(reaped) > 0:
+            logger.debug("Reaped {} idle connections from pool {}".format(len(reaped), self.name))
+
+        return len(reaped)
+
+    def idle_count(self):
+        return len(self._idle_cache)
+
+    def in_use_count(self):
+        return self._connections
+
+
+class PoolManager:
+    """
+    Registry of named connection pools.
+    A process opens the pool of each schema once and every caller asking for the same name shares it.
+    """
+
+    def __init__(self, reap_interval=60):
+        self._pools = {}
+        self._lock = threading.RLock()
+        self._reap_interval = reap_interval
+        self._reaper = None
+        self._stop_reaper = threading.Event()
+
+    def register_pool(self, name, host, port, user, password, db, mincached=0, maxcached=0, maxconnections=4,
+                      blocking=True, maxusage=None, max_idle_time=None, instrument=False, **connect_kwargs):
+        """
+        Create a pool and register it under the given name. If a pool is already registered under the name,
+        the existing pool is returned.
+        :param name: pool name (e.g. 'curw_fcst')
+        :param mincached: number of connections opened (warmed up) when the pool is created
+        :param maxcached: maximum number of idle connections kept in the pool (0 means unlimited)
+        :param maxconnections: maximum number of connections allowed (0 means unlimited)
+        :param blocking: if True wait for a free connection when maxconnections is reached, else raise
+        :param maxusage: maximum number of reuses of a single connection before it is recycled (None means unlimited)
+        :param max_idle_time: seconds a cached connection may stay idle before it is reaped (None disables reaping)
+        :param instrument: if True the registered pool records connection and statement metrics under the name
+        :param connect_kwargs: additional pymysql.connect arguments, e.g. local_infile=True
+        :return: ManagedPool (InstrumentedPool wrapping it, if instrument is True)
+        """
+
+        with self._lock:
+            if name in self._pools:
+                return self._pools[name]
+
+            pool = ManagedPool(creator=pymysql, mincached=mincached, maxcached=maxcached,
+                    maxconnections=maxconnections, blocking=blocking, maxusage=maxusage,
+                    max_idle_time=max_idle_time, name=name,
+                    host=host, port=port, user=user, password=password, db=db, autocommit=False,
+                    cursorclass=pymysql.cursors.DictCursor, **connect_kwargs)
+            if instrument:
+                pool = instrument_pool(pool, name)
+            self._pools[name] = pool
+
+            logger.info("Connection pool {} created: mincached={}, maxcached={}, maxconnections={}, maxusage={}, "
+                        "max_idle_time={}, instrument={}".format(name, mincached, maxcached, maxconnections,
+                    maxusage, max_idle_time, instrument))
+
+            if max_idle_time:
+                self._start_reaper()
+
+            return pool
+
+    def get_pool(self, name):
+        """
+        Retrieve a registered pool. Pools of the curw_fcst, curw_obs and curw_sim schemas are created on first use
+        with the connection details and pool sizing read from db_adapter_config.json.
+        :param name: pool name
+        :return: ManagedPool
+        """
+
+        with self._lock:
+            if name in self._pools:
+                return self._pools[name]
+
+            schema_config = get_schema_config(name)
+            if schema_config is None:
+                raise KeyError("No connection pool registered under the name {}".format(name))
+
+            connection_details, pool_config = schema_config
+            kwargs = dict(connection_details)
+            kwargs.update(pool_config)
+            return self.register_pool(name, **kwargs)
+
+    def close_pool(self, name):
+
+        with self._lock:
+            pool = self._pools.pop(name, None)
+
+        if pool is not None:
+            pool.close()
+
+    def close_all(self):
+
+        with self._lock:
+            names = list(self._pools.keys())
+
+        for name in names:
+            self.close_pool(name)
+
+        self._stop_reaper.set()
+
+    def reap_idle_connections(self):
+        """
+        Reap idle connections of all the registered pools
+        :return: number of connections closed
+        """
+
+        with self._lock:
+            pools = list(self._pools.values())
+
+        return sum(pool.reap_idle_connections() for pool in pools)
+
+    def stats(self):
+        """
+        :return: dict of pool name to {'idle': .., 'in_use': ..} connection counts
+        """
+
+        with self._lock:
+            return {name: {'idle': pool.idle_count(), 'in_use': pool.in_use_count()}
+                    for name, pool in self._pools.items()}
+
+    def _start_reaper(self):
+
+        if self._reaper is not None and self._reaper.is_alive():
+            return
+
+        self._stop_reaper.clear()
+        self._reaper = threading.Thread(target=self._reap_loop, name="db_adapter_pool_reaper", daemon=True)
+        self._reaper.start()
+
+    def _reap_loop(self):
+
+        while not self._stop_reaper.wait(self._reap_interval):
+            try:
+                self.reap_idle_connections()
+            except Exception:
+                logger.exception("Reaping idle connections failed")
+
+
+def get_schema_config(schema):
+    """
+    Read connection details and pool sizing of a schema from constants.connection
+    :param schema: one of 'curw_fcst', 'curw_obs', 'curw_sim'
+    :return: (connection details dict, pool config dict) tuple, None if the schema is unknown
+    """
+
+    prefix = {
+            CURW_FCST: 'CURW_FCST',
+            CURW_OBS : 'CURW_OBS',
+            CURW_SIM : 'CURW_SIM'
+            }.get(schema)
+
+    if prefix is None:
+        return None
+
+    # read through the module so that values reloaded by set_db_config_file_path are picked up
+    connection_details = {
+            'host'    : getattr(db_config, prefix + '_HOST'),
+            'port'    : int(getattr(db_config, prefix + '_PORT')),
+            'user'    : getattr(db_config, prefix + '_USERNAME'),
+            'password': getattr(db_config, prefix + '_PASSWORD'),
+            'db'      : getattr(db_config, prefix + '_DATABASE')
+            }
+
+    return connection_details, dict(getattr(db_config, prefix + '_POOL_CONFIG'))
+
+
+pool_manager = PoolManager()
+
+
+def get_schema_Pool(schema):
+    """
+    Retrieve the shared pool of the given schema from the process wide pool manager
+    :param schema: one of 'curw_fcst', 'curw_obs', 'curw_sim'
+    :return: ManagedPool
+    """
+    return pool_manager.get_pool(schema)
+
+
+def destroy_all_Pools():
+    pool_manager.close_all()
@@ -2,15 +2,36 @@
 
 import pymysql
 import traceback
-from DBUtils.PooledDB import PooledDB
 
 from db_adapter.logger import logger
+from db_adapter.base.pool_manager import ManagedPool
+from db_adapter.base.instrumentation import instrument_pool
 
 
-def get_Pool(host, port, user, password, db):
+def get_Pool(host, port, user, password, db, mincached=0, maxcached=0, maxconnections=4, blocking=True,
+             maxusage=None, max_idle_time=None, instrument=False, pool_name=None, local_infile=False):
+    """
+    Create a connection pool. Use db_adapter.base.get_schema_Pool to share a single pool per schema in a process.
+    :param mincached: number of connections opened (warmed up) when the pool is created
+    :param maxcached: maximum number of idle connections kept in the pool (0 means unlimited)
+    :param maxconnections: maximum number of connections allowed (0 means unlimited)
+    :param blocking: if True wait for a free connection when maxconnections is reached, else raise
+    :param maxusage: maximum number of reuses of a single connection before it is recycled (None means unlimited)
+    :param max_idle_time: seconds a cached connection may stay idle before reap_idle_connections() closes it
+    :param instrument: if True record checkout wait, hold time and statement latencies of the pool
+    (see db_adapter.base.instrumentation)
+    :param pool_name: name under which the metrics are recorded, defaults to the database name
+    :param local_infile: if True allow LOAD DATA LOCAL INFILE on the connections (see db_adapter.base.bulk_loader)
+    :return: connection pool
+    """
+
+    pool = ManagedPool(creator=pymysql, mincached=mincached, maxcached=maxcached, maxconnections=maxconnections,
+            blocking=blocking, maxusage=maxusage, max_idle_time=max_idle_time, name=pool_name or db,
+            host=host, port=port, user=user, password=password, db=db, autocommit=False, cursorclass=pymysql.cursors.DictCursor,
+            local_infile=local_infile)
 
-    pool = PooledDB(creator=pymysql, maxconnections=4, blocking=True,
-            host=host, port=port, user=user, password=password, db=db, autocommit=False, cursorclass=pymysql.cursors.DictCursor)
+    if instrument:
+        return instrument_pool(pool, pool_name or db)
 
     return pool
 
@@ -73,6 +94,46 @@ def execute_write_query(pool, query, params):
             connection.close()
 
 
+def execute_streaming_read_query(pool, query, params, block_size=None, as_dict=True, fetch_size=1000):
+    """
+    Execute a read query on a server side (unbuffered) cursor and lazily yield its results,
+    so that memory stays bounded regardless of the size of the result set.
+    The connection is held until the generator is exhausted or closed.
+
+    :param pool: connection pool
+    :param query: sql query with wild cards
+    :param params: tuple, parameters need to be passed in to the sql query
+    :param block_size: if given, yield lists of at most block_size rows instead of single rows
+    :param as_dict: if True rows are dicts (SSDictCursor), else tuples (SSCursor)
+    :param fetch_size: number of rows read from the socket at once when yielding single rows
+    :return: generator of rows (or of row blocks)
+    """
+
+    cursor_class = pymysql.cursors.SSDictCursor if as_dict else pymysql.cursors.SSCursor
+    chunk_size = block_size if block_size else fetch_size
+
+    connection = pool.connection()
+    try:
+        with connection.cursor(cursor_class) as cursor:
+            cursor.execute(query, params)
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                if block_size:
+                    yield rows
+                else:
+                    yield from rows
+    except Exception as exception:
+        error_message = "Streaming sql query {} with params {} failed".format(query, params)
+        logger.error(error_message)
+        traceback.print_exc()
+        raise exception
+    finally:
+        if connection is not None:
+            connection.close()
+
+
 # for bulk data retrieval
 def get_connection_for_iterable_cursor(host, port, user, password, db):
     return pymysql.connect(host=host, user=user, password=password, db=db, port=port,
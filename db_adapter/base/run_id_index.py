@@ -0,0 +1,196 @@
+import hashlib
+import math
+import threading
+
+from db_adapter.logger import logger
+from db_adapter.base.pymysql_base import execute_streaming_read_query
+
+
+class BloomFilter:
+    """
+    Fixed size bloom filter for string keys. Membership answers are either "definitely not present" (False)
+    or "probably present" (True, with a false positive rate of about error_rate at capacity).
+    """
+
+    def __init__(self, capacity, error_rate=0.001):
+        capacity = max(int(capacity), 1)
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.bit_count = max(int(-capacity * math.log(error_rate) / (math.log(2) ** 2)), 8)
+        self.hash_count = max(int(round(self.bit_count / capacity * math.log(2))), 1)
+        self._bits = bytearray((self.bit_count + 7) // 8)
+
+    def _positions(self, key):
+        # double hashing: k positions derived from two 64 bit halves of a single digest
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.bit_count for i in range(self.hash_count)]
+
+    def add(self, key):
+        for position in self._positions(key):
+            self._bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key):
+        for position in self._positions(key):
+            if not self._bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+
+class RunIdIndex:
+    """
+    In-memory index of the ids of a run table (run, tide_run, dis_run, wl_run), loaded with a single query,
+    to answer "does this timeseries id exist" without a round trip per id.
+
+    With keep_ids=True (default) lookups are answered by the exact set of ids. To save memory on very large tables
+    (keep_ids=False), only a bloom filter is kept: negatives are answered locally and positives are confirmed
+    against the database.
+    Ids inserted through the Timeseries classes holding the index are added to it. Ids inserted by other
+    processes are not seen until reload().
+    e.g.:
+        index = RunIdIndex(pool, table='run').load()
+        ts = Timeseries(pool, run_id_index=index)
+    """
+
+    def __init__(self, pool, table='run', keep_ids=True, error_rate=0.001, headroom=2.0):
+        """
+        :param pool: connection pool of the schema of the run table
+        :param table: run table name
+        :param keep_ids: if True keep the exact set of ids in memory, else confirm bloom filter hits with a query
+        :param error_rate: bloom filter false positive rate (keep_ids=False only)
+        :param headroom: bloom filter capacity as a multiple of the number of ids loaded, leaves room for ids
+        added after loading
+        """
+        self.pool = pool
+        self.table = table
+        self.keep_ids = keep_ids
+        self.error_rate = error_rate
+        self.headroom = headroom
+
+        self._lock = threading.RLock()
+        self._bloom = None
+        self._ids = None
+        self._id_count = 0
+        self.loaded = False
+
+    def load(self):
+        """
+        Load (or reload) all the ids of the run table
+        :return: self
+        """
+
+        ids = set()
+        for block in execute_streaming_read_query(self.pool, "SELECT `id` FROM `{}`".format(self.table), None,
+                block_size=10000, as_dict=False):
+            ids.update(row[0] for row in block)
+
+        bloom = None
+        if not self.keep_ids:
+            bloom = BloomFilter(capacity=max(len(ids) * self.headroom, 1024), error_rate=self.error_rate)
+            for id_ in ids:
+                bloom.add(id_)
+
+        with self._lock:
+            self._bloom = bloom
+            self._ids = ids if self.keep_ids else None
+            self._id_count = len(ids)
+            self.loaded = True
+
+        logger.info("Loaded {} ids of the {} table to the run id index".format(len(ids), self.table))
+        return self
+
+    def reload(self):
+        return self.load()
+
+    def _exists_in_db(self, id_):
+
+        connection = self.pool.connection()
+        try:
+            with connection.cursor() as cursor:
+                is_exist = cursor.execute("SELECT 1 FROM `{}` WHERE `id`=%s".format(self.table), id_)
+            return is_exist > 0
+        finally:
+            if connection is not None:
+                connection.close()
+
+    def contains_local(self, id_):
+        """
+        Answer a lookup from memory only, without loading the index or querying the database (for callers that
+        must not block, e.g. the asyncio classes)
+        :param id_: timeseries id
+        :return: True or False, or None if the answer needs the database (index not loaded, or a bloom filter hit
+        with keep_ids=False)
+        """
+
+        with self._lock:
+            if not self.loaded:
+                return None
+            if self._ids is not None:
+                return id_ in self._ids
+            if id_ not in self._bloom:
+                return False
+        return None
+
+    def contains(self, id_):
+        """
+        :param id_: timeseries id
+        :return: True if the id exists in the run table, False otherwise
+        """
+
+        if not self.loaded:
+            self.load()
+
+        exists = self.contains_local(id_)
+        if exists is not None:
+            return exists
+
+        return self._exists_in_db(id_)
+
+    def __contains__(self, id_):
+        return self.contains(id_)
+
+    def add(self, id_):
+        """
+        Record an id inserted to the run table
+        """
+
+        if not self.loaded:
+            return
+
+        with self._lock:
+            if self._ids is not None:
+                self._ids.add(id_)
+                self._id_count = len(self._ids)
+                return
+
+            if id_ in self._bloom:
+                return  # already recorded (or a false positive, which does not fill the filter either)
+            self._bloom.add(id_)
+            self._id_count += 1
+            if self._id_count == self._bloom.capacity + 1:
+                logger.info("Run id index of the {} table is over capacity, false positive rate is rising, "
+                        "reload() to resize".format(self.table))
+
+    def discard(self, id_):
+        """
+        Record an id deleted from the run table. The bloom filter keeps the id, so without the exact set
+        the lookups of the id fall back to the database.
+        """
+
+        if not self.loaded:
+            return
+
+        with self._lock:
+            if self._ids is not None:
+                self._ids.discard(id_)
+                self._id_count = len(self._ids)
+            elif self._id_count > 0:
+                self._id_count -= 1
+
+    def __len__(self):
+        """
+        :return: number of ids (approximate with keep_ids=False)
+        """
+        with self._lock:
+            return self._id_count
@@ -0,0 +1,83 @@
+import traceback
+from datetime import datetime
+
+from db_adapter.logger import logger
+from db_adapter.constants import COMMON_DATE_TIME_FORMAT
+
+# (id, date) pairs per UPDATE statement
+WATERMARK_CHUNK_SIZE = 1000
+
+
+def reduce_watermarks(updates, later=True):
+    """
+    Reduce (id, date) pairs to a single date per id: the latest (later=True) or the earliest date
+    :param updates: iterable of (id, date) pairs, dates as datetime or 'YYYY-MM-DD HH:MM:SS' strings
+    :return: dict of id to date
+    """
+
+    reduced = {}
+    for id_, date in updates:
+        if date is None:
+            continue
+        if type(date) is str:
+            date = datetime.strptime(date, COMMON_DATE_TIME_FORMAT)
+        existing = reduced.get(id_)
+        if existing is None or (date > existing if later else date < existing):
+            reduced[id_] = date
+
+    return reduced
+
+
+def update_watermarks(connection, table, column, updates, later=True, chunk_size=WATERMARK_CHUNK_SIZE):
+    """
+    Move a date column of many rows forward (later=True: GREATEST) or backward (later=False: LEAST) in one
+    statement per chunk_size ids. The new dates are joined to the table as a UNION ALL derived table, and the
+    comparison happens server side, so concurrent writers can not move a watermark the wrong way.
+    Nothing is committed (the caller owns the transaction).
+    :param connection: database connection
+    :param table: table name, e.g. 'run'
+    :param column: date column, e.g. 'end_date'
+    :param updates: iterable of (id, date) pairs, reduced to one date per id before sending
+    :param later: True to keep the latest date, False to keep the earliest date
+    :return: number of rows changed
+    """
+
+    reduced = list(reduce_watermarks(updates, later=later).items())
+    function = "GREATEST" if later else "LEAST"
+
+    row_count = 0
+    with connection.cursor() as cursor:
+        for chunk_start in range(0, len(reduced), chunk_size):
+            chunk = reduced[chunk_start:chunk_start + chunk_size]
+
+            derived_table = "SELECT %s AS `id`, CAST(%s AS DATETIME) AS `date`" + \
+                            " UNION ALL SELECT %s, CAST(%s AS DATETIME)" * (len(chunk) - 1)
+            sql_statement = "UPDATE `{0}` INNER JOIN ({2}) AS `watermark` ON `{0}`.`id`=`watermark`.`id` " \
+                            "SET `{0}`.`{1}`={3}(COALESCE(`{0}`.`{1}`, `watermark`.`date`), `watermark`.`date`)"\
+                .format(table, column, derived_table, function)
+
+            row_count += cursor.execute(sql_statement, [value for pair in chunk for value in pair])
+
+    return row_count
+
+
+def apply_watermarks(pool, table, column, updates, later=True):
+    """
+    update_watermarks on a pooled connection, in its own transaction
+    :return: number of rows changed, else raise the exception
+    """
+
+    connection = pool.connection()
+    try:
+        row_count = update_watermarks(connection, table, column, updates, later=later)
+        connection.commit()
+        return row_count
+    except Exception as exception:
+        connection.rollback()
+        error_message = "Updating {} of the {} table failed.".format(column, table)
+        logger.error(error_message)
+        traceback.print_exc()
+        raise exception
+    finally:
+        if connection is not None:
+            connection.close()
@@ -34,6 +34,27 @@ CURW_SIM_HOST = ''
 CURW_SIM_PORT = ''
 CURW_SIM_DATABASE = ''
 
+# ---------- Connection Pool Settings --------------
+# mincached: connections opened at pool creation, maxcached: max idle connections kept (0 = unlimited),
+# maxconnections: max connections allowed (0 = unlimited), maxusage: reuses before a connection is recycled,
+# max_idle_time: seconds an idle connection is kept before being reaped,
+# instrument: record connection wait/hold times and statement latencies (db_adapter.base.instrumentation),
+# local_infile: allow LOAD DATA LOCAL INFILE on the connections (db_adapter.base.bulk_loader)
+DEFAULT_POOL_CONFIG = {
+        'mincached'     : 0,
+        'maxcached'     : 0,
+        'maxconnections': 4,
+        'blocking'      : True,
+        'maxusage'      : None,
+        'max_idle_time' : None,
+        'instrument'    : False,
+        'local_infile'  : False
+        }
+
+CURW_FCST_POOL_CONFIG = dict(DEFAULT_POOL_CONFIG)
+CURW_OBS_POOL_CONFIG = dict(DEFAULT_POOL_CONFIG)
+CURW_SIM_POOL_CONFIG = dict(DEFAULT_POOL_CONFIG)
+
 
 def set_variables():
 
@@ -55,6 +76,10 @@ def set_variables():
     global CURW_SIM_PORT
     global CURW_SIM_DATABASE
 
+    global CURW_FCST_POOL_CONFIG
+    global CURW_OBS_POOL_CONFIG
+    global CURW_SIM_POOL_CONFIG
+
     config = json.loads(open(DB_CONFIG_FILE_PATH).read())
 
     # ---------- CUrW Fcst Database --------------FileNotFoundError
@@ -78,6 +103,11 @@ def set_variables():
     CURW_SIM_PORT = read_attribute_from_config_file('CURW_SIM_PORT', config)
     CURW_SIM_DATABASE = read_attribute_from_config_file('CURW_SIM_DATABASE', config)
 
+    # ---------- Connection Pool Settings --------------
+    CURW_FCST_POOL_CONFIG = read_pool_config_from_config_file('CURW_FCST_POOL', config)
+    CURW_OBS_POOL_CONFIG = read_pool_config_from_config_file('CURW_OBS_POOL', config)
+    CURW_SIM_POOL_CONFIG = read_pool_config_from_config_file('CURW_SIM_POOL', config)
+
 
 def read_attribute_from_config_file(attribute, config):
     """
@@ -91,6 +121,26 @@ def read_attribute_from_config_file(attribute, config):
         logger.error("{} not specified in config file.".format(attribute))
 
 
+def read_pool_config_from_config_file(attribute, config):
+    """
+    Pool settings are optional, missing settings fall back to DEFAULT_POOL_CONFIG
+    :param attribute: key name of the pool settings object in the config json file
+    e.g.: "CURW_FCST_POOL": {"mincached": 2, "maxconnections": 20, "maxusage": 1000, "max_idle_time": 300}
+    :param config: loaded json file
+    :return: dict of pool settings
+    """
+    pool_config = dict(DEFAULT_POOL_CONFIG)
+
+    if attribute in config and isinstance(config[attribute], dict):
+        for key in config[attribute].keys():
+            if key in DEFAULT_POOL_CONFIG:
+                pool_config[key] = config[attribute][key]
+            else:
+                logger.warning("Unknown pool setting {} in {} of config file.".format(key, attribute))
+
+    return pool_config
+
+
 def set_db_config_file_path(db_config_file_path):
     global DB_CONFIG_FILE_PATH
 
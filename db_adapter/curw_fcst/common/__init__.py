@@ -1,2 +1,3 @@
 from .common import get_curw_fcst_hash_ids
 from .common import get_distinct_fgts_for_given_id
+from .run_query import RunQuery
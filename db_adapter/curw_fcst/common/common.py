@@ -1,74 +1,30 @@
 import traceback
 
 from db_adapter.logger import logger
+from db_adapter.curw_fcst.common.run_query import RunQuery
 
 
 def get_curw_fcst_hash_ids(pool, sim_tag=None, source_id=None, variable_id=None, unit_id=None, station_id=None,
                            start=None, end=None):
+    """
+    Retrieve the ids of the runs matching the given parameters. Each parameter is a value, or a list of values.
+    See RunQuery for date ranges and paginated reads.
+    :return: list of ids, None if no parameter is given
+    """
 
-    pre_sql_statement = "SELECT `id` FROM `run` WHERE "
+    query = RunQuery(pool, sim_tag=sim_tag, source=source_id, variable=variable_id, unit=unit_id,
+            station=station_id, start_date=start, end_date=end)
 
-    condition_list = []
-    variable_list = []
-
-    score = 0
-
-    if sim_tag is not None:
-        condition_list.append("`sim_tag`=%s")
-        variable_list.append(sim_tag)
-        score +=1
-    if source_id is not None:
-        condition_list.append("`source`=%s")
-        variable_list.append(source_id)
-        score +=1
-    if variable_id is not None:
-        condition_list.append("`variable`=%s")
-        variable_list.append(variable_id)
-        score +=1
-    if unit_id is not None:
-        condition_list.append("`unit`=%s")
-        variable_list.append(unit_id)
-        score +=1
-    if station_id is not None:
-        condition_list.append("`station`=%s")
-        variable_list.append(station_id)
-        score +=1
-    if start is not None:
-        condition_list.append("`start_date`=%s")
-        variable_list.append(start)
-        score +=1
-    if end is not None:
-        condition_list.append("`end_date`=%s")
-        variable_list.append(end)
-        score +=1
-
-    if score == 0:
+    if query.is_empty():
         return None
 
-    conditions = " AND ".join(condition_list)
-
-    sql_statement = pre_sql_statement + conditions + ";"
-
-    print(sql_statement)
-
-    ids = []
-    connection = pool.connection()
     try:
-        with connection.cursor() as cursor:
-            row_count = cursor.execute(sql_statement, tuple(variable_list))
-            if row_count > 0:
-                results = cursor.fetchall()
-                for result in results:
-                    ids.append(result.get('id'))
-        return ids
+        return query.ids()
     except Exception as exception:
-        error_message = "Exception occurred while retrieving hash ids. ::: ".format(' '.join(condition_list))
+        error_message = "Exception occurred while retrieving hash ids. ::: {}".format(query.sql())
         logger.error(error_message)
         traceback.print_exc()
         raise exception
-    finally:
-        if connection is not None:
-            connection.close()
 
 
 def get_distinct_fgts_for_given_id(pool, id_):
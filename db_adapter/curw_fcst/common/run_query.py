@@ -0,0 +1,171 @@
+import traceback
+from functools import lru_cache
+
+import numpy as np
+
+from db_adapter.logger import logger
+from db_adapter.base.pymysql_base import execute_streaming_read_query
+
+DEFAULT_PAGE_SIZE = 10000
+
+
+@lru_cache(maxsize=256)
+def _compile(conditions, paginated):
+    """
+    Build (and cache) the sql statement of a query shape
+    :param conditions: tuple of (column, operator, number of values) tuples
+    :param paginated: if True the statement continues after a given id and is limited to a page
+    :return: sql statement
+    """
+
+    condition_list = []
+    for column, operator, value_count in conditions:
+        if operator == 'IN' and value_count == 0:
+            condition_list.append("FALSE")  # empty IN list, matches no run
+        elif operator == 'IN':
+            condition_list.append("`{}` IN ({})".format(column, ", ".join(["%s"] * value_count)))
+        else:
+            condition_list.append("`{}`{}%s".format(column, operator))
+
+    if paginated:
+        condition_list.append("`id`>%s")
+
+    sql_statement = "SELECT `id` FROM `run`"
+    if len(condition_list) > 0:
+        sql_statement += " WHERE " + " AND ".join(condition_list)
+    sql_statement += " ORDER BY `id`"
+    if paginated:
+        sql_statement += " LIMIT %s"
+
+    return sql_statement
+
+
+class RunQuery:
+    """
+    Set based selection of curw_fcst timeseries ids from the run table.
+    Every filter accepts a single value (equality) or a list / tuple / set of values (IN list), and the start_date
+    and end_date columns also accept inclusive ranges. An empty list matches no run (no query is sent). The statement of each query shape (filters used and IN list
+    lengths) is compiled once and cached.
+    e.g.:
+        query = RunQuery(pool, sim_tag='evening_18hrs', station=[100001, 100002], variable=1,
+                         end_date_from='2019-07-01 00:00:00')
+        for ids in query.pages(page_size=10000):
+            ...
+        ids = query.to_array()
+    """
+
+    FILTER_COLUMNS = ('sim_tag', 'source', 'variable', 'unit', 'station', 'start_date', 'end_date')
+
+    def __init__(self, pool, sim_tag=None, source=None, variable=None, unit=None, station=None, start_date=None,
+                 end_date=None, start_date_from=None, start_date_to=None, end_date_from=None, end_date_to=None):
+        """
+        :param pool: curw_fcst connection pool
+        :param sim_tag, source, variable, unit, station, start_date, end_date: value or list of values
+        :param start_date_from, start_date_to: optional, inclusive bounds of start_date
+        :param end_date_from, end_date_to: optional, inclusive bounds of end_date
+        """
+        self.pool = pool
+
+        conditions = []
+        values = []
+
+        filters = (sim_tag, source, variable, unit, station, start_date, end_date)
+        for column, value in zip(self.FILTER_COLUMNS, filters):
+            if value is None:
+                continue
+            if isinstance(value, (list, tuple, set, frozenset, np.ndarray)):
+                value = list(value)
+                conditions.append((column, 'IN', len(value)))
+                values.extend(value)
+            else:
+                conditions.append((column, '=', 1))
+                values.append(value)
+
+        for column, operator, bound in (('start_date', '>=', start_date_from), ('start_date', '<=', start_date_to),
+                                        ('end_date', '>=', end_date_from), ('end_date', '<=', end_date_to)):
+            if bound is not None:
+                conditions.append((column, operator, 1))
+                values.append(bound)
+
+        self.conditions = tuple(conditions)
+        self.values = tuple(values)
+
+    def is_empty(self):
+        """
+        :return: True if no filter is given (the query would select every run)
+        """
+        return len(self.conditions) == 0
+
+    def matches_nothing(self):
+        """
+        :return: True if a filter is an empty list, so that no run can match
+        """
+        return any(operator == 'IN' and value_count == 0 for _, operator, value_count in self.conditions)
+
+    def sql(self, paginated=False):
+        return _compile(self.conditions, paginated)
+
+    def pages(self, page_size=DEFAULT_PAGE_SIZE):
+        """
+        Keyset paginated ids: each page continues after the last id of the previous page, so that every page is
+        an index range scan, and no connection is held between two pages.
+        :param page_size: ids per page
+        :return: generator of lists of ids, ordered by id
+        """
+
+        if self.matches_nothing():
+            return
+
+        sql_statement = self.sql(paginated=True)
+        last_id = ''
+
+        while True:
+            connection = self.pool.connection()
+            try:
+                with connection.cursor() as cursor:
+                    cursor.execute(sql_statement, self.values + (last_id, page_size))
+                    ids = [row.get('id') for row in cursor.fetchall()]
+            except Exception as exception:
+                error_message = "Exception occurred while retrieving hash ids after id {}.".format(last_id)
+                logger.error(error_message)
+                traceback.print_exc()
+                raise exception
+            finally:
+                if connection is not None:
+                    connection.close()
+
+            if len(ids) > 0:
+                yield ids
+            if len(ids) < page_size:
+                return
+            last_id = ids[-1]
+
+    def iter_ids(self, page_size=DEFAULT_PAGE_SIZE):
+        """
+        :return: generator of ids, ordered by id, read page by page
+        """
+        for ids in self.pages(page_size=page_size):
+            for id_ in ids:
+                yield id_
+
+    def ids(self):
+        """
+        :return: list of all the matching ids, ordered by id
+        """
+        if self.matches_nothing():
+            return []
+
+        ids = []
+        for block in execute_streaming_read_query(self.pool, self.sql(), self.values, block_size=DEFAULT_PAGE_SIZE,
+                as_dict=False):
+            ids.extend(row[0] for row in block)
+        return ids
+
+    def to_array(self):
+        """
+        :return: numpy array of all the matching ids (fixed width unicode), ordered by id
+        """
+        ids = self.ids()
+        if len(ids) == 0:
+            return np.empty(0, dtype='U64')
+        return np.array(ids)
@@ -3,6 +3,7 @@ import traceback
 
 from db_adapter.exceptions import DatabaseAdapterError
 from db_adapter.logger import logger
+from db_adapter.base.lookup_cache import LookupCache, cached_lookup, invalidates
 """
 Source JSON Object would looks like this 
 e.g.:
@@ -24,6 +25,10 @@ e.g.:
 """
 
 
+# source lookups, invalidated whenever a source is added or deleted through this module
+source_cache = LookupCache(name='curw_fcst.source')
+
+
 def get_source_by_id(pool, id_):
     """
     Retrieve source by id
@@ -52,6 +57,7 @@ def get_source_by_id(pool, id_):
             connection.close()
 
 
+@cached_lookup(source_cache)
 def get_source_id(pool, model, version) -> str:
     """
     Retrieve Source id
@@ -81,6 +87,7 @@ def get_source_id(pool, model, version) -> str:
             connection.close()
 
 
+@invalidates(source_cache)
 def add_source(pool, model, version, parameters=None):
     """
     Insert sources into the database
@@ -143,6 +150,7 @@ def add_sources(sources, pool):
         print(source.get('model'))
 
 
+@invalidates(source_cache)
 def delete_source(pool, model, version):
     """
     Delete source from Source table, given model and version
@@ -175,6 +183,7 @@ def delete_source(pool, model, version):
             connection.close()
 
 
+@invalidates(source_cache)
 def delete_source_by_id(pool, id_):
     """
     Delete source from Source table by id
@@ -206,6 +215,7 @@ def delete_source_by_id(pool, id_):
             connection.close()
 
 
+@cached_lookup(source_cache)
 def get_source_parameters(pool, model, version):
     """
         Retrieve Source parameters
@@ -5,6 +5,7 @@ import pkg_resources
 from db_adapter.curw_fcst.station.station_enum import StationEnum
 from db_adapter.logger import logger
 from db_adapter.exceptions import DatabaseAdapterError
+from db_adapter.base.lookup_cache import LookupCache, cached_lookup, invalidates
 
 """
 Station JSON Object would looks like this 
@@ -19,6 +20,10 @@ e.g.:
 """
 
 
+# station lookups, invalidated whenever a station is added or deleted through this module
+station_cache = LookupCache(name='curw_fcst.station')
+
+
 def get_station_by_id(pool, id_):
     """
     Retrieve station by id
@@ -47,6 +52,7 @@ def get_station_by_id(pool, id_):
             connection.close()
 
 
+@cached_lookup(station_cache)
 def get_station_id(pool, latitude, longitude, station_type) -> str:
     """
     Retrieve station id
@@ -86,6 +92,7 @@ def get_station_id(pool, latitude, longitude, station_type) -> str:
             connection.close()
 
 
+@invalidates(station_cache)
 def add_station(pool, name, latitude, longitude, description, station_type):
     """
     Insert sources into the database
@@ -171,6 +178,7 @@ def add_stations(stations, pool):
         print(station.get('name'))
 
 
+@invalidates(station_cache)
 def delete_station(pool, latitude, longitude, station_type):
     """
     Delete station from Station table
@@ -213,6 +221,7 @@ def delete_station(pool, latitude, longitude, station_type):
             connection.close()
 
 
+@invalidates(station_cache)
 def delete_station_by_id(pool, id_):
     """
     Delete station from Station table by id
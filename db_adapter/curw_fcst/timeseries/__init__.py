@@ -1,2 +1,6 @@
 from .timeseries import Timeseries
-from .run_info_utils import insert_run_metadata, read_template
+from .run_info_utils import insert_run_metadata, read_template, store_template, \
+    create_template_table
+from .fgt_index import FgtIndex
+from .retention import RetentionPurge
+from .ingestion import FcstIngestionPipeline
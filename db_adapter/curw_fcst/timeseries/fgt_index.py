@@ -0,0 +1,133 @@
+import threading
+
+import numpy as np
+
+from db_adapter.logger import logger
+from db_adapter.base.pymysql_base import execute_streaming_read_query
+from db_adapter.base.columnar import to_datetime64
+
+# ids per IN list when loading the fgts of many ids
+LOAD_CHUNK_SIZE = 5000
+
+
+class FgtIndex:
+    """
+    In-memory index of the distinct fgts available in the data table for each timeseries id, used to resolve the
+    fgt nearest to an expected fgt without a stored procedure call (getNearestFGTs) per id.
+
+    The fgts of the requested ids are loaded with one set-based query (per LOAD_CHUNK_SIZE ids) and kept as sorted
+    datetime64 arrays, so that repeated hindcast sweeps over the same ids resolve fgts locally.
+    Fgts inserted after loading are not seen until add() or invalidate().
+    e.g.:
+        fgt_index = FgtIndex(pool)
+        fgts = fgt_index.resolve([(id_1, '2019-07-20 08:00:00'), (id_2, '2019-07-20 08:00:00')])
+    """
+
+    def __init__(self, pool):
+        self.pool = pool
+        self._fgts = {}
+        self._lock = threading.RLock()
+
+    def load(self, ids, reload=False):
+        """
+        Load the distinct fgts of the given ids (ids already loaded are skipped unless reload is True)
+        :param ids: iterable of timeseries ids
+        :return: number of ids loaded
+        """
+
+        with self._lock:
+            ids = list(dict.fromkeys(id_ for id_ in ids if reload or id_ not in self._fgts))
+
+        for chunk_start in range(0, len(ids), LOAD_CHUNK_SIZE):
+            chunk = ids[chunk_start:chunk_start + LOAD_CHUNK_SIZE]
+            sql_statement = "SELECT DISTINCT `id`, `fgt` FROM `data` WHERE `id` IN (" + \
+                            ", ".join(["%s"] * len(chunk)) + ") ORDER BY `id`, `fgt`;"
+
+            loaded = {id_: [] for id_ in chunk}
+            for block in execute_streaming_read_query(self.pool, sql_statement, tuple(chunk), block_size=10000,
+                    as_dict=False):
+                for id_, fgt in block:
+                    loaded[id_].append(fgt)
+
+            with self._lock:
+                for id_, fgts in loaded.items():
+                    self._fgts[id_] = np.array(fgts, dtype='datetime64[ns]')
+
+        if len(ids) > 0:
+            logger.debug("Loaded fgts of {} ids to the fgt index".format(len(ids)))
+
+        return len(ids)
+
+    def fgts(self, id_):
+        """
+        :return: sorted datetime64 array of the fgts of the id (loaded on first use)
+        """
+        if id_ not in self._fgts:
+            self.load([id_])
+        return self._fgts[id_]
+
+    def nearest(self, id_, expected_fgt, before_only=False):
+        """
+        Resolve the available fgt nearest to the expected fgt. Ties resolve to the earlier fgt.
+        :param id_: timeseries id
+        :param expected_fgt: datetime or 'YYYY-MM-DD HH:MM:SS' string
+        :param before_only: if True only fgts at or before the expected fgt are considered
+        :return: datetime64 fgt, None if there is no such fgt
+        """
+
+        fgts = self.fgts(id_)
+        if len(fgts) == 0:
+            return None
+
+        expected_fgt = to_datetime64(expected_fgt)
+        position = np.searchsorted(fgts, expected_fgt, side='right')  # fgts[position - 1] <= expected_fgt
+
+        before = fgts[position - 1] if position > 0 else None
+        if before_only:
+            return before
+
+        after = fgts[position] if position < len(fgts) else None
+        if before is None:
+            return after
+        if after is None:
+            return before
+        return before if expected_fgt - before <= after - expected_fgt else after
+
+    def resolve(self, requests, before_only=False):
+        """
+        Resolve the nearest fgts of many (id, expected_fgt) pairs. The ids not in the index yet are loaded in one go.
+        :param requests: list of (id, expected_fgt) tuples
+        :param before_only: if True only fgts at or before the expected fgts are considered
+        :return: list of datetime64 fgts (None where there is no fgt), in the order of the requests
+        """
+
+        self.load(id_ for id_, _ in requests)
+        return [self.nearest(id_, expected_fgt, before_only=before_only) for id_, expected_fgt in requests]
+
+    def add(self, id_, fgt):
+        """
+        Record a new fgt of an id (e.g. after inserting a new forecast), if the id is indexed
+        """
+
+        with self._lock:
+            fgts = self._fgts.get(id_)
+            if fgts is None:
+                return
+            fgt = to_datetime64(fgt)
+            position = np.searchsorted(fgts, fgt)
+            if position < len(fgts) and fgts[position] == fgt:
+                return
+            self._fgts[id_] = np.insert(fgts, position, fgt)
+
+    def invalidate(self, id_=None):
+        """
+        Drop the fgts of an id, or of all the ids if id_ is None
+        """
+        with self._lock:
+            if id_ is None:
+                self._fgts.clear()
+            else:
+                self._fgts.pop(id_, None)
+
+    def __len__(self):
+        return len(self._fgts)
@@ -0,0 +1,289 @@
+import time
+import queue
+import threading
+import traceback
+from datetime import datetime
+
+from db_adapter.logger import logger
+from db_adapter.constants import COMMON_DATE_TIME_FORMAT
+from db_adapter.base.bulk_writer import BulkWriter, WriteMode
+from db_adapter.base.watermarks import update_watermarks
+from db_adapter.curw_fcst.timeseries.timeseries import Timeseries
+
+# station ids per IN list when checking that the stations exist
+STATION_CHUNK_SIZE = 5000
+
+# seconds between two checks that a writer thread is still alive, while the task queue is full
+QUEUE_PUT_TIMEOUT = 5
+
+_STOP = object()
+
+
+class FcstIngestionPipeline:
+    """
+    Ingest one forecast run (e.g. a WRF run, ~16k grid points) with concurrent writers:
+        1. stations:  check that the stations exist, with one query per STATION_CHUNK_SIZE stations
+        2. hash:      timeseries ids of all the stations (optionally across processes)
+        3. runs:      register all the run rows with multi-row INSERT ... ON DUPLICATE KEY statements
+        4. data:      the data rows are cut into tasks of rows_per_task rows and queued to `writers` threads,
+                      each writing on its own pooled connection. The queue is bounded (queue_size tasks), so the
+                      producer blocks when the writers fall behind
+        5. watermarks: move the end_date / start_date of all the runs to the fgt, in one batched update each
+    The pool must allow at least writers + 1 connections.
+    e.g.:
+        pipeline = FcstIngestionPipeline(pool, writers=8)
+        report = pipeline.ingest(fgt, meta, {1100000: {'latitude': 5.722969, 'longitude': 79.521461,
+                                                       'timeseries': [[time, value], ...]}, ...})
+    """
+
+    def __init__(self, pool, writers=4, queue_size=16, rows_per_task=20000, batch_size=None, processes=None,
+                 upsert=True, run_id_index=None):
+        """
+        :param pool: curw_fcst connection pool
+        :param writers: number of concurrent writer connections
+        :param queue_size: maximum number of data tasks waiting for a writer (back-pressure)
+        :param rows_per_task: data rows per writer task (and transaction)
+        :param batch_size: rows per multi-row INSERT statement (default DEFAULT_BATCH_SIZE)
+        :param processes: worker processes for the id generation, None to hash in the calling process
+        :param boolean upsert: If True, upsert existing values ON DUPLICATE KEY. Default is True.
+        :param run_id_index: optional RunIdIndex, updated with the registered runs
+        """
+        self.pool = pool
+        self.writers = writers
+        self.queue_size = queue_size
+        self.rows_per_task = rows_per_task
+        self.batch_size = batch_size
+        self.processes = processes
+        self.upsert = upsert
+        self.run_id_index = run_id_index
+
+    def _existing_stations(self, station_ids):
+
+        existing = set()
+        connection = self.pool.connection()
+        try:
+            with connection.cursor() as cursor:
+                for chunk_start in range(0, len(station_ids), STATION_CHUNK_SIZE):
+                    chunk = station_ids[chunk_start:chunk_start + STATION_CHUNK_SIZE]
+                    sql_statement = "SELECT `id` FROM `station` WHERE `id` IN (" + \
+                                    ", ".join(["%s"] * len(chunk)) + ")"
+                    cursor.execute(sql_statement, tuple(chunk))
+                    existing.update(row.get('id') for row in cursor.fetchall())
+            return existing
+        finally:
+            if connection is not None:
+                connection.close()
+
+    def _register_runs(self, runs):
+
+        writer = BulkWriter(table='run', columns=('id', 'sim_tag', 'start_date', 'end_date', 'station', 'source',
+                                                  'variable', 'unit'),
+                mode=WriteMode.UPSERT, update_columns=('id',), batch_size=self.batch_size)
+
+        connection = self.pool.connection()
+        try:
+            writer.write(connection, runs)
+        except Exception:
+            connection.rollback()
+            raise
+        finally:
+            if connection is not None:
+                connection.close()
+
+    def _update_watermarks(self, fgts):
+
+        connection = self.pool.connection()
+        try:
+            update_watermarks(connection, 'run', 'end_date', fgts, later=True)
+            update_watermarks(connection, 'run', 'start_date', fgts, later=False)
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+        finally:
+            if connection is not None:
+                connection.close()
+
+    def _write_data(self, tasks):
+        """
+        Write the tasks (lists of data rows) through the writer threads
+        :return: (rows sent, number of tasks written)
+        """
+
+        writer = BulkWriter(table='data', columns=('id', 'time', 'fgt', 'value'),
+                mode=WriteMode.UPSERT if self.upsert else WriteMode.INSERT, batch_size=self.batch_size)
+
+        task_queue = queue.Queue(maxsize=self.queue_size)
+        lock = threading.Lock()
+        totals = {'rows': 0, 'tasks': 0}
+        errors = []
+
+        def record_error(exception):
+            with lock:
+                errors.append(exception)
+            traceback.print_exc()
+
+        def work():
+            connection = None
+            try:
+                connection = self.pool.connection()
+            except Exception as exception:
+                record_error(exception)  # keep draining the queue, so that the producer never blocks
+            try:
+                while True:
+                    rows = task_queue.get()
+                    try:
+                        if rows is _STOP:
+                            return
+                        if len(errors) > 0:
+                            continue  # drain the queue after a failure
+                        rows_sent = writer.write(connection, rows).rows_sent
+                        with lock:
+                            totals['rows'] += rows_sent
+                            totals['tasks'] += 1
+                    except Exception as exception:
+                        connection.rollback()
+                        record_error(exception)
+                    finally:
+                        task_queue.task_done()
+            finally:
+                if connection is not None:
+                    connection.close()
+
+        threads = [threading.Thread(target=work, name="db_adapter_fcst_writer_{}".format(i), daemon=True)
+                   for i in range(self.writers)]
+        for thread in threads:
+            thread.start()
+
+        def put(item):
+            """
+            Queue an item, waiting while the queue is full as long as a writer thread is alive
+            :return: False if no writer thread is left to take the item
+            """
+            while True:
+                try:
+                    task_queue.put(item, timeout=QUEUE_PUT_TIMEOUT)
+                    return True
+                except queue.Full:
+                    if not any(thread.is_alive() for thread in threads):
+                        return False
+
+        try:
+            for rows in tasks:
+                if len(errors) > 0:
+                    break
+                if not put(rows):  # blocks while queue_size tasks are waiting
+                    errors.append(RuntimeError("All the data writer threads of the pipeline exited."))
+                    break
+        finally:
+            for _ in threads:
+                if not put(_STOP):
+                    break
+            for thread in threads:
+                thread.join()
+
+        if len(errors) > 0:
+            raise errors[0]
+
+        return totals['rows'], totals['tasks']
+
+    def _tasks(self, stations, ids, fgt):
+
+        rows = []
+        for (station_id, station), tms_id in zip(stations, ids):
+            for t in station.get('timeseries'):
+                if len(t) > 1:
+                    rows.append((tms_id, t[0], fgt, t[1]))
+                else:
+                    logger.warning('Invalid timeseries data:: %s', t)
+            if len(rows) >= self.rows_per_task:
+                yield rows
+                rows = []
+        if len(rows) > 0:
+            yield rows
+
+    def ingest(self, fgt, meta, stations):
+        """
+        Ingest the timeseries of all the stations of a run
+        :param fgt: forecast generated time, datetime or 'YYYY-MM-DD HH:MM:SS' string
+        :param meta: dict with the run metadata common to all the stations:
+        'sim_tag', 'model', 'version', 'variable', 'unit', 'unit_type' (hashed into the ids) and
+        'source_id', 'variable_id', 'unit_id'
+        :param stations: dict of station id to dict with 'latitude', 'longitude' and 'timeseries'
+        (list of [time, value] lists)
+        :return: report dict with the number of 'stations', 'skipped_stations' (not in the station table),
+        'runs' (registered or already existing), 'rows', 'tasks', per stage 'timings' in seconds, 'elapsed' and
+        'rows_per_second'
+        """
+
+        if type(fgt) is str:
+            fgt = datetime.strptime(fgt, COMMON_DATE_TIME_FORMAT)
+
+        timings = {}
+        started = time.monotonic()
+        stage_started = started
+        stage = None
+
+        def end_stage(name):
+            nonlocal stage_started
+            now = time.monotonic()
+            timings[name] = now - stage_started
+            stage_started = now
+
+        try:
+            stage = 'stations'
+            existing = self._existing_stations(list(stations.keys()))
+            skipped = [station_id for station_id in stations.keys() if station_id not in existing]
+            if len(skipped) > 0:
+                logger.warning("Skipping {} stations missing in the station table, e.g. {}"
+                               .format(len(skipped), skipped[:5]))
+            station_items = [(station_id, station) for station_id, station in stations.items()
+                             if station_id in existing]
+            end_stage(stage)
+
+            stage = 'hash'
+            records = [dict(meta, latitude=station.get('latitude'), longitude=station.get('longitude'))
+                       for _, station in station_items]
+            ids = Timeseries.generate_timeseries_ids(records, processes=self.processes)
+            end_stage(stage)
+
+            stage = 'runs'
+            runs = [(tms_id, meta.get('sim_tag'), fgt, fgt, station_id, meta.get('source_id'),
+                     meta.get('variable_id'), meta.get('unit_id'))
+                    for (station_id, _), tms_id in zip(station_items, ids)]
+            self._register_runs(runs)
+            if self.run_id_index is not None:
+                for tms_id in ids:
+                    self.run_id_index.add(tms_id)
+            end_stage(stage)
+
+            stage = 'data'
+            row_count, task_count = self._write_data(self._tasks(station_items, ids, fgt))
+            end_stage(stage)
+
+            stage = 'watermarks'
+            self._update_watermarks([(tms_id, fgt) for tms_id in ids])
+            end_stage(stage)
+        except Exception as exception:
+            error_message = "Ingestion of the run with fgt {} failed at the {} stage.".format(fgt, stage)
+            logger.error(error_message)
+            traceback.print_exc()
+            raise exception
+
+        elapsed = time.monotonic() - started
+        report = {
+                'stations'        : len(station_items),
+                'skipped_stations': len(skipped),
+                'runs'            : len(runs),
+                'rows'            : row_count,
+                'tasks'           : task_count,
+                'timings'         : timings,
+                'elapsed'         : elapsed,
+                'rows_per_second' : row_count / elapsed if elapsed > 0 else 0.0
+                }
+
+        logger.info("Ingested {} stations, {} rows of fgt {} in {:.1f} s ({:.0f} rows/s); {}".format(
+                report['stations'], row_count, fgt, elapsed, report['rows_per_second'],
+                ", ".join("{} {:.2f} s".format(name, seconds) for name, seconds in timings.items())))
+
+        return report
@@ -0,0 +1,221 @@
+import os
+import json
+import time
+import traceback
+from datetime import datetime
+
+from db_adapter.logger import logger
+from db_adapter.constants import COMMON_DATE_TIME_FORMAT
+from db_adapter.base.pymysql_base import execute_streaming_read_query
+
+DEFAULT_CHUNK_SIZE = 5000
+DEFAULT_SLEEP = 0.5
+# run ids per grouped COUNT query
+COUNT_CHUNK_SIZE = 1000
+
+
+class RetentionPurge:
+    """
+    Purge the forecasts (data rows) generated before a cutoff fgt, across all the runs of curw_fcst, without holding
+    long locks on the data table, so that ingestion keeps running during the cleanup.
+
+    Ids are processed in order, COUNT_CHUNK_SIZE at a time: one grouped COUNT finds the ids having rows older than
+    the cutoff, and the other ids are skipped without a DELETE. The rows of an id are deleted in primary key ordered
+    chunks of chunk_size rows, each chunk in its own short transaction, with a sleep between chunks. After the last
+    chunk of an id the run start_date and end_date are moved to the earliest and latest remaining fgts, and the id
+    is recorded in the checkpoint file (if any), so an interrupted purge resumes after the last completed id.
+    Fully purged ids (no rows left) keep their run row and its start_date / end_date unchanged, so the timeseries
+    id stays valid for later forecasts and the dates tell the range it had.
+    e.g.:
+        purge = RetentionPurge(pool, cutoff='2019-01-01 00:00:00', checkpoint_path='/tmp/fcst_purge.json')
+        purge.dry_run()     # rows that would be deleted
+        purge.run()
+    """
+
+    def __init__(self, pool, cutoff, chunk_size=DEFAULT_CHUNK_SIZE, sleep=DEFAULT_SLEEP, checkpoint_path=None,
+                 ids=None, progress_interval=60):
+        """
+        :param pool: curw_fcst connection pool
+        :param cutoff: fgts strictly earlier than the cutoff are purged, datetime or 'YYYY-MM-DD HH:MM:SS' string
+        :param chunk_size: rows per DELETE statement (and transaction)
+        :param sleep: seconds to sleep after each chunk, to leave room for the production writers
+        :param checkpoint_path: json file recording the progress, None to disable resuming
+        :param ids: optional, timeseries ids to purge, all the run ids if None
+        :param progress_interval: seconds between two progress log lines
+        """
+        if type(cutoff) is str:
+            cutoff = datetime.strptime(cutoff, COMMON_DATE_TIME_FORMAT)
+
+        self.pool = pool
+        self.cutoff = cutoff
+        self.chunk_size = chunk_size
+        self.sleep = sleep
+        self.checkpoint_path = checkpoint_path
+        self.ids = ids
+        self.progress_interval = progress_interval
+
+    def _run_ids(self):
+
+        if self.ids is not None:
+            return sorted(set(self.ids))
+
+        ids = []
+        for block in execute_streaming_read_query(self.pool, "SELECT `id` FROM `run` ORDER BY `id`", None,
+                block_size=10000, as_dict=False):
+            ids.extend(row[0] for row in block)
+        return ids
+
+    def _read_checkpoint(self):
+
+        if self.checkpoint_path is None or not os.path.exists(self.checkpoint_path):
+            return None
+
+        with open(self.checkpoint_path) as checkpoint_file:
+            checkpoint = json.load(checkpoint_file)
+
+        if checkpoint.get('cutoff') != self.cutoff.strftime(COMMON_DATE_TIME_FORMAT):
+            logger.warning("Ignoring the purge checkpoint {} of a different cutoff {}"
+                           .format(self.checkpoint_path, checkpoint.get('cutoff')))
+            return None
+
+        return checkpoint
+
+    def _write_checkpoint(self, last_id, deleted):
+
+        if self.checkpoint_path is None:
+            return
+
+        temp_path = "{}.{}.tmp".format(self.checkpoint_path, os.getpid())
+        with open(temp_path, 'w') as checkpoint_file:
+            json.dump({'cutoff': self.cutoff.strftime(COMMON_DATE_TIME_FORMAT), 'last_id': last_id,
+                       'deleted': deleted}, checkpoint_file)
+        os.replace(temp_path, self.checkpoint_path)
+
+    def _purge_counts(self, cursor, ids):
+        """
+        Count the rows older than the cutoff of many ids with one grouped query
+        :return: dict of id to row count, ids without rows to purge are left out
+        """
+
+        sql_statement = "SELECT `id`, COUNT(*) AS `count` FROM `data` WHERE `id` IN (" + \
+                        ", ".join(["%s"] * len(ids)) + ") AND `fgt`<%s GROUP BY `id`"
+        cursor.execute(sql_statement, tuple(ids) + (self.cutoff,))
+        return {row.get('id'): row.get('count') for row in cursor.fetchall()}
+
+    def dry_run(self):
+        """
+        Count the rows older than the cutoff, without deleting anything (one grouped query per COUNT_CHUNK_SIZE
+        ids)
+        :return: dict with the number of 'ids' having rows to purge and the number of 'rows' to purge
+        """
+
+        estimate = {'ids': 0, 'rows': 0}
+
+        connection = self.pool.connection()
+        try:
+            ids = self._run_ids()
+            with connection.cursor() as cursor:
+                for chunk_start in range(0, len(ids), COUNT_CHUNK_SIZE):
+                    counts = self._purge_counts(cursor, ids[chunk_start:chunk_start + COUNT_CHUNK_SIZE])
+                    estimate['ids'] += len(counts)
+                    estimate['rows'] += sum(counts.values())
+
+            logger.info("Dry run of the purge of fgts before {}: {} rows of {} ids"
+                        .format(self.cutoff, estimate['rows'], estimate['ids']))
+            return estimate
+        except Exception as exception:
+            error_message = "Estimating the purge of fgts before {} failed.".format(self.cutoff)
+            logger.error(error_message)
+            traceback.print_exc()
+            raise exception
+        finally:
+            if connection is not None:
+                connection.close()
+
+    def run(self):
+        """
+        Purge the rows older than the cutoff, resuming from the checkpoint if there is one
+        :return: dict with the number of 'ids' processed, 'rows' deleted (including the rows of previous
+        interrupted runs), 'chunks' and 'elapsed' seconds
+        """
+
+        ids = self._run_ids()
+        deleted = 0
+
+        checkpoint = self._read_checkpoint()
+        if checkpoint is not None:
+            deleted = checkpoint.get('deleted', 0)
+            ids = [id_ for id_ in ids if id_ > checkpoint.get('last_id')]
+            logger.info("Resuming the purge of fgts before {} after id {}, {} ids left"
+                        .format(self.cutoff, checkpoint.get('last_id'), len(ids)))
+
+        delete_statement = "DELETE FROM `data` WHERE `id`=%s AND `fgt`<%s ORDER BY `time`, `fgt` LIMIT %s"
+        # the aggregates are NULL when no rows are left, the run dates are not touched then
+        dates_statement = "UPDATE `run` JOIN (SELECT MIN(`fgt`) AS `min_fgt`, MAX(`fgt`) AS `max_fgt` FROM `data` " \
+                          "WHERE `id`=%s) AS `remaining` SET `run`.`start_date`=`remaining`.`min_fgt`, " \
+                          "`run`.`end_date`=`remaining`.`max_fgt` " \
+                          "WHERE `run`.`id`=%s AND `remaining`.`min_fgt` IS NOT NULL"
+
+        summary = {'ids': 0, 'rows': 0, 'chunks': 0, 'elapsed': 0.0}
+        started = time.monotonic()
+        last_progress = started
+        id_ = None
+
+        connection = self.pool.connection()
+        try:
+            for chunk_start in range(0, len(ids), COUNT_CHUNK_SIZE):
+                chunk = ids[chunk_start:chunk_start + COUNT_CHUNK_SIZE]
+                with connection.cursor() as cursor:
+                    counts = self._purge_counts(cursor, chunk)
+                connection.commit()
+
+                for id_ in chunk:
+                    summary['ids'] += 1
+                    if id_ not in counts:
+                        continue  # nothing to purge
+
+                    id_rows = 0
+                    while True:
+                        with connection.cursor() as cursor:
+                            row_count = cursor.execute(delete_statement, (id_, self.cutoff, self.chunk_size))
+                        connection.commit()
+
+                        summary['rows'] += row_count
+                        id_rows += row_count
+                        summary['chunks'] += 1
+
+                        if row_count < self.chunk_size:
+                            break
+                        if self.sleep > 0:
+                            time.sleep(self.sleep)
+
+                    if id_rows > 0:
+                        with connection.cursor() as cursor:
+                            cursor.execute(dates_statement, (id_, id_))
+                        connection.commit()
+
+                    self._write_checkpoint(id_, deleted + summary['rows'])
+
+                    now = time.monotonic()
+                    if now - last_progress >= self.progress_interval:
+                        last_progress = now
+                        logger.info("Purge of fgts before {}: {}/{} ids, {} rows deleted, {:.0f} rows/s"
+                                    .format(self.cutoff, summary['ids'], len(ids), summary['rows'],
+                                            summary['rows'] / (now - started)))
+
+                self._write_checkpoint(chunk[-1], deleted + summary['rows'])
+
+            summary['elapsed'] = time.monotonic() - started
+            summary['rows'] += deleted
+            logger.info("Purged {} rows of fgts before {} from {} ids in {:.1f} s"
+                        .format(summary['rows'], self.cutoff, summary['ids'], summary['elapsed']))
+            return summary
+        except Exception as exception:
+            connection.rollback()
+            error_message = "Purging fgts before {} failed at id {}.".format(self.cutoff, id_)
+            logger.error(error_message)
+            traceback.print_exc()
+            raise exception
+        finally:
+            if connection is not None:
+                connection.close()
@@ -1,6 +1,39 @@
+import os
 import traceback
 from db_adapter.logger import logger
 import json
+import zlib
+import hashlib
+import tempfile
+import shutil
+import pymysql
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+"""
+Templates are stored compressed, once per content, in the run_info_template table (TEMPLATE_TABLE_DDL, created
+on existing databases with create_template_table), and the template column of run_info keeps a
+TEMPLATE_REFERENCE_PREFIX + hash reference to it. Until the table exists, templates are inserted inline as raw
+BLOBs in run_info.template, as before. Both kinds of entries are read by read_template.
+"""
+
+TEMPLATE_TABLE = 'run_info_template'
+TEMPLATE_TABLE_DDL = "CREATE TABLE IF NOT EXISTS `run_info_template` (" \
+                     "`hash` CHAR(64) NOT NULL, " \
+                     "`compression` VARCHAR(8) NOT NULL, " \
+                     "`size` BIGINT NOT NULL, " \
+                     "`content` LONGBLOB NOT NULL, " \
+                     "PRIMARY KEY (`hash`))"
+TEMPLATE_REFERENCE_PREFIX = b'run_info_template:'
+# bytes per read of a template file, and per decompression step of a template BLOB
+TEMPLATE_CHUNK_SIZE = 1024 * 1024
+
+GZIP = 'gzip'
+ZSTD = 'zstd'
+NONE = 'none'
 
 
 def convertToBinaryData(filename):
@@ -16,13 +49,137 @@ def write_file(data, filename):
         file.write(data)
 
 
-def insert_run_metadata(pool, sim_tag, source_id, variable_id, fgt, metadata, template_path=None):
+def _compressor(compression):
+
+    if compression == GZIP:
+        return zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)  # gzip container
+    if compression == ZSTD:
+        if zstandard is None:
+            raise ImportError("zstd template compression requires the zstandard package.")
+        return zstandard.ZstdCompressor().compressobj()
+    if compression == NONE:
+        return None
+    raise ValueError("Unknown template compression {}".format(compression))
+
+
+def _decompressor(compression):
+
+    if compression == GZIP:
+        return zlib.decompressobj(16 + zlib.MAX_WBITS)
+    if compression == ZSTD:
+        if zstandard is None:
+            raise ImportError("zstd template compression requires the zstandard package.")
+        return zstandard.ZstdDecompressor().decompressobj()
+    if compression == NONE:
+        return None
+    raise ValueError("Unknown template compression {}".format(compression))
+
+
+def store_template(connection, template_path, compression=GZIP):
+    """
+    Store a template file in the run_info_template table, compressed and keyed by the sha256 of its content.
+    The file is read and compressed chunk by chunk (into a temporary file), and the upload is skipped if the same
+    content is already stored. The compressed content is sent as a single INSERT parameter, so it must fit in the
+    max_allowed_packet of the server (and of the client connection), with some room for the rest of the statement.
+    Nothing is committed (the caller owns the transaction).
+    :param connection: curw_fcst database connection
+    :param template_path: path of the template file
+    :param compression: 'gzip' (default), 'zstd' (requires the zstandard package) or 'none'
+    :return: reference to be stored in run_info.template
+    """
+
+    compressor = _compressor(compression)
+    digest = hashlib.sha256()
+    size = 0
+
+    with tempfile.TemporaryFile() as compressed_file:
+        with open(template_path, 'rb') as template_file:
+            for chunk in iter(lambda: template_file.read(TEMPLATE_CHUNK_SIZE), b''):
+                digest.update(chunk)
+                size += len(chunk)
+                compressed_file.write(compressor.compress(chunk) if compressor is not None else chunk)
+        if compressor is not None:
+            compressed_file.write(compressor.flush())
+
+        hash_ = digest.hexdigest()
+
+        with connection.cursor() as cursor:
+            sql_statement = "SELECT 1 AS `exists` FROM `{}` WHERE `hash`=%s".format(TEMPLATE_TABLE)
+            if cursor.execute(sql_statement, hash_) == 0:
+                compressed_file.seek(0)
+                sql_statement = "INSERT INTO `{}` (`hash`, `compression`, `size`, `content`) " \
+                                "VALUES (%s, %s, %s, %s) ON DUPLICATE KEY UPDATE `hash`=`hash`"\
+                    .format(TEMPLATE_TABLE)
+                # no row is inserted if a concurrent writer stored the same content meanwhile
+                cursor.execute(sql_statement, (hash_, compression, size, compressed_file.read()))
+            else:
+                logger.debug("Template {} is already stored as {}".format(template_path, hash_))
+
+    return TEMPLATE_REFERENCE_PREFIX + hash_.encode()
+
+
+def create_template_table(pool):
+    """
+    Create the run_info_template table if it does not exist (migration of existing curw_fcst databases)
+    :param pool: curw_fcst connection pool
+    :return: True if successful, else raise the exception
+    """
+
+    connection = pool.connection()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(TEMPLATE_TABLE_DDL)
+        connection.commit()
+        return True
+    except Exception as exception:
+        error_message = "Creating the {} table failed.".format(TEMPLATE_TABLE)
+        logger.error(error_message)
+        traceback.print_exc()
+        raise exception
+    finally:
+        if connection is not None:
+            connection.close()
+
+
+def _has_template_table(connection):
+
+    with connection.cursor() as cursor:
+        sql_statement = "SELECT 1 AS `exists` FROM `information_schema`.`tables` " \
+                        "WHERE `table_schema`=DATABASE() AND `table_name`=%s"
+        return cursor.execute(sql_statement, TEMPLATE_TABLE) > 0
+
+
+def _stream_blob(connection, table, column, condition, params, output_file, decompressor=None):
+    """
+    Copy a BLOB to a file, fetched once on an unbuffered cursor and decompressed in TEMPLATE_CHUNK_SIZE steps
+    """
+
+    sql_statement = "SELECT `{}` FROM `{}` WHERE {}".format(column, table, condition)
+    with connection.cursor(pymysql.cursors.SSCursor) as cursor:
+        cursor.execute(sql_statement, tuple(params))
+        row = cursor.fetchone()
+        blob = memoryview(row[0] if row is not None and row[0] is not None else b'')
+
+        for position in range(0, len(blob), TEMPLATE_CHUNK_SIZE):
+            chunk = blob[position:position + TEMPLATE_CHUNK_SIZE]
+            output_file.write(decompressor.decompress(chunk) if decompressor is not None else chunk)
+
+    if decompressor is not None:
+        output_file.write(decompressor.flush())
+
+
+def insert_run_metadata(pool, sim_tag, source_id, variable_id, fgt, metadata, template_path=None,
+                        compression=GZIP):
     """
     Insert new run info entry
     :param source_id:
     :param sim_tag:
     :param fgt:
     :param metadata:
+    :param template_path: optional, template file, stored once per content in run_info_template (see store_template).
+    If the run_info_template table does not exist yet (see create_template_table), the file is inserted inline as a
+    raw BLOB, as before.
+    :param compression: template compression, 'gzip' (default), 'zstd' or 'none'
     :return:
     """
 
@@ -35,7 +192,12 @@ def insert_run_metadata(pool, sim_tag, source_id, variable_id, fgt, metadata, te
         data = (sim_tag, source_id, variable_id, fgt, json.dumps(metadata))
 
         if template_path is not None:
-            template = convertToBinaryData(template_path)
+            if _has_template_table(connection):
+                template = store_template(connection, template_path, compression=compression)
+            else:
+                logger.warning("The {} table is missing, inserting the template inline. Run create_template_table "
+                               "to store templates compressed and deduplicated.".format(TEMPLATE_TABLE))
+                template = convertToBinaryData(template_path)
             sql_statement = "INSERT INTO `run_info` (`sim_tag`, `source`, `variable`, `fgt`, `metadata`, `template`) " \
                                 "VALUES ( %s, %s, %s, %s, %s, %s)"
             data = (sim_tag, source_id, variable_id, fgt, json.dumps(metadata), template)
@@ -60,7 +222,8 @@ def insert_run_metadata(pool, sim_tag, source_id, variable_id, fgt, metadata, te
 
 def read_template(pool, sim_tag, source_id, variable_id, fgt, output_file_path):
     """
-    Read template (convert BLOB to a file)
+    Read template (convert BLOB to a file). The template BLOB is fetched once and written to the file in chunks,
+    decompressed if it is stored in run_info_template. No partial file is left behind on failure.
     :param source_id:
     :param sim_tag:
     :param fgt:
@@ -71,16 +234,44 @@ def read_template(pool, sim_tag, source_id, variable_id, fgt, output_file_path):
     connection = pool.connection()
     try:
 
+        run_info_condition = "`sim_tag`=%s and `source`=%s and `variable`=%s and `fgt`=%s"
+        run_info_values = (sim_tag, source_id, variable_id, fgt)
+
         with connection.cursor() as cursor:
-            sql_statement = "SELECT `template` FROM `run_info` WHERE `sim_tag`=%s and `source`=%s and " \
-                            "`variable`=%s and `fgt`=%s"
-            row_count = cursor.execute(sql_statement, (sim_tag, source_id, variable_id, fgt))
-            if row_count > 0:
-                template_data = cursor.fetchone()['template']
-                write_file(data=template_data, filename=output_file_path)
-            else:
+            sql_statement = "SELECT LEFT(`template`, %s) AS `reference` FROM `run_info` WHERE " + run_info_condition
+            row_count = cursor.execute(sql_statement, (len(TEMPLATE_REFERENCE_PREFIX) + 64,) + run_info_values)
+            if row_count == 0:
+                return None
+            reference = cursor.fetchone()['reference']
+            if reference is None:
                 return None
 
+            hash_ = None
+            compression = None
+            if bytes(reference).startswith(TEMPLATE_REFERENCE_PREFIX):
+                hash_ = bytes(reference)[len(TEMPLATE_REFERENCE_PREFIX):].decode()
+                sql_statement = "SELECT `compression` FROM `{}` WHERE `hash`=%s".format(TEMPLATE_TABLE)
+                if cursor.execute(sql_statement, hash_) == 0:
+                    raise LookupError("Template {} referenced by the run info entry is missing.".format(hash_))
+                compression = cursor.fetchone()['compression']
+
+        temp_path = "{}.tmp".format(output_file_path)
+        try:
+            with open(temp_path, 'wb') as output_file:
+                if hash_ is not None:
+                    _stream_blob(connection, TEMPLATE_TABLE, 'content', "`hash`=%s", (hash_,), output_file,
+                            decompressor=_decompressor(compression))
+                else:
+                    # legacy entry, raw template BLOB
+                    _stream_blob(connection, 'run_info', 'template', run_info_condition, run_info_values,
+                            output_file)
+            shutil.move(temp_path, output_file_path)
+        except Exception:
+            # do not leave a partial template behind
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
         return True
     except Exception as exception:
         error_message = "Retrieving template failed for run info entry with source={}, variable={}, sim_tag={}, fgt={}" \
@@ -90,4 +281,4 @@ def read_template(pool, sim_tag, source_id, variable_id, fgt, output_file_path):
         raise exception
     finally:
         if connection is not None:
-            connection.close()
\ No newline at end of file
+            connection.close()
@@ -1,18 +1,36 @@
+import numpy as np
 import pandas as pd
-import hashlib
-import json
 import traceback
+import pymysql
 from pymysql import IntegrityError
 from datetime import datetime, timedelta
 
 from db_adapter.logger import logger
 from db_adapter.exceptions import DatabaseAdapterError, DuplicateEntryError
 from db_adapter.constants import COMMON_DATE_TIME_FORMAT
+from db_adapter.base.pymysql_base import execute_streaming_read_query
+from db_adapter.base.bulk_writer import BulkWriter, WriteMode
+from db_adapter.base.delta import insert_timeseries_delta
+from db_adapter.base.bulk_loader import BulkLoader
+from db_adapter.base.columnar import ReturnType, fetch_timeseries, empty_timeseries_arrays, \
+    grouped_rows_to_timeseries_arrays, pivot_to_matrix
+from db_adapter.base.hash_id import generate_hash_id, generate_hash_ids
+from db_adapter.base.watermarks import update_watermarks, apply_watermarks
+from db_adapter.curw_fcst.timeseries.fgt_index import FgtIndex, to_datetime64
 
 
 class Timeseries:
-    def __init__(self, pool):
+    # metadata keys hashed into the timeseries id
+    TIMESERIES_ID_KEYS = ('sim_tag', 'latitude', 'longitude', 'model', 'version', 'variable', 'unit', 'unit_type')
+
+    def __init__(self, pool, run_id_index=None):
+        """
+        :param pool: connection pool
+        :param run_id_index: optional RunIdIndex of the run table, answers the timeseries id existence checks
+        without a query per id
+        """
         self.pool = pool
+        self.run_id_index = run_id_index
 
     @staticmethod
     def generate_timeseries_id(meta_data):
@@ -28,24 +46,18 @@ class Timeseries:
         :return: str: sha256 hash value in hex format (length of 64 characters)
         """
 
-        sha256 = hashlib.sha256()
-        hash_data = {
-                'sim_tag'  : '',
-                'latitude' : '',
-                'longitude': '',
-                'model'    : '',
-                'version'  : '',
-                'variable' : '',
-                'unit'     : '',
-                'unit_type': ''
-                }
+        return generate_hash_id(meta_data, Timeseries.TIMESERIES_ID_KEYS)
 
-        for key in hash_data.keys():
-            hash_data[key] = meta_data[key]
-
-        sha256.update(json.dumps(hash_data, sort_keys=True).encode("ascii"))
-        event_id = sha256.hexdigest()
-        return event_id
+    @staticmethod
+    def generate_timeseries_ids(records, processes=None):
+        """
+        Generate the event ids for a batch of metadata records. Ids are identical to the ids generated by
+        generate_timeseries_id for each record.
+        :param records: pandas DataFrame with a column per metadata key, or list of metadata dicts
+        :param processes: number of worker processes to spread the hashing, None to hash in the calling process
+        :return: list of sha256 hash values in hex format, in the order of the records
+        """
+        return generate_hash_ids(records, Timeseries.TIMESERIES_ID_KEYS, processes=processes)
 
     def get_timeseries_id_if_exists(self, meta_data):
 
@@ -57,6 +69,9 @@ class Timeseries:
         """
         event_id = self.generate_timeseries_id(meta_data)
 
+        if self.run_id_index is not None:
+            return event_id if self.run_id_index.contains(event_id) else None
+
         connection = self.pool.connection()
         try:
             with connection.cursor() as cursor:
@@ -78,6 +93,9 @@ class Timeseries:
         :param id_:
         :return: True, if id is in the database, False otherwise
         """
+        if self.run_id_index is not None:
+            return self.run_id_index.contains(id_)
+
         connection = self.pool.connection()
         try:
             with connection.cursor() as cursor:
@@ -93,28 +111,24 @@ class Timeseries:
             if connection is not None:
                 connection.close()
 
-    def insert_formatted_data(self, timeseries, upsert=False):
+    def insert_formatted_data(self, timeseries, upsert=False, batch_size=None, commit_per_batch=False):
         """
         Insert timeseries to Data table in the database
         :param timeseries: list of [tms_id, time, fgt, value] lists
         :param boolean upsert: If True, upsert existing values ON DUPLICATE KEY. Default is False.
         Ref: 1). https://stackoverflow.com/a/14383794/1461060
              2). https://chartio.com/resources/tutorials/how-to-insert-if-row-does-not-exist-upsert-in-mysql/
+        :param batch_size: number of rows per multi-row INSERT statement (default DEFAULT_BATCH_SIZE)
+        :param commit_per_batch: if True commit after every batch, else commit once after all the rows are written
         :return: row count if insertion was successful, else raise DatabaseAdapterError
         """
 
-        row_count = 0
         connection = self.pool.connection()
         try:
-            with connection.cursor() as cursor:
-                if upsert:
-                    sql_statement = "INSERT INTO `data` (`id`, `time`, `fgt`, `value`) VALUES (%s, %s, %s, %s) " \
-                                    "ON DUPLICATE KEY UPDATE `value`=VALUES(`value`)"
-                else:
-                    sql_statement = "INSERT INTO `data` (`id`, `time`, `fgt`, `value`) VALUES (%s, %s, %s, %s)"
-                row_count = cursor.executemany(sql_statement, timeseries)
-            connection.commit()
-            return row_count
+            writer = BulkWriter(table='data', columns=('id', 'time', 'fgt', 'value'),
+                    mode=WriteMode.UPSERT if upsert else WriteMode.INSERT, batch_size=batch_size,
+                    commit_per_batch=commit_per_batch)
+            return writer.write(connection, timeseries).row_count
         except Exception as exception:
             connection.rollback()
             error_message = "Data insertion to data table for tms id {}, upsert={} failed.".format(timeseries[0][0],
@@ -127,7 +141,7 @@ class Timeseries:
             if connection is not None:
                 connection.close()
 
-    def insert_data(self, timeseries, tms_id, fgt, upsert=False):
+    def insert_data(self, timeseries, tms_id, fgt, upsert=False, batch_size=None, commit_per_batch=False):
         """
         Insert timeseries to Data table in the database
         :param tms_id: hash value
@@ -136,6 +150,8 @@ class Timeseries:
         :param boolean upsert: If True, upsert existing values ON DUPLICATE KEY. Default is False.
         Ref: 1). https://stackoverflow.com/a/14383794/1461060
              2). https://chartio.com/resources/tutorials/how-to-insert-if-row-does-not-exist-upsert-in-mysql/
+        :param batch_size: number of rows per multi-row INSERT statement (default DEFAULT_BATCH_SIZE)
+        :param commit_per_batch: if True commit after every batch, else commit once after all the rows are written
         :return: row count if insertion was successful, else raise DatabaseAdapterError
         """
 
@@ -149,19 +165,12 @@ class Timeseries:
             else:
                 logger.warning('Invalid timeseries data:: %s', t)
 
-        row_count = 0
-
         connection = self.pool.connection()
         try:
-            with connection.cursor() as cursor:
-                if upsert:
-                    sql_statement = "INSERT INTO `data` (`id`, `time`, `fgt`, `value`) VALUES (%s, %s, %s, %s) " \
-                                    "ON DUPLICATE KEY UPDATE `value`=VALUES(`value`)"
-                else:
-                    sql_statement = "INSERT INTO `data` (`id`, `time`, `fgt`, `value`) VALUES (%s, %s, %s, %s)"
-                row_count = cursor.executemany(sql_statement, new_timeseries)
-            connection.commit()
-            return row_count
+            writer = BulkWriter(table='data', columns=('id', 'time', 'fgt', 'value'),
+                    mode=WriteMode.UPSERT if upsert else WriteMode.INSERT, batch_size=batch_size,
+                    commit_per_batch=commit_per_batch)
+            return writer.write(connection, new_timeseries).row_count
         except Exception as exception:
             connection.rollback()
             error_message = "Data insertion to data table for tms id {}, upsert={} failed.".format(timeseries[0][0],
@@ -174,6 +183,53 @@ class Timeseries:
             if connection is not None:
                 connection.close()
 
+    def insert_data_delta(self, timeseries, tms_id, fgt, tolerance=0.0, checksum_tracker=None, batch_size=None):
+        """
+        Write only the new or changed values of a timeseries (e.g. when an fgt is re-pushed after a partial
+        failure), instead of rewriting every row ON DUPLICATE KEY. The existing values of the (id, fgt) are read
+        with one range scan and compared with the incoming values.
+        :param tms_id: hash value
+        :param fgt: forecast generated time
+        :param timeseries: list of [time, value] lists
+        :param tolerance: absolute difference below which values are considered unchanged
+        :param checksum_tracker: optional ChecksumTracker, a timeseries identical to the last one written for the
+        same (id, fgt) and time range is skipped without reading the database
+        :param batch_size: number of rows per multi-row INSERT statement (default DEFAULT_BATCH_SIZE)
+        :return: dict with the number of rows 'written' and 'skipped', else raise the exception
+        """
+
+        if type(fgt) is str:
+            fgt = datetime.strptime(fgt, COMMON_DATE_TIME_FORMAT)
+
+        return insert_timeseries_delta(self.pool, timeseries, tms_id, key={'fgt': fgt}, tolerance=tolerance,
+                checksum_tracker=checksum_tracker, batch_size=batch_size)
+
+    def bulk_load_data(self, timeseries, upsert=False):
+        """
+        Load timeseries to Data table with LOAD DATA LOCAL INFILE. Faster than insert_formatted_data for large
+        timeseries (e.g. full WRF runs). The pool must be created with local_infile=True.
+        :param timeseries: list of [tms_id, time, fgt, value] lists
+        :param boolean upsert: If True, upsert existing values through a staging table, else rows with
+        existing keys are skipped. Default is False.
+        :return: row count if loading was successful, else raise DatabaseAdapterError
+        """
+
+        connection = self.pool.connection()
+        try:
+            loader = BulkLoader(table='data', columns=('id', 'time', 'fgt', 'value'))
+            return loader.load(connection, timeseries, upsert=upsert).row_count
+        except Exception as exception:
+            connection.rollback()
+            error_message = "Bulk loading to data table for tms id {}, upsert={} failed.".format(timeseries[0][0],
+                    upsert)
+            logger.error(error_message)
+            traceback.print_exc()
+            raise exception
+
+        finally:
+            if connection is not None:
+                connection.close()
+
     def insert_timeseries(self, timeseries, run_tuple):
 
         """
@@ -195,8 +251,13 @@ class Timeseries:
                 sql_values = run_tuple
                 cursor.execute(sql_statement, sql_values)
 
+            # data rows go in the same transaction as the run row
+            writer = BulkWriter(table='data', columns=('id', 'time', 'fgt', 'value'), mode=WriteMode.UPSERT)
+            writer.write(connection, timeseries, commit=False)
+
             connection.commit()
-            self.insert_data(timeseries, True)
+            if self.run_id_index is not None:
+                self.run_id_index.add(run_tuple[0])
             return run_tuple[0]
         # except IntegrityError as ie:
         #     connection.rollback()
@@ -225,6 +286,102 @@ class Timeseries:
             if connection is not None:
                 connection.close()
 
+    def ingest_timeseries(self, items, upsert=True, commit_every=None, batch_size=None):
+        """
+        Unit of work ingestion of many fcst timeseries on a single connection. For each timeseries the run row is
+        inserted if missing and the data rows are written in multi-row batches. Before each commit the run end_date /
+        start_date watermarks of the pending timeseries are moved to their fgts with one batched update per column.
+        The transaction is committed once every commit_every timeseries (once for all of them by default), so a
+        failure never leaves a run row without its data or a watermark ahead of the data.
+        :param items: list of dicts like
+        {
+            'run_meta'  : {'tms_id': '', 'sim_tag': '', 'station_id': '', 'source_id': '', 'variable_id': '',
+                           'unit_id': ''},
+            'fgt'       : '',
+            'timeseries': [[time, value], ...]
+        }
+        :param boolean upsert: If True, upsert existing values ON DUPLICATE KEY. Default is True.
+        :param commit_every: number of timeseries per transaction, None to commit once after all of them
+        :param batch_size: number of rows per multi-row INSERT statement (default DEFAULT_BATCH_SIZE)
+        :return: dict with the number of 'timeseries', 'rows' and 'commits', else raise the exception (timeseries of
+        the already committed batches stay in the database)
+        """
+
+        writer = BulkWriter(table='data', columns=('id', 'time', 'fgt', 'value'),
+                mode=WriteMode.UPSERT if upsert else WriteMode.INSERT, batch_size=batch_size)
+
+        run_statement = "INSERT INTO `run` (`id`, `sim_tag`, `start_date`, `end_date`, `station`, `source`, " \
+                        "`variable`, `unit`) VALUES ( %s, %s, %s, %s, %s, %s, %s, %s) " \
+                        "ON DUPLICATE KEY UPDATE `id`=`id`"
+
+        summary = {'timeseries': 0, 'rows': 0, 'commits': 0}
+        pending_ids = []
+        pending_fgts = []
+        tms_id = None
+
+        connection = self.pool.connection()
+        try:
+            for item in items:
+                run_meta = item.get('run_meta')
+                tms_id = run_meta.get('tms_id')
+                fgt = item.get('fgt')
+                if type(fgt) is str:
+                    fgt = datetime.strptime(fgt, COMMON_DATE_TIME_FORMAT)
+
+                rows = []
+                for t in item.get('timeseries'):
+                    if len(t) > 1:
+                        rows.append((tms_id, t[0], fgt, t[1]))
+                    else:
+                        logger.warning('Invalid timeseries data:: %s', t)
+
+                with connection.cursor() as cursor:
+                    cursor.execute(run_statement, (tms_id, run_meta.get('sim_tag'), fgt, fgt,
+                            run_meta.get('station_id'), run_meta.get('source_id'), run_meta.get('variable_id'),
+                            run_meta.get('unit_id')))
+
+                summary['rows'] += writer.write(connection, rows, commit=False).rows_sent
+
+                pending_ids.append(tms_id)
+                pending_fgts.append((tms_id, fgt))
+                summary['timeseries'] += 1
+
+                if commit_every and len(pending_ids) >= commit_every:
+                    update_watermarks(connection, 'run', 'end_date', pending_fgts, later=True)
+                    update_watermarks(connection, 'run', 'start_date', pending_fgts, later=False)
+                    connection.commit()
+                    summary['commits'] += 1
+                    self._index_run_ids(pending_ids)
+                    pending_ids = []
+                    pending_fgts = []
+
+            if len(pending_ids) > 0:
+                update_watermarks(connection, 'run', 'end_date', pending_fgts, later=True)
+                update_watermarks(connection, 'run', 'start_date', pending_fgts, later=False)
+                connection.commit()
+                summary['commits'] += 1
+                self._index_run_ids(pending_ids)
+
+            logger.info("Ingested {} timeseries, {} rows in {} transactions".format(summary['timeseries'],
+                    summary['rows'], summary['commits']))
+            return summary
+        except Exception as exception:
+            connection.rollback()
+            error_message = "Ingestion of timeseries failed at tms id {}, {} timeseries rolled back."\
+                .format(tms_id, len(pending_ids) + 1)
+            logger.error(error_message)
+            traceback.print_exc()
+            raise exception
+        finally:
+            if connection is not None:
+                connection.close()
+
+    def _index_run_ids(self, ids):
+
+        if self.run_id_index is not None:
+            for id_ in ids:
+                self.run_id_index.add(id_)
+
     # def insert_run(self, run_tuple):
     #     """
     #     Insert new run entry
@@ -285,6 +442,8 @@ class Timeseries:
                                                run_meta.get('source_id'), run_meta.get('variable_id'), run_meta.get('unit_id')))
 
             connection.commit()
+            if self.run_id_index is not None:
+                self.run_id_index.add(run_meta.get('tms_id'))
             return run_meta.get('tms_id')
         except Exception as exception:
             connection.rollback()
@@ -311,19 +470,12 @@ class Timeseries:
         if type(fgt) is str:
             fgt = datetime.strptime(fgt, COMMON_DATE_TIME_FORMAT)
 
-        existing_end_date = None
         try:
 
             with connection.cursor() as cursor:
-                sql_statement = "SELECT `end_date` FROM `run` WHERE `id`=%s"
-                row_count= cursor.execute(sql_statement, id_)
-                if row_count > 0:
-                    existing_end_date = cursor.fetchone()['end_date']
-
-            if existing_end_date is None or existing_end_date < fgt:
-                with connection.cursor() as cursor2:
-                    sql_statement = "UPDATE `run` SET `end_date`=%s WHERE `id`=%s"
-                    cursor2.execute(sql_statement, (fgt, id_))
+                sql_statement = "UPDATE `run` SET `end_date`=%s WHERE `id`=%s " \
+                                "AND (`end_date` IS NULL OR `end_date` < %s)"
+                cursor.execute(sql_statement, (fgt, id_, fgt))
 
             connection.commit()
             return
@@ -408,24 +560,14 @@ class Timeseries:
 
         try:
 
-            if not force:
-                existing_start_date = None
-
-                with connection.cursor() as cursor:
-                    sql_statement = "SELECT `start_date` FROM `run` WHERE `id`=%s"
-                    row_count= cursor.execute(sql_statement, id_)
-                    if row_count > 0:
-                        existing_start_date = cursor.fetchone()['start_date']
-
-                if existing_start_date is None or existing_start_date > start_date:
-                    with connection.cursor() as cursor2:
-                        sql_statement = "UPDATE `run` SET `start_date`=%s WHERE `id`=%s"
-                        cursor2.execute(sql_statement, (start_date, id_))
-
-            else:
-                with connection.cursor() as cursor3:
+            with connection.cursor() as cursor:
+                if not force:
+                    sql_statement = "UPDATE `run` SET `start_date`=%s WHERE `id`=%s " \
+                                    "AND (`start_date` IS NULL OR `start_date` > %s)"
+                    cursor.execute(sql_statement, (start_date, id_, start_date))
+                else:
                     sql_statement = "UPDATE `run` SET `start_date`=%s WHERE `id`=%s"
-                    cursor3.execute(sql_statement, (start_date, id_))
+                    cursor.execute(sql_statement, (start_date, id_))
 
             connection.commit()
             return
@@ -439,7 +581,26 @@ class Timeseries:
             if connection is not None:
                 connection.close()
 
-    def get_latest_timeseries(self, sim_tag, station_id, source_id, variable_id, unit_id, start=None):
+    def update_latest_fgts(self, fgts):
+        """
+        Batch counterpart of update_latest_fgt. Move the end_date of many runs forward in one statement, keeping
+        the existing end_date where it is later (GREATEST is applied server side)
+        :param fgts: list of (id, fgt) pairs, an id may repeat
+        :return: number of runs updated, else raise the exception
+        """
+        return apply_watermarks(self.pool, 'run', 'end_date', fgts, later=True)
+
+    def update_start_dates(self, start_dates):
+        """
+        Batch counterpart of update_start_date. Move the start_date of many runs backward in one statement, keeping
+        the existing start_date where it is earlier (LEAST is applied server side)
+        :param start_dates: list of (id, start_date) pairs, an id may repeat
+        :return: number of runs updated, else raise the exception
+        """
+        return apply_watermarks(self.pool, 'run', 'start_date', start_dates, later=False)
+
+    def get_latest_timeseries(self, sim_tag, station_id, source_id, variable_id, unit_id, start=None,
+                              return_type=ReturnType.LIST):
 
         """
         Retrieve the latest fcst timeseries available for the given parameters
@@ -449,7 +610,9 @@ class Timeseries:
         :param variable_id:
         :param unit_id:
         :param start: expected beginning of the timeseries
+        :param return_type: ReturnType. ARRAYS and DATAFRAME fill numpy arrays straight from a tuple cursor
         :return: return list of lists with time, value pairs [[time, value], [time1, value2]]
+        ((times, values) arrays or DataFrame for the ARRAYS and DATAFRAME return types)
         """
 
         meta_data = {}
@@ -465,21 +628,23 @@ class Timeseries:
                 else:
                     return None
             if start:
-                with connection.cursor() as cursor2:
-                    sql_statement = "SELECT `time`, `value` FROM `data` WHERE `id`=%s AND `fgt`=%s AND `time` >= %s;"
-                    rows = cursor2.execute(sql_statement, (meta_data.get('id'), meta_data.get('end_date'), start))
-                    if rows > 0:
-                        results = cursor2.fetchall()
-                        for result in results:
-                            ts.append([result.get('time'), result.get('value')])
+                sql_statement = "SELECT `time`, `value` FROM `data` WHERE `id`=%s AND `fgt`=%s AND `time` >= %s;"
+                sql_values = (meta_data.get('id'), meta_data.get('end_date'), start)
             else:
-                with connection.cursor() as cursor2:
-                    sql_statement = "SELECT `time`, `value` FROM `data` WHERE `id`=%s AND `fgt`=%s;"
-                    rows = cursor2.execute(sql_statement, (meta_data.get('id'), meta_data.get('end_date')))
-                    if rows > 0:
-                        results = cursor2.fetchall()
-                        for result in results:
-                            ts.append([result.get('time'), result.get('value')])
+                sql_statement = "SELECT `time`, `value` FROM `data` WHERE `id`=%s AND `fgt`=%s;"
+                sql_values = (meta_data.get('id'), meta_data.get('end_date'))
+
+            if return_type is not ReturnType.LIST:
+                with connection.cursor(pymysql.cursors.Cursor) as cursor2:
+                    cursor2.execute(sql_statement, sql_values)
+                    return fetch_timeseries(cursor2, return_type)
+
+            with connection.cursor() as cursor2:
+                rows = cursor2.execute(sql_statement, sql_values)
+                if rows > 0:
+                    results = cursor2.fetchall()
+                    for result in results:
+                        ts.append([result.get('time'), result.get('value')])
             return ts
 
         except Exception as exception:
@@ -491,6 +656,85 @@ class Timeseries:
             if connection is not None:
                 connection.close()
 
+    def get_latest_timeseries_bulk(self, sim_tag, keys, start=None, return_type=ReturnType.ARRAYS):
+
+        """
+        Retrieve the latest fcst timeseries of many stations of a sim_tag in two queries: one resolving the
+        timeseries ids and latest fgts of all the keys, and one streamed JOIN of the data rows of all of them.
+        :param sim_tag:
+        :param keys: list of (station_id, source_id, variable_id, unit_id) tuples, one per station
+        :param start: expected beginning of the timeseries
+        :param return_type: ReturnType.
+            - ARRAYS (default): dict of station_id to (times, values) numpy arrays
+            - LIST: dict of station_id to list of [time, value] lists
+            - DATAFRAME: long format DataFrame with 'station', 'time' and 'value' columns
+        Stations without a timeseries for the sim_tag are left out.
+        :return: dict keyed by station_id, or DataFrame
+        """
+
+        keys = [tuple(key) for key in keys]
+        station_ids = [key[0] for key in keys]
+        if len(set(station_ids)) != len(station_ids):
+            raise ValueError("get_latest_timeseries_bulk expects a single (source, variable, unit) key per station")
+
+        runs = []
+        if len(keys) > 0:
+            connection = self.pool.connection()
+            try:
+                with connection.cursor() as cursor:
+                    sql_statement = "SELECT `id`, `station`, `end_date` FROM `run` WHERE `sim_tag`=%s AND " \
+                                    "(`station`, `source`, `variable`, `unit`) IN (" + \
+                                    ", ".join(["(%s, %s, %s, %s)"] * len(keys)) + ");"
+                    sql_values = [sim_tag]
+                    for key in keys:
+                        sql_values.extend(key)
+                    if cursor.execute(sql_statement, sql_values) > 0:
+                        runs = [run for run in cursor.fetchall() if run.get('end_date') is not None]
+            except Exception as exception:
+                error_message = "Retrieving run entries of {} stations for sim_tag={} failed."\
+                    .format(len(keys), sim_tag)
+                logger.error(error_message)
+                traceback.print_exc()
+                raise exception
+            finally:
+                if connection is not None:
+                    connection.close()
+
+        grouped = {}
+        if len(runs) > 0:
+            sql_statement = "SELECT `data`.`id`, `data`.`time`, `data`.`value` FROM `data` " \
+                            "INNER JOIN `run` ON `data`.`id`=`run`.`id` AND `data`.`fgt`=`run`.`end_date` " \
+                            "WHERE `run`.`id` IN (" + ", ".join(["%s"] * len(runs)) + ")"
+            sql_values = [run.get('id') for run in runs]
+            if start:
+                sql_statement += " AND `data`.`time` >= %s"
+                sql_values.append(start)
+            sql_statement += " ORDER BY `data`.`id`, `data`.`time`;"
+
+            grouped = grouped_rows_to_timeseries_arrays(execute_streaming_read_query(self.pool, sql_statement,
+                    tuple(sql_values), block_size=10000, as_dict=False))
+
+        empty_times, empty_values = empty_timeseries_arrays()
+        result = {}
+        for run in runs:
+            result[run.get('station')] = grouped.get(run.get('id'), (empty_times, empty_values))
+
+        if return_type is ReturnType.LIST:
+            return {station: [[time_, value] for time_, value in zip(times.astype('datetime64[us]').tolist(),
+                    values.tolist())] for station, (times, values) in result.items()}
+
+        if return_type is ReturnType.DATAFRAME:
+            if len(result) == 0:
+                return pd.DataFrame({'station': pd.Series([], dtype='int64'), 'time': empty_times,
+                                     'value': empty_values})
+            return pd.DataFrame({
+                    'station': np.concatenate([np.full(len(times), station) for station, (times, _) in result.items()]),
+                    'time'   : np.concatenate([times for times, _ in result.values()]),
+                    'value'  : np.concatenate([values for _, values in result.values()])
+                    })
+
+        return result
+
     def get_nearest_timeseries(self, sim_tag, station_id, source_id, variable_id, unit_id, expected_fgt, start=None):
 
         """
@@ -551,6 +795,179 @@ class Timeseries:
             if connection is not None:
                 connection.close()
 
+    def get_nearest_timeseries_bulk(self, requests, start=None, before_only=False, fgt_index=None,
+                                    return_type=ReturnType.ARRAYS):
+
+        """
+        Retrieve the fcst timeseries nearest to the expected fgts of many timeseries ids.
+        The available fgts of all the ids are loaded with one set-based query (skipped for ids already in the given
+        fgt_index) and the nearest fgts are resolved locally, then the data of all the resolved (id, fgt) pairs is
+        streamed in one query.
+        :param requests: list of (id, expected_fgt) tuples
+        :param start: expected beginning of the timeseries
+        :param before_only: if True only fgts at or before the expected fgt are considered
+        :param fgt_index: FgtIndex to reuse across calls (e.g. over a hindcast sweep), a fresh index is used if None
+        :param return_type: ReturnType.
+            - ARRAYS (default): dict of (id, expected_fgt) to (fgt, times, values)
+            - LIST: dict of (id, expected_fgt) to (fgt, list of [time, value] lists)
+            - DATAFRAME: long format DataFrame with 'id', 'expected_fgt', 'fgt', 'time' and 'value' columns
+        Requests without an available fgt map to None (left out of the DataFrame).
+        :return: dict keyed by the requests, or DataFrame
+        """
+
+        if fgt_index is None:
+            fgt_index = FgtIndex(self.pool)
+
+        requests = [tuple(request) for request in requests]
+        nearest_fgts = fgt_index.resolve(requests, before_only=before_only)
+
+        pairs = list(dict.fromkeys((id_, pd.Timestamp(fgt).to_pydatetime())
+                                   for (id_, _), fgt in zip(requests, nearest_fgts) if fgt is not None))
+
+        grouped = {}
+        if len(pairs) > 0:
+            sql_statement = "SELECT `id`, `fgt`, `time`, `value` FROM `data` WHERE (`id`, `fgt`) IN (" + \
+                            ", ".join(["(%s, %s)"] * len(pairs)) + ")"
+            sql_values = [value for pair in pairs for value in pair]
+            if start:
+                sql_statement += " AND `time` >= %s"
+                sql_values.append(start)
+            sql_statement += " ORDER BY `id`, `fgt`, `time`;"
+
+            blocks = execute_streaming_read_query(self.pool, sql_statement, tuple(sql_values), block_size=10000,
+                    as_dict=False)
+            grouped = grouped_rows_to_timeseries_arrays(
+                    [((id_, fgt), time_, value) for id_, fgt, time_, value in block] for block in blocks)
+
+        empty_times, empty_values = empty_timeseries_arrays()
+        result = {}
+        for request, fgt in zip(requests, nearest_fgts):
+            if fgt is None:
+                result[request] = None
+                continue
+            fgt = pd.Timestamp(fgt).to_pydatetime()
+            times, values = grouped.get((request[0], fgt), (empty_times, empty_values))
+            result[request] = (fgt, times, values)
+
+        if return_type is ReturnType.LIST:
+            return {request: None if entry is None else (entry[0], [[time_, value] for time_, value in
+                    zip(entry[1].astype('datetime64[us]').tolist(), entry[2].tolist())])
+                    for request, entry in result.items()}
+
+        if return_type is ReturnType.DATAFRAME:
+            entries = [(request, entry) for request, entry in result.items() if entry is not None]
+            if len(entries) == 0:
+                return pd.DataFrame({'id': [], 'expected_fgt': [], 'fgt': [], 'time': empty_times,
+                                     'value': empty_values})
+            return pd.DataFrame({
+                    'id'          : np.concatenate([np.full(len(entry[1]), request[0], dtype=object)
+                                                    for request, entry in entries]),
+                    'expected_fgt': np.concatenate([np.full(len(entry[1]), to_datetime64(request[1]))
+                                                    for request, entry in entries]),
+                    'fgt'         : np.concatenate([np.full(len(entry[1]), to_datetime64(entry[0]))
+                                                    for request, entry in entries]),
+                    'time'        : np.concatenate([entry[1] for _, entry in entries]),
+                    'value'       : np.concatenate([entry[2] for _, entry in entries])
+                    })
+
+        return result
+
+    def get_fgt_time_matrix(self, ids, fgt_start=None, fgt_end=None, start=None, end=None):
+
+        """
+        Retrieve all the forecasts of one or many timeseries ids as dense fgt x time matrices, e.g. to evaluate
+        how the forecasts of a station evolve with the lead time. The data of all the ids is read with one
+        streaming query ordered by id, fgt and time, instead of one query per fgt.
+        :param ids: timeseries id, or list of timeseries ids
+        :param fgt_start: optional, inclusive lower bound of fgt
+        :param fgt_end: optional, inclusive upper bound of fgt
+        :param start: optional, inclusive lower bound of time
+        :param end: optional, inclusive upper bound of time
+        :return: (fgts, times, matrix) tuple for a single id, else dict of id to (fgts, times, matrix).
+        fgts and times are sorted datetime64[ns] arrays and matrix is a float64 array of shape
+        (len(fgts), len(times)) with NaN where a forecast has no value for a time.
+        Ids without data map to empty arrays.
+        """
+
+        single_id = isinstance(ids, str)
+        id_list = list(dict.fromkeys([ids] if single_id else ids))
+
+        empty_times, _ = empty_timeseries_arrays()
+        result = {id_: (empty_times, empty_times, np.empty((0, 0), dtype='float64')) for id_ in id_list}
+
+        if len(id_list) > 0:
+            condition_list = ["`id` IN (" + ", ".join(["%s"] * len(id_list)) + ")"]
+            variable_list = list(id_list)
+
+            for column, operator, bound in (('fgt', '>=', fgt_start), ('fgt', '<=', fgt_end),
+                                            ('time', '>=', start), ('time', '<=', end)):
+                if bound is not None:
+                    condition_list.append("`{}`{}%s".format(column, operator))
+                    variable_list.append(bound)
+
+            sql_statement = "SELECT `id`, `fgt`, `time`, `value` FROM `data` WHERE " + \
+                            " AND ".join(condition_list) + " ORDER BY `id`, `fgt`, `time`;"
+
+            # the fgt of each row travels in the key column, so that each id comes back as one group
+            blocks = execute_streaming_read_query(self.pool, sql_statement, tuple(variable_list), block_size=10000,
+                    as_dict=False)
+            fgt_column = []
+
+            def keyed_rows():
+                for block in blocks:
+                    rows = []
+                    for id_, fgt, time_, value in block:
+                        fgt_column.append(fgt)
+                        rows.append((id_, time_, value))
+                    yield rows
+
+            grouped = grouped_rows_to_timeseries_arrays(keyed_rows())
+
+            fgts = np.empty(len(fgt_column), dtype='datetime64[ns]')
+            fgts[:] = fgt_column
+            group_start = 0
+            for id_, (times, values) in grouped.items():
+                group_end = group_start + len(times)
+                result[id_] = pivot_to_matrix(fgts[group_start:group_end], times, values)
+                group_start = group_end
+
+        return result[ids] if single_id else result
+
+    def stream_timeseries(self, id_, fgt=None, start=None, end=None, block_size=None):
+        """
+        Lazily stream timeseries rows of the data table using a server side cursor (memory stays bounded
+        regardless of the number of rows). A pooled connection is held until the generator is exhausted or closed.
+        :param id_: timeseries id
+        :param fgt: forecast generated time. If None, rows of all the fgts are streamed
+        :param start: start time inclusive (optional)
+        :param end: end time inclusive (optional)
+        :param block_size: if given, yield lists of at most block_size rows instead of single rows
+        :return: generator of (time, value) tuples if fgt is given, else (fgt, time, value) tuples,
+        ordered by fgt and time
+        """
+
+        condition_list = ["`id`=%s"]
+        variable_list = [id_]
+
+        if fgt is not None:
+            columns = "`time`, `value`"
+            condition_list.append("`fgt`=%s")
+            variable_list.append(fgt)
+        else:
+            columns = "`fgt`, `time`, `value`"
+        if start is not None:
+            condition_list.append("`time`>=%s")
+            variable_list.append(start)
+        if end is not None:
+            condition_list.append("`time`<=%s")
+            variable_list.append(end)
+
+        sql_statement = "SELECT " + columns + " FROM `data` WHERE " + " AND ".join(condition_list) + \
+                        " ORDER BY `fgt`, `time`;"
+
+        return execute_streaming_read_query(self.pool, sql_statement, tuple(variable_list), block_size=block_size,
+                as_dict=False)
+
     def delete_timeseries(self, id_, fgt):
         """
         Delete specific timeseries identified by hash id and a fgt
@@ -593,6 +1010,8 @@ class Timeseries:
                 row_count = cursor.execute(sql_statement, id_)
 
             connection.commit()
+            if self.run_id_index is not None:
+                self.run_id_index.discard(id_)
             return row_count
         except Exception as exception:
             connection.rollback()
@@ -3,6 +3,7 @@ import traceback
 
 from db_adapter.exceptions import DatabaseAdapterError
 from db_adapter.logger import logger
+from db_adapter.base.lookup_cache import LookupCache, cached_lookup, invalidates
 """
 Source JSON Object would looks like this 
 e.g.:
@@ -17,6 +18,10 @@ e.g.:
 """
 
 
+# source lookups, invalidated whenever a source is added or deleted through this module
+source_cache = LookupCache(name='curw_obs.source')
+
+
 def get_source_by_id(pool, id_):
     """
     Retrieve source by id
@@ -45,6 +50,7 @@ def get_source_by_id(pool, id_):
             connection.close()
 
 
+@cached_lookup(source_cache)
 def get_source_id(pool, source) -> str:
     """
     Retrieve Source id
@@ -73,6 +79,7 @@ def get_source_id(pool, source) -> str:
             connection.close()
 
 
+@invalidates(source_cache)
 def add_source(pool, source, parameters=None):
     """
     Insert sources into the database
@@ -131,6 +138,7 @@ def add_sources(sources, pool):
         print(source.get('source'))
 
 
+@invalidates(source_cache)
 def delete_source(pool, source):
     """
     Delete source from Source table, given source
@@ -162,6 +170,7 @@ def delete_source(pool, source):
             connection.close()
 
 
+@invalidates(source_cache)
 def delete_source_by_id(pool, id_):
     """
     Delete source from Source table by id
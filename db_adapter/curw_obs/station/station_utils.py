@@ -8,6 +8,7 @@ from db_adapter.curw_obs.station.station_enum import StationEnum
 from db_adapter.logger import logger
 from db_adapter.exceptions import DatabaseAdapterError
 from db_adapter.constants import COMMON_DATE_TIME_FORMAT
+from db_adapter.base.lookup_cache import LookupCache, cached_lookup, invalidates
 
 """
 Station JSON Object would looks like this 
@@ -23,6 +24,10 @@ e.g.:
 """
 
 
+# station lookups, invalidated whenever a station is added or deleted through this module
+station_cache = LookupCache(name='curw_obs.station')
+
+
 def get_station_by_id(pool, id_):
     """
     Retrieve station by id
@@ -51,6 +56,7 @@ def get_station_by_id(pool, id_):
             connection.close()
 
 
+@cached_lookup(station_cache)
 def get_station_id(pool, latitude, longitude, station_type) -> str:
     """
     Retrieve station id
@@ -90,6 +96,7 @@ def get_station_id(pool, latitude, longitude, station_type) -> str:
             connection.close()
 
 
+@invalidates(station_cache)
 def add_station(pool, name, latitude, longitude, station_type, description=None):
     """
     Insert sources into the database
@@ -186,6 +193,7 @@ def add_stations(stations, pool):
         print(station.get('name'))
 
 
+@invalidates(station_cache)
 def delete_station(pool, latitude, longitude, station_type):
     """
     Delete station from Station table
@@ -228,6 +236,7 @@ def delete_station(pool, latitude, longitude, station_type):
             connection.close()
 
 
+@invalidates(station_cache)
 def delete_station_by_id(pool, id_):
     """
     Delete station from Station table by id
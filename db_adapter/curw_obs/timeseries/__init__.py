@@ -1 +1,3 @@
-from .timeseries import Timeseries
\ No newline at end of file
+from .timeseries import Timeseries
+from .resample_utils import Aggregation, resample_timeseries, resample_timeseries_bulk
+from .incremental_ingest import IncrementalIngest
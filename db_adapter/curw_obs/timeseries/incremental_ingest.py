@@ -0,0 +1,174 @@
+import threading
+import traceback
+from datetime import datetime
+
+from db_adapter.logger import logger
+from db_adapter.constants import COMMON_DATE_TIME_FORMAT
+from db_adapter.base.bulk_writer import BulkWriter, WriteMode
+from db_adapter.base.watermarks import update_watermarks
+
+# run ids per IN list when looking up watermarks that are not cached yet
+LOOKUP_CHUNK_SIZE = 1000
+
+
+class IncrementalIngest:
+    """
+    Incremental ingestion of observed timeseries for collectors polling many gauges.
+    The end_date (watermark) of every run is kept in an in-process cache, seeded from the run table with one query.
+    For each batch of (id, rows), the rows at or before the watermark of their id are dropped, the rest is written
+    with multi-row INSERT statements, and the end_date (and start_date) of all the ids are advanced in one
+    statement, all on one connection and in one transaction. The cache only moves after the commit.
+    e.g.:
+        ingest = IncrementalIngest(pool)
+        report = ingest.ingest([(tms_id_1, [[time, value], ...]), (tms_id_2, [[time, value], ...])])
+    """
+
+    def __init__(self, pool, upsert=True, batch_size=None):
+        """
+        :param pool: curw_obs connection pool
+        :param boolean upsert: If True, upsert existing values ON DUPLICATE KEY (rows written by another
+        collector since the cache was seeded). Default is True.
+        :param batch_size: rows per multi-row INSERT statement (default DEFAULT_BATCH_SIZE)
+        """
+        self.pool = pool
+        self.writer = BulkWriter(table='data', columns=('id', 'time', 'value'),
+                mode=WriteMode.UPSERT if upsert else WriteMode.INSERT, batch_size=batch_size)
+        self._watermarks = {}
+        self._seeded = False
+        self._lock = threading.Lock()
+
+    def seed(self):
+        """
+        (Re)load the end_date of all the runs into the watermark cache, with one query
+        :return: number of runs cached
+        """
+
+        connection = self.pool.connection()
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT `id`, `end_date` FROM `run`")
+                watermarks = {row.get('id'): row.get('end_date') for row in cursor.fetchall()}
+        except Exception as exception:
+            error_message = "Seeding the end_date watermarks failed."
+            logger.error(error_message)
+            traceback.print_exc()
+            raise exception
+        finally:
+            if connection is not None:
+                connection.close()
+
+        with self._lock:
+            self._watermarks = watermarks
+            self._seeded = True
+        return len(watermarks)
+
+    def _lookup(self, ids):
+        """
+        Add the watermarks of ids missing in the cache (runs created after the cache was seeded)
+        """
+
+        connection = self.pool.connection()
+        try:
+            found = {}
+            with connection.cursor() as cursor:
+                for chunk_start in range(0, len(ids), LOOKUP_CHUNK_SIZE):
+                    chunk = ids[chunk_start:chunk_start + LOOKUP_CHUNK_SIZE]
+                    sql_statement = "SELECT `id`, `end_date` FROM `run` WHERE `id` IN (" + \
+                                    ", ".join(["%s"] * len(chunk)) + ")"
+                    cursor.execute(sql_statement, tuple(chunk))
+                    found.update((row.get('id'), row.get('end_date')) for row in cursor.fetchall())
+        finally:
+            if connection is not None:
+                connection.close()
+
+        with self._lock:
+            for id_, end_date in found.items():
+                self._watermarks.setdefault(id_, end_date)
+
+    def watermark(self, id_):
+        """
+        :return: cached end_date of the id, None if the run has no end_date or is not cached
+        """
+        with self._lock:
+            return self._watermarks.get(id_)
+
+    def _advance(self, end_dates):
+
+        with self._lock:
+            for id_, end_date in end_dates.items():
+                cached = self._watermarks.get(id_)
+                if cached is None or end_date > cached:
+                    self._watermarks[id_] = end_date
+
+    def ingest(self, batch):
+        """
+        Ingest the new rows of many timeseries
+        :param batch: iterable of (tms_id, timeseries) pairs, timeseries as list of [time, value] lists with times
+        as datetime or 'YYYY-MM-DD HH:MM:SS' strings. An id may repeat.
+        :return: report dict with the number of 'ids' written, 'rows' written, 'skipped_rows' (at or before the
+        watermark) and the 'unknown_ids' (not in the run table, their rows are skipped)
+        """
+
+        batch = list(batch)
+        if not self._seeded:
+            self.seed()
+
+        with self._lock:
+            uncached = list(dict.fromkeys(id_ for id_, _ in batch if id_ not in self._watermarks))
+        if len(uncached) > 0:
+            self._lookup(uncached)
+
+        rows = []
+        start_dates = {}
+        end_dates = {}
+        skipped_rows = 0
+        unknown_ids = []
+
+        with self._lock:
+            for id_, timeseries in batch:
+                if id_ not in self._watermarks:
+                    unknown_ids.append(id_)
+                    skipped_rows += len(timeseries)
+                    continue
+
+                watermark = self._watermarks.get(id_)
+                for t in timeseries:
+                    time_ = t[0]
+                    if type(time_) is str:
+                        time_ = datetime.strptime(time_, COMMON_DATE_TIME_FORMAT)
+                    if watermark is not None and time_ <= watermark:
+                        skipped_rows += 1
+                        continue
+
+                    rows.append((id_, time_, t[1]))
+                    if id_ not in start_dates or time_ < start_dates[id_]:
+                        start_dates[id_] = time_
+                    if id_ not in end_dates or time_ > end_dates[id_]:
+                        end_dates[id_] = time_
+
+        if len(unknown_ids) > 0:
+            logger.warning("Skipping the rows of {} ids missing in the run table, e.g. {}"
+                           .format(len(unknown_ids), unknown_ids[:5]))
+
+        report = {'ids': len(end_dates), 'rows': len(rows), 'skipped_rows': skipped_rows, 'unknown_ids': unknown_ids}
+        if len(rows) == 0:
+            return report
+
+        connection = self.pool.connection()
+        try:
+            self.writer.write(connection, rows, commit=False)
+            update_watermarks(connection, 'run', 'end_date', end_dates.items(), later=True)
+            update_watermarks(connection, 'run', 'start_date', start_dates.items(), later=False)
+            connection.commit()
+        except Exception as exception:
+            connection.rollback()
+            error_message = "Incremental ingestion of {} rows of {} ids failed.".format(len(rows), len(end_dates))
+            logger.error(error_message)
+            traceback.print_exc()
+            raise exception
+        finally:
+            if connection is not None:
+                connection.close()
+
+        self._advance(end_dates)
+        return report
@@ -0,0 +1,169 @@
+from enum import Enum
+
+import numpy as np
+import pymysql
+
+from db_adapter.curw_obs.unit import UnitType
+from db_adapter.base.columnar import empty_timeseries_arrays
+
+# TO_SECONDS('1970-01-01 00:00:00'), seconds from year 0 to the unix epoch
+TO_SECONDS_EPOCH_OFFSET = 62167219200
+
+FETCH_SIZE = 10000
+
+
+class Aggregation(Enum):
+    SUM = 'sum'
+    MEAN = 'mean'
+    MAX = 'max'
+    LAST = 'last'
+
+    @staticmethod
+    def for_unit_type(unit_type):
+        """
+        Default aggregation of a UnitType: Accumulative values are summed, Mean values are averaged and
+        Instantaneous (and Other) values keep the last value of each bucket
+        """
+        _unitTypeToAggregation = {
+                UnitType.Accumulative: Aggregation.SUM,
+                UnitType.Mean        : Aggregation.MEAN
+                }
+
+        return _unitTypeToAggregation.get(unit_type, Aggregation.LAST)
+
+
+_SQL_FUNCTIONS = {
+        Aggregation.SUM : 'SUM',
+        Aggregation.MEAN: 'AVG',
+        Aggregation.MAX : 'MAX'
+        }
+
+
+def bucket_end_times(buckets, step):
+    """
+    End times of resampling buckets, i.e. CEIL(TO_SECONDS(time) / (step * 60)) values
+    :param buckets: int64 numpy array of bucket numbers
+    :param step: bucket length in minutes
+    :return: datetime64[ns] numpy array
+    """
+    return (buckets * (step * 60) - TO_SECONDS_EPOCH_OFFSET).astype('datetime64[s]').astype('datetime64[ns]')
+
+
+def _time_buckets(times, step):
+    seconds = times.astype('datetime64[s]').astype(np.int64) + TO_SECONDS_EPOCH_OFFSET
+    return -(-seconds // (step * 60))  # ceil, buckets are closed on the right, as in the SQL
+
+
+def _fetch_columns(connection, sql_statement, sql_values, column_count):
+
+    columns = [[] for _ in range(column_count)]
+    with connection.cursor(pymysql.cursors.SSCursor) as cursor:
+        cursor.execute(sql_statement, sql_values)
+        while True:
+            rows = cursor.fetchmany(FETCH_SIZE)
+            if not rows:
+                break
+            for column, values in zip(columns, zip(*rows)):
+                column.extend(values)
+    return columns
+
+
+def _split_by_id(id_column, times, values):
+    """
+    Slice (times, values) arrays ordered by id at the id boundaries
+    :return: dict of id to (times, values)
+    """
+
+    result = {}
+    group_start = 0
+    for i in range(1, len(id_column) + 1):
+        if i == len(id_column) or id_column[i] != id_column[group_start]:
+            result[id_column[group_start]] = (times[group_start:i], values[group_start:i])
+            group_start = i
+    return result
+
+
+def resample_timeseries_bulk(connection, ids, step, start, end=None, unit_type=UnitType.Accumulative,
+                             aggregation=None):
+    """
+    Resample the observed timeseries of many ids to a regular step in one query. Each bucket covers
+    (end - step, end] and is labelled by its end time, aligned to multiples of the step.
+    SUM, MEAN and MAX are aggregated by the database (GROUP BY id, CEIL(TO_SECONDS(time) / (step * 60))),
+    LAST reads the rows ordered by id and time and keeps the last value of each bucket.
+    Note: the former FLOOR(((TO_SECONDS(time) / 60) - 1) / step) grouping is identical for times on whole minutes,
+    but put times with non-zero seconds in the first minute after a boundary (e.g. 10:00:30) in the bucket ending
+    at the boundary (10:00). These times now go to the next bucket (10:05), as (end - step, end] requires.
+    :param connection: connection to curw_obs database
+    :param ids: list of timeseries ids
+    :param step: bucket length in minutes, any positive integer
+    :param start: start time inclusive
+    :param end: optional, end time inclusive
+    :param unit_type: UnitType of the timeseries, selects the aggregation if aggregation is None
+    :param aggregation: optional, Aggregation overriding the default of the unit type
+    :return: dict of id to (times, values) datetime64[ns] and float64 numpy arrays, ids without data map to
+    empty arrays
+    """
+
+    step = int(step)
+    if step <= 0:
+        raise ValueError("Resampling step must be a positive number of minutes, got {}".format(step))
+
+    if aggregation is None:
+        aggregation = Aggregation.for_unit_type(unit_type)
+
+    ids = list(dict.fromkeys(ids))
+    empty_times, empty_values = empty_timeseries_arrays()
+    result = {id_: (empty_times, empty_values) for id_ in ids}
+    if len(ids) == 0:
+        return result
+
+    condition_list = ["`id` IN (" + ", ".join(["%s"] * len(ids)) + ")", "`time` >= %s"]
+    sql_values = list(ids) + [start]
+    if end is not None:
+        condition_list.append("`time` <= %s")
+        sql_values.append(end)
+    conditions = " AND ".join(condition_list)
+
+    if aggregation is Aggregation.LAST:
+        sql_statement = "SELECT `id`, `time`, `value` FROM `data` WHERE " + conditions + " ORDER BY `id`, `time`"
+        id_column, time_column, value_column = _fetch_columns(connection, sql_statement, tuple(sql_values), 3)
+        if len(id_column) == 0:
+            return result
+
+        times = np.empty(len(time_column), dtype='datetime64[ns]')
+        values = np.empty(len(value_column), dtype='float64')
+        times[:] = time_column
+        values[:] = value_column
+
+        buckets = _time_buckets(times, step)
+        ids_array = np.array(id_column, dtype=object)
+        # last row of each (id, bucket) group
+        last = np.ones(len(buckets), dtype=bool)
+        last[:-1] = (buckets[1:] != buckets[:-1]) | (ids_array[1:] != ids_array[:-1])
+
+        result.update(_split_by_id(list(ids_array[last]), bucket_end_times(buckets[last], step), values[last]))
+        return result
+
+    sql_statement = "SELECT `id`, CEIL(TO_SECONDS(`time`) / %s) AS `bucket`, {}(`value`) AS `value` FROM `data` " \
+                    "WHERE {} GROUP BY `id`, `bucket` ORDER BY `id`, `bucket`"\
+        .format(_SQL_FUNCTIONS[aggregation], conditions)
+    id_column, bucket_column, value_column = _fetch_columns(connection, sql_statement,
+            tuple([step * 60] + sql_values), 3)
+    if len(id_column) == 0:
+        return result
+
+    buckets = np.array([int(bucket) for bucket in bucket_column], dtype=np.int64)
+    values = np.empty(len(value_column), dtype='float64')
+    values[:] = value_column
+
+    result.update(_split_by_id(id_column, bucket_end_times(buckets, step), values))
+    return result
+
+
+def resample_timeseries(connection, id_, step, start, end=None, unit_type=UnitType.Accumulative, aggregation=None):
+    """
+    Resample the observed timeseries of a single id, see resample_timeseries_bulk
+    :return: (times, values) datetime64[ns] and float64 numpy arrays
+    """
+    return resample_timeseries_bulk(connection, [id_], step, start, end=end, unit_type=unit_type,
+            aggregation=aggregation)[id_]
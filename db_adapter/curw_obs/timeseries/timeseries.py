@@ -1,6 +1,5 @@
+import numpy as np
 import pandas as pd
-import hashlib
-import json
 import traceback
 from pymysql import IntegrityError
 from datetime import datetime, timedelta
@@ -9,11 +8,26 @@ from db_adapter.logger import logger
 from db_adapter.exceptions import DatabaseAdapterError, DuplicateEntryError
 from db_adapter.curw_obs.station import StationEnum
 from db_adapter.constants import COMMON_DATE_TIME_FORMAT
+from db_adapter.base.pymysql_base import execute_streaming_read_query
+from db_adapter.base.bulk_writer import BulkWriter, WriteMode
+from db_adapter.base.columnar import ReturnType, to_datetime64
+from db_adapter.base.delta import insert_timeseries_delta
+from db_adapter.base.hash_id import generate_hash_id, generate_hash_ids
+from db_adapter.base.watermarks import apply_watermarks
 
 
 class Timeseries:
-    def __init__(self, pool):
+    # metadata keys hashed into the timeseries id
+    TIMESERIES_ID_KEYS = ('latitude', 'longitude', 'station_type', 'variable', 'unit', 'unit_type')
+
+    def __init__(self, pool, run_id_index=None):
+        """
+        :param pool: connection pool
+        :param run_id_index: optional RunIdIndex of the run table, answers the timeseries id existence checks
+        without a query per id
+        """
         self.pool = pool
+        self.run_id_index = run_id_index
 
     @staticmethod
     def generate_timeseries_id(meta_data):
@@ -29,22 +43,18 @@ class Timeseries:
         :return: str: sha256 hash value in hex format (length of 64 characters)
         """
 
-        sha256 = hashlib.sha256()
-        hash_data = {
-                'latitude'    : '',
-                'longitude'   : '',
-                'station_type': '',
-                'variable'    : '',
-                'unit'        : '',
-                'unit_type'   : ''
-                }
+        return generate_hash_id(meta_data, Timeseries.TIMESERIES_ID_KEYS)
 
-        for key in hash_data.keys():
-            hash_data[key] = meta_data[key]
-
-        sha256.update(json.dumps(hash_data, sort_keys=True).encode("ascii"))
-        event_id = sha256.hexdigest()
-        return event_id
+    @staticmethod
+    def generate_timeseries_ids(records, processes=None):
+        """
+        Generate the event ids for a batch of metadata records. Ids are identical to the ids generated by
+        generate_timeseries_id for each record.
+        :param records: pandas DataFrame with a column per metadata key, or list of metadata dicts
+        :param processes: number of worker processes to spread the hashing, None to hash in the calling process
+        :return: list of sha256 hash values in hex format, in the order of the records
+        """
+        return generate_hash_ids(records, Timeseries.TIMESERIES_ID_KEYS, processes=processes)
 
     def get_timeseries_id_if_exists(self, meta_data):
 
@@ -56,6 +66,9 @@ class Timeseries:
         """
         event_id = self.generate_timeseries_id(meta_data)
 
+        if self.run_id_index is not None:
+            return event_id if self.run_id_index.contains(event_id) else None
+
         connection = self.pool.connection()
         try:
             with connection.cursor() as cursor:
@@ -77,6 +90,9 @@ class Timeseries:
         :param id_:
         :return: True, if id is in the database, False otherwise
         """
+        if self.run_id_index is not None:
+            return self.run_id_index.contains(id_)
+
         connection = self.pool.connection()
         try:
             with connection.cursor() as cursor:
@@ -92,28 +108,24 @@ class Timeseries:
             if connection is not None:
                 connection.close()
 
-    def insert_data(self, timeseries, upsert=False):
+    def insert_data(self, timeseries, upsert=False, batch_size=None, commit_per_batch=False):
         """
         Insert timeseries to Data table in the database
         :param timeseries: list of [tms_id, time, value] lists
         :param boolean upsert: If True, upsert existing values ON DUPLICATE KEY. Default is False.
         Ref: 1). https://stackoverflow.com/a/14383794/1461060
              2). https://chartio.com/resources/tutorials/how-to-insert-if-row-does-not-exist-upsert-in-mysql/
+        :param batch_size: number of rows per multi-row INSERT statement (default DEFAULT_BATCH_SIZE)
+        :param commit_per_batch: if True commit after every batch, else commit once after all the rows are written
         :return: row count if insertion was successful, else raise DatabaseAdapterError
         """
 
-        row_count = 0
         connection = self.pool.connection()
         try:
-            with connection.cursor() as cursor:
-                if upsert:
-                    sql_statement = "INSERT INTO `data` (`id`, `time`, `value`) VALUES (%s, %s, %s) " \
-                                    "ON DUPLICATE KEY UPDATE `value`=VALUES(`value`)"
-                else:
-                    sql_statement = "INSERT INTO `data` (`id`, `time`, `value`) VALUES (%s, %s, %s)"
-                row_count = cursor.executemany(sql_statement, timeseries)
-            connection.commit()
-            return row_count
+            writer = BulkWriter(table='data', columns=('id', 'time', 'value'),
+                    mode=WriteMode.UPSERT if upsert else WriteMode.INSERT, batch_size=batch_size,
+                    commit_per_batch=commit_per_batch)
+            return writer.write(connection, timeseries).row_count
         except Exception as exception:
             connection.rollback()
             error_message = "Data insertion to data table for tms id {}, upsert={} failed.".format(timeseries[0][0],
@@ -126,6 +138,23 @@ class Timeseries:
             if connection is not None:
                 connection.close()
 
+    def insert_data_delta(self, timeseries, tms_id, tolerance=0.0, checksum_tracker=None, batch_size=None):
+        """
+        Write only the new or changed values of a timeseries (e.g. when a timeseries is re-pushed after a partial
+        failure), instead of rewriting every row ON DUPLICATE KEY. The existing values of the id and time range
+        are read with one range scan and compared with the incoming values.
+        :param tms_id: hash value
+        :param timeseries: list of [time, value] lists
+        :param tolerance: absolute difference below which values are considered unchanged
+        :param checksum_tracker: optional ChecksumTracker, a timeseries identical to the last one written for the
+        same id and time range is skipped without reading the database
+        :param batch_size: number of rows per multi-row INSERT statement (default DEFAULT_BATCH_SIZE)
+        :return: dict with the number of rows 'written' and 'skipped', else raise the exception
+        """
+
+        return insert_timeseries_delta(self.pool, timeseries, tms_id, tolerance=tolerance,
+                checksum_tracker=checksum_tracker, batch_size=batch_size)
+
     # def insert_timeseries(self, timeseries, run_tuple):
     #
     #     """
@@ -217,6 +246,8 @@ class Timeseries:
                                                run_meta.get('variable_id'), run_meta.get('unit_id')))
 
             connection.commit()
+            if self.run_id_index is not None:
+                self.run_id_index.add(run_meta.get('tms_id'))
             return run_meta.get('tms_id')
         except Exception as exception:
             connection.rollback()
@@ -268,19 +299,12 @@ class Timeseries:
         if type(end_date) is str:
             end_date = datetime.strptime(end_date, COMMON_DATE_TIME_FORMAT)
 
-        existing_end_date = None
         try:
 
             with connection.cursor() as cursor:
-                sql_statement = "SELECT `end_date` FROM `run` WHERE `id`=%s"
-                row_count= cursor.execute(sql_statement, id_)
-                if row_count > 0:
-                    existing_end_date = cursor.fetchone()['end_date']
-
-            if existing_end_date is None or existing_end_date < end_date:
-                with connection.cursor() as cursor:
-                    sql_statement = "UPDATE `run` SET `end_date`=%s WHERE `id`=%s"
-                    cursor.execute(sql_statement, (end_date, id_))
+                sql_statement = "UPDATE `run` SET `end_date`=%s WHERE `id`=%s " \
+                                "AND (`end_date` IS NULL OR `end_date` < %s)"
+                cursor.execute(sql_statement, (end_date, id_, end_date))
 
             connection.commit()
             return end_date
@@ -306,20 +330,12 @@ class Timeseries:
         if type(start_date) is str:
             start_date = datetime.strptime(start_date, COMMON_DATE_TIME_FORMAT)
 
-        existing_start_date = None
-
         try:
 
             with connection.cursor() as cursor:
-                sql_statement = "SELECT `start_date` FROM `run` WHERE `id`=%s"
-                row_count = cursor.execute(sql_statement, id_)
-                if row_count > 0:
-                    existing_start_date = cursor.fetchone()['start_date']
-
-            if existing_start_date is None or existing_start_date > start_date:
-                with connection.cursor() as cursor:
-                    sql_statement = "UPDATE `run` SET `start_date`=%s WHERE `id`=%s"
-                    cursor.execute(sql_statement, (start_date, id_))
+                sql_statement = "UPDATE `run` SET `start_date`=%s WHERE `id`=%s " \
+                                "AND (`start_date` IS NULL OR `start_date` > %s)"
+                cursor.execute(sql_statement, (start_date, id_, start_date))
             connection.commit()
             return start_date
         except Exception as exception:
@@ -331,3 +347,107 @@ class Timeseries:
         finally:
             if connection is not None:
                 connection.close()
+
+    def update_end_dates(self, end_dates):
+        """
+        Batch counterpart of update_end_date. Move the end_date of many runs forward in one statement, keeping
+        the existing end_date where it is later (GREATEST is applied server side)
+        :param end_dates: list of (id, end_date) pairs, an id may repeat
+        :return: number of runs updated, else raise the exception
+        """
+        return apply_watermarks(self.pool, 'run', 'end_date', end_dates, later=True)
+
+    def update_start_dates(self, start_dates):
+        """
+        Batch counterpart of update_start_date. Move the start_date of many runs backward in one statement, keeping
+        the existing start_date where it is earlier (LEAST is applied server side)
+        :param start_dates: list of (id, start_date) pairs, an id may repeat
+        :return: number of runs updated, else raise the exception
+        """
+        return apply_watermarks(self.pool, 'run', 'start_date', start_dates, later=False)
+
+    def stream_timeseries(self, id_, start=None, end=None, block_size=None):
+        """
+        Lazily stream timeseries rows of the data table using a server side cursor (memory stays bounded
+        regardless of the number of rows). A pooled connection is held until the generator is exhausted or closed.
+        :param id_: timeseries id
+        :param start: start time inclusive (optional)
+        :param end: end time inclusive (optional)
+        :param block_size: if given, yield lists of at most block_size rows instead of single rows
+        :return: generator of (time, value) tuples ordered by time
+        """
+
+        condition_list = ["`id`=%s"]
+        variable_list = [id_]
+
+        if start is not None:
+            condition_list.append("`time`>=%s")
+            variable_list.append(start)
+        if end is not None:
+            condition_list.append("`time`<=%s")
+            variable_list.append(end)
+
+        sql_statement = "SELECT `time`, `value` FROM `data` WHERE " + " AND ".join(condition_list) + \
+                        " ORDER BY `time`;"
+
+        return execute_streaming_read_query(self.pool, sql_statement, tuple(variable_list), block_size=block_size,
+                as_dict=False)
+
+    def get_timeseries_matrix(self, ids, start, end, step=5, return_type=ReturnType.ARRAYS):
+        """
+        Retrieve the timeseries of many ids as a time x station matrix aligned to a regular time grid, with one
+        streaming query (`id` IN (...) ordered by id and time) instead of one query per station.
+        Values at times off the grid are left out, and grid times without a value are NaN.
+        :param ids: list of unique timeseries ids, the columns of the matrix in the same order
+        :param start: first time of the grid (inclusive), datetime or 'YYYY-MM-DD HH:MM:SS' string
+        :param end: last time of the grid (inclusive)
+        :param step: grid step in minutes
+        :param return_type: ReturnType.
+            - ARRAYS (default): (times, matrix) tuple, datetime64[ns] grid times and a float64 matrix of shape
+              (len(times), len(ids))
+            - DATAFRAME: wide DataFrame indexed by 'time' with a column per id
+            Other return types (e.g. LIST) raise a ValueError.
+        :return: (times, matrix) or DataFrame
+        """
+
+        if return_type not in (ReturnType.ARRAYS, ReturnType.DATAFRAME):
+            raise ValueError("Unsupported return type {} of a timeseries matrix, use ReturnType.ARRAYS or "
+                             "ReturnType.DATAFRAME.".format(return_type))
+
+        ids = list(ids)
+        columns = {id_: column for column, id_ in enumerate(ids)}
+        if len(columns) != len(ids):
+            raise ValueError("Timeseries ids of a matrix must be unique.")
+
+        start64 = to_datetime64(start)
+        step64 = np.timedelta64(int(step), 'm').astype('timedelta64[ns]')
+        times = np.arange(start64, to_datetime64(end) + step64, step64)
+        times = times[times <= to_datetime64(end)]
+        matrix = np.full((len(times), len(ids)), np.nan)
+
+        if len(ids) > 0 and len(times) > 0:
+            sql_statement = "SELECT `id`, `time`, `value` FROM `data` WHERE `id` IN (" + \
+                            ", ".join(["%s"] * len(ids)) + ") AND `time`>=%s AND `time`<=%s ORDER BY `id`, `time`;"
+
+            id_column, time_column, value_column = [], [], []
+            for block in execute_streaming_read_query(self.pool, sql_statement, tuple(ids) + (start, end),
+                    block_size=10000, as_dict=False):
+                for id_, time_, value in block:
+                    id_column.append(columns[id_])
+                    time_column.append(time_)
+                    value_column.append(value)
+
+            if len(id_column) > 0:
+                row_times = np.empty(len(time_column), dtype='datetime64[ns]')
+                values = np.empty(len(value_column), dtype='float64')
+                row_times[:] = time_column
+                values[:] = value_column
+
+                offsets = row_times - start64
+                on_grid = (offsets % step64) == np.timedelta64(0, 'ns')
+                matrix[offsets[on_grid] // step64, np.array(id_column)[on_grid]] = values[on_grid]
+
+        if return_type is ReturnType.DATAFRAME:
+            return pd.DataFrame(matrix, index=pd.DatetimeIndex(times, name='time'), columns=ids)
+
+        return times, matrix
@@ -2,6 +2,7 @@ import traceback
 
 from db_adapter.logger import logger
 from db_adapter.exceptions import DatabaseAdapterError
+from db_adapter.base.lookup_cache import LookupCache, cached_lookup, invalidates
 
 """
 Unit JSON Object would looks like this
@@ -17,6 +18,10 @@ e.g.:
 """
 
 
+# unit lookups, invalidated whenever a unit is added or deleted through this module
+unit_cache = LookupCache(name='curw_obs.unit')
+
+
 def get_unit_by_id(pool, id_):
     """
     Retrieve unit by id
@@ -45,6 +50,7 @@ def get_unit_by_id(pool, id_):
             connection.close()
 
 
+@cached_lookup(unit_cache)
 def get_unit_id(pool, unit, unit_type) -> str:
     """
     Retrieve Unit id
@@ -74,6 +80,7 @@ def get_unit_id(pool, unit, unit_type) -> str:
             connection.close()
 
 
+@invalidates(unit_cache)
 def add_unit(pool, unit, unit_type):
     """
     Insert units into the database
@@ -128,6 +135,7 @@ def add_units(units, pool):
         print(unit.get('unit'))
 
 
+@invalidates(unit_cache)
 def delete_unit(pool, unit, unit_type):
     """
     Delete unit from Unit table, given unit and unit_type
@@ -161,6 +169,7 @@ def delete_unit(pool, unit, unit_type):
             connection.close()
 
 
+@invalidates(unit_cache)
 def delete_unit_by_id(pool, id_):
     """
     Delete unit from Unit table by id
@@ -2,6 +2,7 @@ import traceback
 
 from db_adapter.logger import logger
 from db_adapter.exceptions import DatabaseAdapterError
+from db_adapter.base.lookup_cache import LookupCache, cached_lookup, invalidates
 
 """
 Variable JSON Object would looks like this
@@ -12,6 +13,10 @@ e.g.:
 """
 
 
+# variable lookups, invalidated whenever a variable is added or deleted through this module
+variable_cache = LookupCache(name='curw_obs.variable')
+
+
 def get_variable_by_id(pool, id_):
     """
     Retrieve variable by id
@@ -40,6 +45,7 @@ def get_variable_by_id(pool, id_):
             connection.close()
 
 
+@cached_lookup(variable_cache)
 def get_variable_id(pool, variable) -> str:
     """
     Retrieve Variable id
@@ -68,6 +74,7 @@ def get_variable_id(pool, variable) -> str:
             connection.close()
 
 
+@invalidates(variable_cache)
 def add_variable(pool, variable):
     """
     Insert variables into the database
@@ -116,6 +123,7 @@ def add_variables(variables, pool):
         print(variable.get('variable'))
 
 
+@invalidates(variable_cache)
 def delete_variable(pool, variable):
     """
     Delete variable from Variable table, given variable name
@@ -147,6 +155,7 @@ def delete_variable(pool, variable):
             connection.close()
 
 
+@invalidates(variable_cache)
 def delete_variable_by_id(pool, id_):
     """
     Delete variable from Variable table by id
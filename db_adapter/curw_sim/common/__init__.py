@@ -1,4 +1,4 @@
-from .ts_utils import fill_ts_missing_entries
+from .ts_utils import fill_ts_missing_entries, fill_ts_missing_entries_batch
 from .common_utils import process_5_min_ts, process_15_min_ts, process_continuous_ts, \
     convert_15_min_ts_to_5_mins_ts, \
     extract_obs_rain_5_min_ts, extract_obs_rain_15_min_ts, extract_obs_rain_custom_min_intervals, \
@@ -1,8 +1,15 @@
 import traceback
 from datetime import datetime, timedelta
 import math
+import numpy as np
+import pymysql
 
 from db_adapter.logger import logger
+from db_adapter.base.columnar import ReturnType, fetch_timeseries, timeseries_arrays_to_return_type
+from db_adapter.curw_obs.unit import UnitType
+from db_adapter.curw_obs.timeseries.resample_utils import resample_timeseries
+from db_adapter.curw_sim.common.vector_ts_utils import MISSING_VALUE, to_datetime64_array, align_index, \
+    continuous_index, downscale_15_to_5_index, merge_index, ragged_values
 
 
 def round_up_datetime_to_nearest_x_minutes(datetime_value, mins):
@@ -14,6 +21,14 @@ def round_up_datetime_to_nearest_x_minutes(datetime_value, mins):
     return base_time + timedelta(minutes=mins*multiplier)
 
 
+def _row_times(timeseries):
+    return to_datetime64_array([row[0] for row in timeseries])
+
+
+def _grid_times(grid):
+    return grid.astype('datetime64[us]').tolist()
+
+
 def process_continuous_ts(original_ts, expected_start, filling_value, timestep):
     """
 
@@ -24,109 +39,65 @@ def process_continuous_ts(original_ts, expected_start, filling_value, timestep):
     :return: timeseries as list of [time, value] pairs
     """
 
-    processed_ts = []
+    grid, index = continuous_index(_row_times(original_ts), expected_start, timestep)
 
-    current_timestamp = expected_start
-    original_ts_index = 0
-
-    while original_ts_index < len(original_ts):
-        if current_timestamp == original_ts[original_ts_index][0]:
-            processed_ts.append(original_ts[original_ts_index])
-            original_ts_index +=1
-            current_timestamp = current_timestamp + timedelta(minutes=timestep)
-        elif current_timestamp < original_ts[original_ts_index][0]:
-            processed_ts.append([current_timestamp, filling_value])
-            current_timestamp = current_timestamp + timedelta(minutes=timestep)
-        else:
-            original_ts_index +=1
-
-    return processed_ts
+    return [list(original_ts[position]) if position >= 0 else [time_, filling_value]
+            for time_, position in zip(_grid_times(grid), index.tolist())]
 
 
 def process_5_min_ts(newly_extracted_timeseries, expected_start):
 
-    processed_ts = []
-
-    current_timestamp = expected_start
-    extracted_ts_index = 0
-
-    while extracted_ts_index < len(newly_extracted_timeseries):
-        if current_timestamp == newly_extracted_timeseries[extracted_ts_index][0]:
-            processed_ts.append(newly_extracted_timeseries[extracted_ts_index])
-            extracted_ts_index +=1
-            current_timestamp = current_timestamp + timedelta(minutes=5)
-        elif current_timestamp < newly_extracted_timeseries[extracted_ts_index][0]:
-            processed_ts.append([current_timestamp, -99999])
-            current_timestamp = current_timestamp + timedelta(minutes=5)
-        else:
-            extracted_ts_index +=1
-
-    return processed_ts
+    return process_continuous_ts(newly_extracted_timeseries, expected_start, MISSING_VALUE, 5)
 
 
 def process_15_min_ts(newly_extracted_timeseries, expected_start):
 
-    processed_ts = []
-
-    current_timestamp = expected_start
-    extracted_ts_index = 0
-
-    while extracted_ts_index < len(newly_extracted_timeseries):
-        if current_timestamp == newly_extracted_timeseries[extracted_ts_index][0]:
-            processed_ts.append(newly_extracted_timeseries[extracted_ts_index])
-            extracted_ts_index +=1
-            current_timestamp = current_timestamp + timedelta(minutes=15)
-        elif current_timestamp < newly_extracted_timeseries[extracted_ts_index][0]:
-            processed_ts.append([current_timestamp, -99999])
-            current_timestamp = current_timestamp + timedelta(minutes=15)
-        else:
-            extracted_ts_index +=1
-
-    return processed_ts
+    return process_continuous_ts(newly_extracted_timeseries, expected_start, MISSING_VALUE, 15)
 
 
 def fill_missing_values(newly_extracted_timeseries, OBS_TS):
+    """
+    Fill the missing (-99999) values of OBS_TS with the values of newly_extracted_timeseries at the same timestamps
+    :return: new list of [time, value] lists (OBS_TS is not modified)
+    """
 
-    obs_timeseries = OBS_TS
-
-    obs_index = 0
-    new_ts_index = 0
+    index = align_index(_row_times(newly_extracted_timeseries), _row_times(OBS_TS))
 
-    while new_ts_index < len(newly_extracted_timeseries) and obs_index < len(obs_timeseries):
-        if obs_timeseries[obs_index][0] == newly_extracted_timeseries[new_ts_index][0]:
-            if obs_timeseries[obs_index][1] == -99999:
-                obs_timeseries[obs_index][1] == newly_extracted_timeseries[new_ts_index][1]
-            obs_index += 1
-            new_ts_index += 1
-        elif obs_timeseries[obs_index][0] < newly_extracted_timeseries[new_ts_index][0]:
-            obs_index += 1
-        else:
-            new_ts_index += 1
+    obs_timeseries = []
+    for row, position in zip(OBS_TS, index.tolist()):
+        row = list(row)
+        if position >= 0 and row[1] == MISSING_VALUE:
+            row[1] = newly_extracted_timeseries[position][1]
+        obs_timeseries.append(row)
 
     return obs_timeseries
 
 
 def convert_15_min_ts_to_5_mins_ts(newly_extracted_timeseries, expected_start=None):
 
-    processed_ts = []
+    grid, index = downscale_15_to_5_index(_row_times(newly_extracted_timeseries), expected_start)
 
-    current_timestamp = newly_extracted_timeseries[0][0]
-    if expected_start is not None:
-        current_timestamp = expected_start
+    return [[time_, newly_extracted_timeseries[position][1]/3] if position >= 0 else [time_, MISSING_VALUE]
+            for time_, position in zip(_grid_times(grid), index.tolist())]
 
-    extracted_ts_index = 0
 
-    while extracted_ts_index < len(newly_extracted_timeseries):
-        if current_timestamp > newly_extracted_timeseries[extracted_ts_index][0]:
-            extracted_ts_index += 1
-        elif (newly_extracted_timeseries[extracted_ts_index][0] - current_timestamp) < timedelta(minutes=15):
-            processed_ts.append([current_timestamp, newly_extracted_timeseries[extracted_ts_index][1]/3])
-            current_timestamp = current_timestamp + timedelta(minutes=5)
-        else:
-            processed_ts.append([current_timestamp, -99999])
-            current_timestamp = current_timestamp + timedelta(minutes=5)
+def _merge_ts(ts1, ts2):
+    """
+    Outer merge of 2 timeseries on timestamp; rows of both timeseries get the ts2 value appended to the ts1 row
+    """
+
+    times, index1, index2 = merge_index(_row_times(ts1), _row_times(ts2))
+
+    merged_ts = [None] * len(times)
+    both = (index1 >= 0) & (index2 >= 0)
+    for position, position1, position2 in zip(np.flatnonzero(both).tolist(), index1[both].tolist(),
+                                              index2[both].tolist()):
+        merged_ts[position] = [*ts1[position1], ts2[position2][1]]
+    for ts, index, only in ((ts1, index1, index2 < 0), (ts2, index2, index1 < 0)):
+        for position, ts_position in zip(np.flatnonzero(only).tolist(), index[only].tolist()):
+            merged_ts[position] = list(ts[ts_position])
 
-    return processed_ts
+    return merged_ts
 
 
 def join_ts(TS1, TS2):
@@ -136,34 +107,9 @@ def join_ts(TS1, TS2):
     """
 
     if TS1[-1][0] > TS2[-1][0]:
-        ts1 = TS1
-        ts2 = TS2
+        return _merge_ts(TS1, TS2)
     else:
-        ts1 = TS2
-        ts2 = TS1
-
-    output_ts=[]
-
-    ts1_index = 0
-    ts2_index = 0
-
-    # ts1 last entry has the largest timestamp
-    while ts2_index < len(ts2):
-        if ts1[ts1_index][0] == ts2[ts2_index][0]:
-            output_ts.append(ts1[ts1_index])
-            output_ts[-1].append(ts2[ts2_index][1])
-            ts1_index +=1
-            ts2_index +=1
-        elif ts1[ts1_index][0] < ts2[ts2_index][0]:
-            output_ts.append(ts1[ts1_index])
-            ts1_index += 1
-        elif ts1[ts1_index][0] > ts2[ts2_index][0]:
-            output_ts.append(ts2[ts2_index])
-            ts2_index +=1
-
-    output_ts.extend(ts1[ts1_index:])
-
-    return output_ts
+        return _merge_ts(TS2, TS1)
 
 
 def append_ts(original_ts, new_ts):
@@ -174,35 +120,7 @@ def append_ts(original_ts, new_ts):
     :return:
     """
 
-    appended_ts = []
-
-    original_ts_index = 0
-    new_ts_index = 0
-
-    while original_ts_index < len(original_ts):
-
-        if new_ts_index < len(new_ts):
-
-            if original_ts[original_ts_index][0] == new_ts[new_ts_index][0]:
-                appended_ts.append(original_ts[original_ts_index])
-                appended_ts[original_ts_index].append(new_ts[new_ts_index][1])
-                original_ts_index += 1
-                new_ts_index += 1
-            elif original_ts[original_ts_index][0] < new_ts[new_ts_index][0]:
-                appended_ts.append(original_ts[original_ts_index])
-                original_ts_index += 1
-            elif original_ts[original_ts_index][0] > new_ts[new_ts_index][0]:
-                appended_ts.append(new_ts[new_ts_index])
-                new_ts_index += 1
-        else:
-            if original_ts_index < len(original_ts):
-                appended_ts.extend(original_ts[original_ts_index:])
-            break
-
-    if new_ts_index < len(new_ts):
-        appended_ts.extend(new_ts[new_ts_index:])
-
-    return appended_ts
+    return _merge_ts(original_ts, new_ts)
 
 
 def append_value_for_timestamp(existing_ts, new_ts):
@@ -214,16 +132,10 @@ def append_value_for_timestamp(existing_ts, new_ts):
     :return: list of [timestamp, value1, value2, .., valuen, VALUE]
     """
 
-    appended_ts =[]
-
     if len(existing_ts) == len(new_ts) and existing_ts[0][0] == new_ts[0][0]:
-        for i in range(len(existing_ts)):
-            appended_ts.append(existing_ts[i])
-            appended_ts[i].append(new_ts[i][1])
-    else:
-        return existing_ts
+        return [list(existing_row) + [new_row[1]] for existing_row, new_row in zip(existing_ts, new_ts)]
 
-    return appended_ts
+    return existing_ts
 
 
 def average_timeseries(timeseries):
@@ -232,14 +144,12 @@ def average_timeseries(timeseries):
     :param timeseries:
     :return:
     """
-    avg_timeseries = []
 
-    for i in range(len(timeseries)):
-        if len(timeseries[i])>1:
-            count = len(timeseries[i])-1
-            avg_timeseries.append([timeseries[i][0], '%.3f' % (sum(timeseries[i][1:])/count)])
+    timeseries = [row for row in timeseries if len(row) > 1]
+    values, counts = ragged_values(timeseries)
+    averages = values.sum(axis=1) / counts if len(timeseries) > 0 else []
 
-    return avg_timeseries
+    return [[row[0], '%.3f' % average] for row, average in zip(timeseries, averages)]
 
 
 def summed_timeseries(timeseries):
@@ -248,38 +158,45 @@ def summed_timeseries(timeseries):
     :param timeseries:
     :return:
     """
-    sum_timeseries = []
 
-    for i in range(len(timeseries)):
-        if len(timeseries[i])>1:
-            sum_timeseries.append([timeseries[i][0], '%.3f' % (sum(timeseries[i][1:]))])
+    timeseries = [row for row in timeseries if len(row) > 1]
+    values, _ = ragged_values(timeseries)
+    sums = values.sum(axis=1) if len(timeseries) > 0 else []
 
-    return sum_timeseries
+    return [[row[0], '%.3f' % total] for row, total in zip(timeseries, sums)]
 
 
 ##########################
 # Extract obs timeseries #
 ##########################
-def extract_obs_rain_5_min_ts(connection, id, start_time, end_time=None):
+def extract_obs_rain_5_min_ts(connection, id, start_time, end_time=None, return_type=ReturnType.LIST):
     """
     Extract obs station timeseries (15 min intervals)
     :param connection: connection to curw database
     :param stations_dict: dictionary with station_id as keys and run_ids as values
     :param start_time: start of timeseries
+    :param return_type: ReturnType. ARRAYS and DATAFRAME fill numpy arrays straight from a tuple cursor
     :return:
     """
 
     timeseries = []
 
     try:
+        if end_time is None:
+            sql_statement = "select `time`, `value`  from data where `id`=%s and `time` >= %s ;"
+            sql_values = (id, start_time)
+        else:
+            sql_statement = "select `time`, `value`  from data where `id`=%s and `time` >= %s and `time` <= %s;"
+            sql_values = (id, start_time, end_time)
+
+        if return_type is not ReturnType.LIST:
+            with connection.cursor(pymysql.cursors.Cursor) as cursor1:
+                cursor1.execute(sql_statement, sql_values)
+                return fetch_timeseries(cursor1, return_type)
+
         # Extract per 5 min observed timeseries
         with connection.cursor() as cursor1:
-            if end_time is None:
-                sql_statement = "select `time`, `value`  from data where `id`=%s and `time` >= %s ;"
-                rows = cursor1.execute(sql_statement, (id, start_time))
-            else:
-                sql_statement = "select `time`, `value`  from data where `id`=%s and `time` >= %s and `time` <= %s;"
-                rows = cursor1.execute(sql_statement, (id, start_time, end_time))
+            rows = cursor1.execute(sql_statement, sql_values)
 
             if rows > 0:
                 results = cursor1.fetchall()
@@ -293,84 +210,47 @@ def extract_obs_rain_5_min_ts(connection, id, start_time, end_time=None):
         logger.error("Exception occurred while retrieving observed rainfall 5 min timeseries from database")
 
 
-def extract_obs_rain_15_min_ts(connection, id, start_time, end_time=None):
+def extract_obs_rain_15_min_ts(connection, id, start_time, end_time=None, return_type=ReturnType.LIST):
     """
     Extract obs station timeseries (15 min intervals)
     :param connection: connection to curw database
     :param stations_dict: dictionary with station_id as keys and run_ids as values
     :param start_time: start of timeseries
+    :param return_type: ReturnType. ARRAYS and DATAFRAME fill numpy arrays straight from a tuple cursor
     :return:
     """
 
-    timeseries = []
-
-    try:
-        # Extract per 15 min observed timeseries
-        with connection.cursor() as cursor1:
-            # sql_statement = "select max(`time`) as time, sum(`value`) as value from `data` where `id`=%s and `time` >= %s " \
-            #                 "group by floor((HOUR(TIMEDIFF(time, %s))*60+MINUTE(TIMEDIFF(time, %s))-1)/15);"
-
-            if end_time is None:
-                sql_statement = "select max(`time`) as time, sum(`value`) as value from `data` where `id`=%s and `time` >= %s " \
-                                "group by floor(((to_seconds(time)/60)-1)/15);"
-                rows = cursor1.execute(sql_statement, (id, start_time))
-            else:
-                sql_statement = "select max(`time`) as time, sum(`value`) as value from `data` where `id`=%s and `time` >= %s and `time` <= %s " \
-                                "group by floor(((to_seconds(time)/60)-1)/15);"
-                rows = cursor1.execute(sql_statement, (id, start_time, end_time))
-
-            if rows > 0:
-                results = cursor1.fetchall()
-                for result in results:
-                    timeseries.append([round_up_datetime_to_nearest_x_minutes(result.get('time'), 15),
-                                       result.get('value')])
-
-        return timeseries
-
-    except Exception as ex:
-        traceback.print_exc()
-        logger.error("Exception occurred while retrieving observed rainfall 15 min timeseries from database")
+    return extract_obs_rain_custom_min_intervals(connection, id, 15, start_time, end_time=end_time,
+            return_type=return_type)
 
 
-def extract_obs_rain_custom_min_intervals(connection, id, time_step, start_time, end_time=None):
+def extract_obs_rain_custom_min_intervals(connection, id, time_step, start_time, end_time=None,
+                                          return_type=ReturnType.LIST):
     """
-    Extract obs station timeseries (custom min intervals)
+    Extract obs station timeseries (custom min intervals). Rainfall is summed over buckets of time_step minutes,
+    labelled by their end time (see db_adapter.curw_obs.timeseries.resample_utils)
     :param connection: connection to curw database
     :param start_time: start of timeseries
     :param id: hash id of the timeseries
-    :param time_step: frequency of the timeseries
+    :param time_step: frequency of the timeseries, in minutes
     :param end_time: end of the timeseries
+    :param return_type: ReturnType. ARRAYS and DATAFRAME fill numpy arrays straight from a tuple cursor
     :return:
     """
 
-    timeseries = []
-
     try:
-        # Extract per 15 min observed timeseries
-        with connection.cursor() as cursor1:
-            # sql_statement = "select max(`time`) as time, sum(`value`) as value from `data` where `id`=%s and `time` >= %s " \
-            #                 "group by floor((HOUR(TIMEDIFF(time, %s))*60+MINUTE(TIMEDIFF(time, %s))-1)/15);"
-
-            if end_time is None:
-                sql_statement = "select max(`time`) as time, sum(`value`) as value from `data` where `id`=%s and `time` >= %s " \
-                                "group by floor(((to_seconds(time)/60)-1)/" + time_step + ");"
-                rows = cursor1.execute(sql_statement, (id, start_time))
-            else:
-                sql_statement = "select max(`time`) as time, sum(`value`) as value from `data` where `id`=%s and `time` >= %s and `time` <= %s " \
-                                "group by floor(((to_seconds(time)/60)-1)/" + time_step + ");"
-                rows = cursor1.execute(sql_statement, (id, start_time, end_time))
+        times, values = resample_timeseries(connection, id, int(time_step), start_time, end=end_time,
+                unit_type=UnitType.Accumulative)
 
-            if rows > 0:
-                results = cursor1.fetchall()
-                for result in results:
-                    timeseries.append([round_up_datetime_to_nearest_x_minutes(result.get('time'), 60),
-                                       result.get('value')])
+        if return_type is not ReturnType.LIST:
+            return timeseries_arrays_to_return_type(times, values, return_type)
 
-        return timeseries
+        return [[time_, value] for time_, value in zip(times.astype('datetime64[us]').tolist(), values.tolist())]
 
     except Exception as ex:
         traceback.print_exc()
-        logger.error("Exception occurred while retrieving observed rainfall 15 min timeseries from database")
+        logger.error("Exception occurred while retrieving observed rainfall {} min timeseries from database"
+                     .format(time_step))
 
 
 ########
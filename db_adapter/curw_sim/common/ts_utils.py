@@ -1,6 +1,8 @@
 import pandas as pd
 import numpy as np
 
+from db_adapter.curw_sim.common.vector_ts_utils import to_datetime64_array, regular_grid, align_index
+
 
 def fill_ts_missing_entries(start, end, timeseries, interpolation_method, timestep):
     """
@@ -33,6 +35,76 @@ def fill_ts_missing_entries(start, end, timeseries, interpolation_method, timest
     return final_df.reset_index().values.tolist()
 
 
+def _float_values(values):
+    try:
+        return np.array(values, dtype='float64')
+    except (TypeError, ValueError):
+        return pd.to_numeric(pd.Series(values, dtype=object), errors='coerce').to_numpy(dtype='float64')
+
+
+def _interpolate_linear(matrix):
+    """
+    Linear interpolation of the NaN entries of each column of a matrix of equally spaced rows, in both directions
+    (leading and trailing NaNs take the first and last valid value, as pandas limit_direction='both')
+    :param matrix: 2-D float64 numpy array
+    :return: new matrix, columns without any valid value stay NaN
+    """
+
+    row_count = matrix.shape[0]
+    valid = ~np.isnan(matrix)
+    rows = np.arange(row_count)[:, None]
+
+    # position of the previous and the next valid row of every entry
+    previous = np.maximum.accumulate(np.where(valid, rows, -1), axis=0)
+    next_ = np.minimum.accumulate(np.where(valid, rows, row_count)[::-1], axis=0)[::-1]
+    previous = np.where(previous < 0, next_, previous)
+    next_ = np.where(next_ >= row_count, previous, next_)
+
+    columns = np.arange(matrix.shape[1])
+    previous_values = matrix[np.clip(previous, 0, row_count - 1), columns]
+    next_values = matrix[np.clip(next_, 0, row_count - 1), columns]
+
+    span = next_ - previous
+    weights = np.divide(rows - previous, span, out=np.zeros(matrix.shape), where=span > 0)
+    result = previous_values + (next_values - previous_values) * weights
+    result[:, ~valid.any(axis=0)] = np.nan
+
+    return result
+
+
+def fill_ts_missing_entries_batch(start, end, timeseries_list, interpolation_method, timestep):
+    """
+    Batched fill_ts_missing_entries: align many timeseries on one shared regular index and interpolate them
+    together as a 2-D float array (e.g. all the FLO2D grid cells at once)
+    :param start: "YYYY-MM-DD HH:MM:SS" the starting timestamp of the timeseries index
+    :param end: "YYYY-MM-DD HH:MM:SS" the last timestamp of the timeseries index
+    :param timeseries_list: list of timeseries, each a list of [time, value] lists sorted by time
+    :param interpolation_method: pandas interpolation method, 'linear' is interpolated in numpy
+    :param timestep: int: the timestep value in minutes
+    :return: (times, values) tuple, datetime64[ns] index times and a float64 matrix of shape
+    (len(times), len(timeseries_list)) with a column per timeseries, in the order of timeseries_list
+    """
+
+    times = regular_grid(start, end, timestep)
+    values = np.full((len(times), len(timeseries_list)), np.nan)
+
+    for column, timeseries in enumerate(timeseries_list):
+        if len(timeseries) == 0:
+            continue
+        series_times, series_values = zip(*((t[0], t[1]) for t in timeseries))
+        index = align_index(to_datetime64_array(series_times), times)
+        values[index >= 0, column] = _float_values(series_values)[index[index >= 0]]
+
+    if len(times) == 0:
+        return times, values
+
+    if interpolation_method == 'linear':
+        return times, _interpolate_linear(values)
+
+    df = pd.DataFrame(values, index=pd.DatetimeIndex(times))
+    return times, df.interpolate(method=interpolation_method, limit_direction='both').to_numpy(dtype='float64')
+
+
 # TS2 = [["2019-08-22 01:00:00", 1.8], ["2019-08-22 02:30:00", 1.5], ["2019-08-22 03:30:00", 1.4],["2019-08-22 07:30:00", 2.4],
 #        ["2019-08-22 08:30:00", 2.5], ["2019-08-23 07:30:00", 2.5], ["2019-08-23 08:30:00", 2.5]]
 #
@@ -0,0 +1,164 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+
+"""
+NumPy counterparts of the list based timeseries utilities of common_utils, on sorted datetime64[ns] time arrays
+and float64 value arrays (values may be 2-D, a column per series). Alignment is done with searchsorted instead of
+walking the lists, and nothing is modified in place.
+
+The *_index functions only compute the alignment (positions in the input arrays, -1 where there is no entry),
+so that the list adapters in common_utils can keep the original row objects and value types.
+"""
+
+MISSING_VALUE = -99999
+
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+
+
+def to_datetime64_array(times):
+    """
+    :param times: sequence of datetime, numpy datetime64 or 'YYYY-MM-DD HH:MM:SS' strings
+    :return: datetime64[ns] numpy array
+    """
+    if isinstance(times, np.ndarray) and times.dtype == 'datetime64[ns]':
+        return times
+    if len(times) > 0 and type(times[0]) is datetime:
+        # numpy converts datetime objects one by one, the integer offsets are several times faster
+        try:
+            return np.fromiter(((time_ - _EPOCH) // _MICROSECOND for time_ in times), dtype=np.int64,
+                    count=len(times)).view('datetime64[us]').astype('datetime64[ns]')
+        except TypeError:
+            pass  # strings or timezone aware datetimes among the times
+    array = np.empty(len(times), dtype='datetime64[ns]')
+    array[:] = times
+    return array
+
+
+def _step(minutes):
+    return np.timedelta64(int(minutes), 'm').astype('timedelta64[ns]')
+
+
+def regular_grid(start, end, timestep):
+    """
+    :return: datetime64[ns] times from start to end (inclusive) every timestep minutes
+    """
+    start = np.datetime64(start, 'ns')
+    end = np.datetime64(end, 'ns')
+    if end < start:
+        return np.empty(0, dtype='datetime64[ns]')
+    step = _step(timestep)
+    return start + step * np.arange((end - start) // step + 1)
+
+
+def align_index(times, grid):
+    """
+    Position of the first entry of the sorted times equal to each grid time
+    :return: int64 numpy array, -1 where the grid time has no entry
+    """
+    positions = np.searchsorted(times, grid, side='left')
+    found = positions < len(times)
+    found[found] = times[positions[found]] == grid[found]
+    return np.where(found, positions, -1)
+
+
+def continuous_index(times, expected_start, timestep):
+    """
+    Alignment of process_continuous: a grid every timestep minutes from expected_start up to the last entry
+    :return: (grid, index) with index as in align_index
+    """
+    if len(times) == 0:
+        return np.empty(0, dtype='datetime64[ns]'), np.empty(0, dtype=np.int64)
+    grid = regular_grid(expected_start, times[-1], timestep)
+    return grid, align_index(times, grid)
+
+
+def process_continuous(times, values, expected_start, filling_value, timestep):
+    """
+    Regular timeseries every timestep minutes from expected_start up to the last entry, taking the values at
+    the grid times and filling_value where there is no entry (entries off the grid are dropped)
+    :return: (grid, values)
+    """
+    grid, index = continuous_index(times, expected_start, timestep)
+    output = np.full((len(grid),) + values.shape[1:], filling_value, dtype='float64')
+    output[index >= 0] = values[index[index >= 0]]
+    return grid, output
+
+
+def fill_missing(times, values, new_times, new_values, missing_value=MISSING_VALUE):
+    """
+    Replace the missing_value entries of a timeseries with the values of another timeseries at the same times
+    :return: new values array
+    """
+    index = align_index(new_times, times)
+    fill = (values == missing_value) & (index >= 0)
+    output = values.astype('float64')
+    output[fill] = new_values[index[fill]]
+    return output
+
+
+def downscale_15_to_5_index(times, expected_start=None):
+    """
+    Alignment of convert_15_min_to_5_min: a 5 min grid from expected_start (the first entry by default) up to the
+    last entry. Each grid time takes the first entry at or after it, if that entry is less than 15 min later.
+    :return: (grid, index) with index -1 where there is no such entry
+    """
+    if len(times) == 0:
+        return np.empty(0, dtype='datetime64[ns]'), np.empty(0, dtype=np.int64)
+    grid = regular_grid(times[0] if expected_start is None else expected_start, times[-1], 5)
+    positions = np.searchsorted(times, grid, side='left')
+    valid = (times[positions] - grid) < _step(15)
+    return grid, np.where(valid, positions, -1)
+
+
+def convert_15_min_to_5_min(times, values, expected_start=None, missing_value=MISSING_VALUE):
+    """
+    Split a 15 min accumulated timeseries into a 5 min timeseries (a third of the 15 min value each)
+    :return: (grid, values)
+    """
+    grid, index = downscale_15_to_5_index(times, expected_start)
+    output = np.full(len(grid), missing_value, dtype='float64')
+    output[index >= 0] = values[index[index >= 0]] / 3
+    return grid, output
+
+
+def merge_index(times1, times2):
+    """
+    Outer merge of two sorted timeseries with unique times
+    :return: (times, index1, index2): sorted union of the times and the position of each time in times1 and
+    times2 (-1 where absent)
+    """
+    times = np.sort(np.concatenate((times1, times2)), kind='stable')
+    if len(times) > 1:
+        times = times[np.concatenate(([True], times[1:] != times[:-1]))]
+    return times, align_index(times1, times), align_index(times2, times)
+
+
+def join(times1, values1, times2, values2):
+    """
+    Outer join of two timeseries on time, with the columns of values1 followed by the columns of values2 and
+    NaN where a series has no entry
+    :return: (times, values) with values of shape (len(times), columns of values1 + columns of values2)
+    """
+    values1 = values1.reshape(len(values1), -1)
+    values2 = values2.reshape(len(values2), -1)
+    times, index1, index2 = merge_index(times1, times2)
+
+    output = np.full((len(times), values1.shape[1] + values2.shape[1]), np.nan)
+    output[index1 >= 0, :values1.shape[1]] = values1[index1[index1 >= 0]]
+    output[index2 >= 0, values1.shape[1]:] = values2[index2[index2 >= 0]]
+    return times, output
+
+
+def ragged_values(rows):
+    """
+    Value matrix of [time, value1, value2, ...] rows of different lengths, padded with 0
+    :return: (values, counts) float64 matrix and the number of values of each row
+    """
+    counts = np.fromiter((len(row) - 1 for row in rows), dtype=np.int64, count=len(rows))
+    width = counts.max() if len(rows) > 0 else 0
+    values = np.zeros((len(rows), width), dtype='float64')
+    mask = np.arange(width) < counts[:, None]
+    values[mask] = [value for row in rows for value in row[1:]]
+    return values, counts
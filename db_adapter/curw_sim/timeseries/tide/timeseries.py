@@ -1,17 +1,27 @@
 import pandas as pd
-import hashlib
-import json
 import traceback
 from pymysql import IntegrityError
 
 from db_adapter.logger import logger
 from db_adapter.exceptions import DatabaseAdapterError
 from db_adapter.curw_sim.grids import GridInterpolationEnum
+from db_adapter.base.pymysql_base import execute_streaming_read_query
+from db_adapter.base.bulk_writer import BulkWriter, WriteMode
+from db_adapter.base.hash_id import generate_hash_id, generate_hash_ids
 
 
 class Timeseries:
-    def __init__(self, pool):
+    # metadata keys hashed into the timeseries id
+    TIMESERIES_ID_KEYS = ('latitude', 'longitude', 'model', 'method')
+
+    def __init__(self, pool, run_id_index=None):
+        """
+        :param pool: connection pool
+        :param run_id_index: optional RunIdIndex of the tide_run table, answers the timeseries id existence checks
+        without a query per id
+        """
         self.pool = pool
+        self.run_id_index = run_id_index
 
     @staticmethod
     def generate_timeseries_id(meta_data):
@@ -26,20 +36,18 @@ class Timeseries:
         :return: str: sha256 hash value in hex format (length of 64 characters)
         """
 
-        sha256 = hashlib.sha256()
-        hash_data = {
-                'latitude' : '',
-                'longitude': '',
-                'model'    : '',
-                'method'   : ''
-                }
-
-        for key in hash_data.keys():
-            hash_data[key] = meta_data[key]
+        return generate_hash_id(meta_data, Timeseries.TIMESERIES_ID_KEYS)
 
-        sha256.update(json.dumps(hash_data, sort_keys=True).encode("ascii"))
-        event_id = sha256.hexdigest()
-        return event_id
+    @staticmethod
+    def generate_timeseries_ids(records, processes=None):
+        """
+        Generate the event ids for a batch of metadata records. Ids are identical to the ids generated by
+        generate_timeseries_id for each record.
+        :param records: pandas DataFrame with a column per metadata key, or list of metadata dicts
+        :param processes: number of worker processes to spread the hashing, None to hash in the calling process
+        :return: list of sha256 hash values in hex format, in the order of the records
+        """
+        return generate_hash_ids(records, Timeseries.TIMESERIES_ID_KEYS, processes=processes)
 
     def get_timeseries_id_if_exists(self, meta_data):
 
@@ -50,6 +58,9 @@ class Timeseries:
         """
         event_id = self.generate_timeseries_id(meta_data)
 
+        if self.run_id_index is not None:
+            return event_id if self.run_id_index.contains(event_id) else None
+
         connection = self.pool.connection()
         try:
             with connection.cursor() as cursor:
@@ -98,6 +109,9 @@ class Timeseries:
         :param id_:
         :return: True, if id is in the database, False otherwise
         """
+        if self.run_id_index is not None:
+            return self.run_id_index.contains(id_)
+
         connection = self.pool.connection()
         try:
             with connection.cursor() as cursor:
@@ -113,7 +127,7 @@ class Timeseries:
             if connection is not None:
                 connection.close()
 
-    def insert_data(self, timeseries, tms_id, upsert=False):
+    def insert_data(self, timeseries, tms_id, upsert=False, batch_size=None, commit_per_batch=False):
         """
         Insert timeseries to Data table in the database
         :param tms_id: hash value
@@ -121,6 +135,8 @@ class Timeseries:
         :param boolean upsert: If True, upsert existing values ON DUPLICATE KEY. Default is False.
         Ref: 1). https://stackoverflow.com/a/14383794/1461060
              2). https://chartio.com/resources/tutorials/how-to-insert-if-row-does-not-exist-upsert-in-mysql/
+        :param batch_size: number of rows per multi-row INSERT statement (default DEFAULT_BATCH_SIZE)
+        :param commit_per_batch: if True commit after every batch, else commit once after all the rows are written
         :return: row count if insertion was successful, else raise DatabaseAdapterError
         """
 
@@ -133,18 +149,12 @@ class Timeseries:
             else:
                 logger.warning('Invalid timeseries data:: %s', t)
 
-        row_count = 0
         connection = self.pool.connection()
         try:
-            with connection.cursor() as cursor:
-                if upsert:
-                    sql_statement = "INSERT INTO `tide_data` (`id`, `time`, `value`) VALUES (%s, %s, %s) " \
-                                    "ON DUPLICATE KEY UPDATE `value`=VALUES(`value`)"
-                else:
-                    sql_statement = "INSERT INTO `tide_data` (`id`, `time`, `value`) VALUES (%s, %s, %s)"
-                row_count = cursor.executemany(sql_statement, timeseries)
-            connection.commit()
-            return row_count
+            writer = BulkWriter(table='tide_data', columns=('id', 'time', 'value'),
+                    mode=WriteMode.UPSERT if upsert else WriteMode.INSERT, batch_size=batch_size,
+                    commit_per_batch=commit_per_batch)
+            return writer.write(connection, new_timeseries).row_count
         except Exception as exception:
             connection.rollback()
             error_message = "Data insertion to tide_data table for tms id {}, upsert={} failed.".format(timeseries[0][0],
@@ -157,7 +167,7 @@ class Timeseries:
             if connection is not None:
                 connection.close()
 
-    def insert_data_max(self, timeseries, tms_id, upsert=False):
+    def insert_data_max(self, timeseries, tms_id, upsert=False, batch_size=None, commit_per_batch=False):
         """
         Insert timeseries to DataMax table in the database
         :param tms_id: hash value
@@ -165,6 +175,8 @@ class Timeseries:
         :param boolean upsert: If True, upsert existing values ON DUPLICATE KEY. Default is False.
         Ref: 1). https://stackoverflow.com/a/14383794/1461060
              2). https://chartio.com/resources/tutorials/how-to-insert-if-row-does-not-exist-upsert-in-mysql/
+        :param batch_size: number of rows per multi-row INSERT statement (default DEFAULT_BATCH_SIZE)
+        :param commit_per_batch: if True commit after every batch, else commit once after all the rows are written
         :return: row count if insertion was successful, else raise DatabaseAdapterError
         """
 
@@ -177,18 +189,12 @@ class Timeseries:
             else:
                 logger.warning('Invalid timeseries data:: %s', t)
 
-        row_count = 0
         connection = self.pool.connection()
         try:
-            with connection.cursor() as cursor:
-                if upsert:
-                    sql_statement = "INSERT INTO `tide_data_max` (`id`, `time`, `value`) VALUES (%s, %s, %s) " \
-                                    "ON DUPLICATE KEY UPDATE `value`=VALUES(`value`)"
-                else:
-                    sql_statement = "INSERT INTO `tide_data_max` (`id`, `time`, `value`) VALUES (%s, %s, %s)"
-                row_count = cursor.executemany(sql_statement, timeseries)
-            connection.commit()
-            return row_count
+            writer = BulkWriter(table='tide_data_max', columns=('id', 'time', 'value'),
+                    mode=WriteMode.UPSERT if upsert else WriteMode.INSERT, batch_size=batch_size,
+                    commit_per_batch=commit_per_batch)
+            return writer.write(connection, new_timeseries).row_count
         except Exception as exception:
             connection.rollback()
             error_message = "Data insertion to tide_data table for tms id {}, upsert={} failed.".format(timeseries[0][0],
@@ -201,7 +207,7 @@ class Timeseries:
             if connection is not None:
                 connection.close()
 
-    def insert_data_min(self, timeseries, tms_id, upsert=False):
+    def insert_data_min(self, timeseries, tms_id, upsert=False, batch_size=None, commit_per_batch=False):
         """
         Insert timeseries to DataMin table in the database
         :param tms_id: hash value
@@ -209,6 +215,8 @@ class Timeseries:
         :param boolean upsert: If True, upsert existing values ON DUPLICATE KEY. Default is False.
         Ref: 1). https://stackoverflow.com/a/14383794/1461060
              2). https://chartio.com/resources/tutorials/how-to-insert-if-row-does-not-exist-upsert-in-mysql/
+        :param batch_size: number of rows per multi-row INSERT statement (default DEFAULT_BATCH_SIZE)
+        :param commit_per_batch: if True commit after every batch, else commit once after all the rows are written
         :return: row count if insertion was successful, else raise DatabaseAdapterError
         """
 
@@ -221,18 +229,12 @@ class Timeseries:
             else:
                 logger.warning('Invalid timeseries data:: %s', t)
 
-        row_count = 0
         connection = self.pool.connection()
         try:
-            with connection.cursor() as cursor:
-                if upsert:
-                    sql_statement = "INSERT INTO `tide_data_min` (`id`, `time`, `value`) VALUES (%s, %s, %s) " \
-                                    "ON DUPLICATE KEY UPDATE `value`=VALUES(`value`)"
-                else:
-                    sql_statement = "INSERT INTO `tide_data_min` (`id`, `time`, `value`) VALUES (%s, %s, %s)"
-                row_count = cursor.executemany(sql_statement, timeseries)
-            connection.commit()
-            return row_count
+            writer = BulkWriter(table='tide_data_min', columns=('id', 'time', 'value'),
+                    mode=WriteMode.UPSERT if upsert else WriteMode.INSERT, batch_size=batch_size,
+                    commit_per_batch=commit_per_batch)
+            return writer.write(connection, new_timeseries).row_count
         except Exception as exception:
             connection.rollback()
             error_message = "Data insertion to tide_data table for tms id {}, upsert={} failed.".format(timeseries[0][0],
@@ -291,6 +293,8 @@ class Timeseries:
                 cursor.execute(sql_statement, tide_run_tuple)
 
             connection.commit()
+            if self.run_id_index is not None:
+                self.run_id_index.add(tide_run_tuple[0])
             return tide_run_tuple[0]
         except Exception as exception:
             connection.rollback()
@@ -371,6 +375,9 @@ class Timeseries:
                 sql_statement = "UPDATE `tide_run` SET `id`=%s WHERE `id`=%s;"
                 cursor.execute(sql_statement, (new_id, existing_id))
             connection.commit()
+            if self.run_id_index is not None:
+                self.run_id_index.discard(existing_id)
+                self.run_id_index.add(new_id)
             return True
         except Exception as exception:
             connection.rollback()
@@ -410,6 +417,33 @@ class Timeseries:
             if connection is not None:
                 connection.close()
 
+    def stream_timeseries(self, id_, start_date=None, end_date=None, block_size=None):
+        """
+        Lazily stream timeseries rows of the tide_data table using a server side cursor (memory stays bounded
+        regardless of the number of rows). A pooled connection is held until the generator is exhausted or closed.
+        :param id_: timeseries id
+        :param start_date: start time inclusive (optional)
+        :param end_date: end time inclusive (optional)
+        :param block_size: if given, yield lists of at most block_size rows instead of single rows
+        :return: generator of (time, value) tuples ordered by time
+        """
+
+        condition_list = ["`id`=%s"]
+        variable_list = [id_]
+
+        if start_date is not None:
+            condition_list.append("`time`>=%s")
+            variable_list.append(start_date)
+        if end_date is not None:
+            condition_list.append("`time`<=%s")
+            variable_list.append(end_date)
+
+        sql_statement = "SELECT `time`, `value` FROM `tide_data` WHERE " + " AND ".join(condition_list) + \
+                        " ORDER BY `time`;"
+
+        return execute_streaming_read_query(self.pool, sql_statement, tuple(variable_list), block_size=block_size,
+                as_dict=False)
+
     def get_timeseries_end(self, id_):
         """
         Retrieve timeseries by id
@@ -1,17 +1,31 @@
 import pandas as pd
-import hashlib
-import json
 import traceback
+import pymysql
 from pymysql import IntegrityError
 
 from db_adapter.logger import logger
 from db_adapter.exceptions import DatabaseAdapterError
 from db_adapter.curw_sim.grids import GridInterpolationEnum
+from db_adapter.base.pymysql_base import execute_streaming_read_query
+from db_adapter.base.bulk_writer import BulkWriter, WriteMode
+from db_adapter.base.delta import insert_timeseries_delta
+from db_adapter.base.bulk_loader import BulkLoader
+from db_adapter.base.columnar import ReturnType, fetch_timeseries
+from db_adapter.base.hash_id import generate_hash_id, generate_hash_ids
 
 
 class Timeseries:
-    def __init__(self, pool):
+    # metadata keys hashed into the timeseries id
+    TIMESERIES_ID_KEYS = ('latitude', 'longitude', 'model', 'method')
+
+    def __init__(self, pool, run_id_index=None):
+        """
+        :param pool: connection pool
+        :param run_id_index: optional RunIdIndex of the run table, answers the timeseries id existence checks
+        without a query per id
+        """
         self.pool = pool
+        self.run_id_index = run_id_index
 
     @staticmethod
     def generate_timeseries_id(meta_data):
@@ -26,20 +40,18 @@ class Timeseries:
         :return: str: sha256 hash value in hex format (length of 64 characters)
         """
 
-        sha256 = hashlib.sha256()
-        hash_data = {
-                'latitude' : '',
-                'longitude': '',
-                'model'    : '',
-                'method'   : ''
-                }
-
-        for key in hash_data.keys():
-            hash_data[key] = meta_data[key]
+        return generate_hash_id(meta_data, Timeseries.TIMESERIES_ID_KEYS)
 
-        sha256.update(json.dumps(hash_data, sort_keys=True).encode("ascii"))
-        event_id = sha256.hexdigest()
-        return event_id
+    @staticmethod
+    def generate_timeseries_ids(records, processes=None):
+        """
+        Generate the event ids for a batch of metadata records. Ids are identical to the ids generated by
+        generate_timeseries_id for each record.
+        :param records: pandas DataFrame with a column per metadata key, or list of metadata dicts
+        :param processes: number of worker processes to spread the hashing, None to hash in the calling process
+        :return: list of sha256 hash values in hex format, in the order of the records
+        """
+        return generate_hash_ids(records, Timeseries.TIMESERIES_ID_KEYS, processes=processes)
 
     def get_timeseries_id_if_exists(self, meta_data):
 
@@ -50,6 +62,9 @@ class Timeseries:
         """
         event_id = self.generate_timeseries_id(meta_data)
 
+        if self.run_id_index is not None:
+            return event_id if self.run_id_index.contains(event_id) else None
+
         connection = self.pool.connection()
         try:
             with connection.cursor() as cursor:
@@ -98,6 +113,9 @@ class Timeseries:
         :param id_:
         :return: True, if id is in the database, False otherwise
         """
+        if self.run_id_index is not None:
+            return self.run_id_index.contains(id_)
+
         connection = self.pool.connection()
         try:
             with connection.cursor() as cursor:
@@ -113,7 +131,7 @@ class Timeseries:
             if connection is not None:
                 connection.close()
 
-    def insert_data(self, timeseries, tms_id, upsert=False):
+    def insert_data(self, timeseries, tms_id, upsert=False, batch_size=None, commit_per_batch=False):
         """
         Insert timeseries to Data table in the database
         :param tms_id: hash value
@@ -121,6 +139,8 @@ class Timeseries:
         :param boolean upsert: If True, upsert existing values ON DUPLICATE KEY. Default is False.
         Ref: 1). https://stackoverflow.com/a/14383794/1461060
              2). https://chartio.com/resources/tutorials/how-to-insert-if-row-does-not-exist-upsert-in-mysql/
+        :param batch_size: number of rows per multi-row INSERT statement (default DEFAULT_BATCH_SIZE)
+        :param commit_per_batch: if True commit after every batch, else commit once after all the rows are written
         :return: row count if insertion was successful, else raise DatabaseAdapterError
         """
 
@@ -133,18 +153,12 @@ class Timeseries:
             else:
                 logger.warning('Invalid timeseries data:: %s', t)
 
-        row_count = 0
         connection = self.pool.connection()
         try:
-            with connection.cursor() as cursor:
-                if upsert:
-                    sql_statement = "INSERT INTO `data` (`id`, `time`, `value`) VALUES (%s, %s, %s) " \
-                                    "ON DUPLICATE KEY UPDATE `value`=VALUES(`value`)"
-                else:
-                    sql_statement = "INSERT INTO `data` (`id`, `time`, `value`) VALUES (%s, %s, %s)"
-                row_count = cursor.executemany(sql_statement, timeseries)
-            connection.commit()
-            return row_count
+            writer = BulkWriter(table='data', columns=('id', 'time', 'value'),
+                    mode=WriteMode.UPSERT if upsert else WriteMode.INSERT, batch_size=batch_size,
+                    commit_per_batch=commit_per_batch)
+            return writer.write(connection, new_timeseries).row_count
         except Exception as exception:
             connection.rollback()
             error_message = "Data insertion to data table for tms id {}, upsert={} failed.".format(timeseries[0][0],
@@ -157,7 +171,57 @@ class Timeseries:
             if connection is not None:
                 connection.close()
 
-    def insert_data_max(self, timeseries, tms_id, upsert=False):
+    def insert_data_delta(self, timeseries, tms_id, tolerance=0.0, checksum_tracker=None, batch_size=None):
+        """
+        Write only the new or changed values of a timeseries (e.g. when a timeseries is re-pushed after a partial
+        failure), instead of rewriting every row ON DUPLICATE KEY. The existing values of the id and time range
+        are read with one range scan and compared with the incoming values.
+        :param tms_id: hash value
+        :param timeseries: list of [time, value] lists
+        :param tolerance: absolute difference below which values are considered unchanged
+        :param checksum_tracker: optional ChecksumTracker, a timeseries identical to the last one written for the
+        same id and time range is skipped without reading the database
+        :param batch_size: number of rows per multi-row INSERT statement (default DEFAULT_BATCH_SIZE)
+        :return: dict with the number of rows 'written' and 'skipped', else raise the exception
+        """
+
+        return insert_timeseries_delta(self.pool, timeseries, tms_id, tolerance=tolerance,
+                checksum_tracker=checksum_tracker, batch_size=batch_size)
+
+    def bulk_load_data(self, timeseries, tms_id, upsert=False):
+        """
+        Load timeseries to Data table with LOAD DATA LOCAL INFILE. Faster than insert_data for large
+        timeseries. The pool must be created with local_infile=True.
+        :param tms_id: hash value
+        :param timeseries: list of [time, value] lists
+        :param boolean upsert: If True, upsert existing values through a staging table, else rows with
+        existing keys are skipped. Default is False.
+        :return: row count if loading was successful, else raise DatabaseAdapterError
+        """
+
+        new_timeseries = []
+        for t in [i for i in timeseries]:
+            if len(t) > 1:
+                new_timeseries.append([tms_id, t[0], t[1]])
+            else:
+                logger.warning('Invalid timeseries data:: %s', t)
+
+        connection = self.pool.connection()
+        try:
+            loader = BulkLoader(table='data', columns=('id', 'time', 'value'))
+            return loader.load(connection, new_timeseries, upsert=upsert).row_count
+        except Exception as exception:
+            connection.rollback()
+            error_message = "Bulk loading to data table for tms id {}, upsert={} failed.".format(tms_id, upsert)
+            logger.error(error_message)
+            traceback.print_exc()
+            raise exception
+
+        finally:
+            if connection is not None:
+                connection.close()
+
+    def insert_data_max(self, timeseries, tms_id, upsert=False, batch_size=None, commit_per_batch=False):
         """
         Insert timeseries to DataMax table in the database
         :param tms_id: hash value
@@ -165,6 +229,8 @@ class Timeseries:
         :param boolean upsert: If True, upsert existing values ON DUPLICATE KEY. Default is False.
         Ref: 1). https://stackoverflow.com/a/14383794/1461060
              2). https://chartio.com/resources/tutorials/how-to-insert-if-row-does-not-exist-upsert-in-mysql/
+        :param batch_size: number of rows per multi-row INSERT statement (default DEFAULT_BATCH_SIZE)
+        :param commit_per_batch: if True commit after every batch, else commit once after all the rows are written
         :return: row count if insertion was successful, else raise DatabaseAdapterError
         """
 
@@ -177,18 +243,12 @@ class Timeseries:
             else:
                 logger.warning('Invalid timeseries data:: %s', t)
 
-        row_count = 0
         connection = self.pool.connection()
         try:
-            with connection.cursor() as cursor:
-                if upsert:
-                    sql_statement = "INSERT INTO `data_max` (`id`, `time`, `value`) VALUES (%s, %s, %s) " \
-                                    "ON DUPLICATE KEY UPDATE `value`=VALUES(`value`)"
-                else:
-                    sql_statement = "INSERT INTO `data_max` (`id`, `time`, `value`) VALUES (%s, %s, %s)"
-                row_count = cursor.executemany(sql_statement, timeseries)
-            connection.commit()
-            return row_count
+            writer = BulkWriter(table='data_max', columns=('id', 'time', 'value'),
+                    mode=WriteMode.UPSERT if upsert else WriteMode.INSERT, batch_size=batch_size,
+                    commit_per_batch=commit_per_batch)
+            return writer.write(connection, new_timeseries).row_count
         except Exception as exception:
             connection.rollback()
             error_message = "Data insertion to data table for tms id {}, upsert={} failed.".format(timeseries[0][0],
@@ -201,7 +261,7 @@ class Timeseries:
             if connection is not None:
                 connection.close()
 
-    def insert_data_min(self, timeseries, tms_id, upsert=False):
+    def insert_data_min(self, timeseries, tms_id, upsert=False, batch_size=None, commit_per_batch=False):
         """
         Insert timeseries to DataMin table in the database
         :param tms_id: hash value
@@ -209,6 +269,8 @@ class Timeseries:
         :param boolean upsert: If True, upsert existing values ON DUPLICATE KEY. Default is False.
         Ref: 1). https://stackoverflow.com/a/14383794/1461060
              2). https://chartio.com/resources/tutorials/how-to-insert-if-row-does-not-exist-upsert-in-mysql/
+        :param batch_size: number of rows per multi-row INSERT statement (default DEFAULT_BATCH_SIZE)
+        :param commit_per_batch: if True commit after every batch, else commit once after all the rows are written
         :return: row count if insertion was successful, else raise DatabaseAdapterError
         """
 
@@ -221,18 +283,12 @@ class Timeseries:
             else:
                 logger.warning('Invalid timeseries data:: %s', t)
 
-        row_count = 0
         connection = self.pool.connection()
         try:
-            with connection.cursor() as cursor:
-                if upsert:
-                    sql_statement = "INSERT INTO `data_min` (`id`, `time`, `value`) VALUES (%s, %s, %s) " \
-                                    "ON DUPLICATE KEY UPDATE `value`=VALUES(`value`)"
-                else:
-                    sql_statement = "INSERT INTO `data_min` (`id`, `time`, `value`) VALUES (%s, %s, %s)"
-                row_count = cursor.executemany(sql_statement, timeseries)
-            connection.commit()
-            return row_count
+            writer = BulkWriter(table='data_min', columns=('id', 'time', 'value'),
+                    mode=WriteMode.UPSERT if upsert else WriteMode.INSERT, batch_size=batch_size,
+                    commit_per_batch=commit_per_batch)
+            return writer.write(connection, new_timeseries).row_count
         except Exception as exception:
             connection.rollback()
             error_message = "Data insertion to data table for tms id {}, upsert={} failed.".format(timeseries[0][0],
@@ -245,7 +301,7 @@ class Timeseries:
             if connection is not None:
                 connection.close()
 
-    def replace_data(self, timeseries, tms_id):
+    def replace_data(self, timeseries, tms_id, batch_size=None, commit_per_batch=False):
         """
         Insert timeseries to Data table in the database
         :param tms_id: hash value
@@ -253,6 +309,8 @@ class Timeseries:
         :param boolean upsert: If True, upsert existing values ON DUPLICATE KEY. Default is False.
         Ref: 1). https://stackoverflow.com/a/14383794/1461060
              2). https://chartio.com/resources/tutorials/how-to-insert-if-row-does-not-exist-upsert-in-mysql/
+        :param batch_size: number of rows per multi-row REPLACE statement (default DEFAULT_BATCH_SIZE)
+        :param commit_per_batch: if True commit after every batch, else commit once after all the rows are written
         :return: row count if insertion was successful, else raise DatabaseAdapterError
         """
 
@@ -265,14 +323,11 @@ class Timeseries:
             else:
                 logger.warning('Invalid timeseries data:: %s', t)
 
-        row_count = 0
         connection = self.pool.connection()
         try:
-            with connection.cursor() as cursor:
-                sql_statement = "REPLACE INTO `data` (`id`, `time`, `value`) VALUES (%s, %s, %s)"
-                row_count = cursor.executemany(sql_statement, timeseries)
-            connection.commit()
-            return row_count
+            writer = BulkWriter(table='data', columns=('id', 'time', 'value'), mode=WriteMode.REPLACE,
+                    batch_size=batch_size, commit_per_batch=commit_per_batch)
+            return writer.write(connection, new_timeseries).row_count
         except Exception as exception:
             connection.rollback()
             error_message = "Data replace to data table for tms id {} failed.".format(timeseries[0][0])
@@ -330,6 +385,8 @@ class Timeseries:
                 cursor.execute(sql_statement, run_tuple)
 
             connection.commit()
+            if self.run_id_index is not None:
+                self.run_id_index.add(run_tuple[0])
             return run_tuple[0]
         except Exception as exception:
             connection.rollback()
@@ -410,6 +467,9 @@ class Timeseries:
                 sql_statement = "UPDATE `run` SET `id`=%s WHERE `id`=%s;"
                 cursor.execute(sql_statement, (new_id, existing_id))
             connection.commit()
+            if self.run_id_index is not None:
+                self.run_id_index.discard(existing_id)
+                self.run_id_index.add(new_id)
             return True
         except Exception as exception:
             connection.rollback()
@@ -421,19 +481,27 @@ class Timeseries:
             if connection is not None:
                 connection.close()
 
-    def get_timeseries(self, id_, start_date, end_date):
+    def get_timeseries(self, id_, start_date, end_date, return_type=ReturnType.LIST):
         """
         Retrieve timeseries by id
         :param id_:
+        :param return_type: ReturnType. ARRAYS and DATAFRAME fill numpy arrays straight from a tuple cursor
         :return: list of [time, value] pairs if id exists, else None
+        ((times, values) arrays or DataFrame for the ARRAYS and DATAFRAME return types)
         """
 
         connection = self.pool.connection()
         ts = []
         try:
 
+            sql_statement = "SELECT `time`,`value` FROM `data` WHERE `id`=%s AND `time` BETWEEN %s AND %s;"
+
+            if return_type is not ReturnType.LIST:
+                with connection.cursor(pymysql.cursors.Cursor) as cursor:
+                    cursor.execute(sql_statement, (id_, start_date, end_date))
+                    return fetch_timeseries(cursor, return_type)
+
             with connection.cursor() as cursor:
-                sql_statement = "SELECT `time`,`value` FROM `data` WHERE `id`=%s AND `time` BETWEEN %s AND %s;"
                 rows = cursor.execute(sql_statement, (id_, start_date, end_date))
                 if rows > 0:
                     results = cursor.fetchall()
@@ -449,6 +517,33 @@ class Timeseries:
             if connection is not None:
                 connection.close()
 
+    def stream_timeseries(self, id_, start_date=None, end_date=None, block_size=None):
+        """
+        Lazily stream timeseries rows of the data table using a server side cursor (memory stays bounded
+        regardless of the number of rows). A pooled connection is held until the generator is exhausted or closed.
+        :param id_: timeseries id
+        :param start_date: start time inclusive (optional)
+        :param end_date: end time inclusive (optional)
+        :param block_size: if given, yield lists of at most block_size rows instead of single rows
+        :return: generator of (time, value) tuples ordered by time
+        """
+
+        condition_list = ["`id`=%s"]
+        variable_list = [id_]
+
+        if start_date is not None:
+            condition_list.append("`time`>=%s")
+            variable_list.append(start_date)
+        if end_date is not None:
+            condition_list.append("`time`<=%s")
+            variable_list.append(end_date)
+
+        sql_statement = "SELECT `time`, `value` FROM `data` WHERE " + " AND ".join(condition_list) + \
+                        " ORDER BY `time`;"
+
+        return execute_streaming_read_query(self.pool, sql_statement, tuple(variable_list), block_size=block_size,
+                as_dict=False)
+
     def get_timeseries_end(self, id_):
         """
         Retrieve timeseries by id
@@ -25,6 +25,10 @@ setuptools.setup(
                           'PyYAML==5.1',
                           'aenum==2.1.2',
                           'DBUtils==1.3'],
+        extras_require={
+                'async': ['aiomysql>=0.0.20'],  # db_adapter.aio
+                'zstd': ['zstandard']  # zstd compressed run_info templates
+                },
         zip_safe=False,
         include_package_data=True  # to add non-code files specified in "MANIFEST.in" file
         )
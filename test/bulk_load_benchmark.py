@@ -0,0 +1,85 @@
+import time
+import traceback
+from datetime import datetime, timedelta
+
+from db_adapter.base import get_Pool, destroy_Pool
+from db_adapter.curw_fcst.timeseries import Timeseries
+
+# Compare executemany, multi-row INSERT (BulkWriter) and LOAD DATA LOCAL INFILE (BulkLoader) for a single
+# curw_fcst timeseries. The server must allow local_infile (SET GLOBAL local_infile = 1).
+
+ROW_COUNTS = [10000, 100000]
+
+TMS_ID = "0000000000000000000000000000000000000000000000000000000000bench"
+FGT = "2019-07-20 00:00:00"
+
+
+def generate_timeseries(row_count):
+    start = datetime(2019, 7, 20)
+    return [[TMS_ID, (start + timedelta(minutes=15 * i)).strftime("%Y-%m-%d %H:%M:%S"), FGT, float(i % 100)]
+            for i in range(row_count)]
+
+
+def executemany_insert(pool, timeseries, upsert):
+    connection = pool.connection()
+    try:
+        with connection.cursor() as cursor:
+            sql_statement = "INSERT INTO `data` (`id`, `time`, `fgt`, `value`) VALUES (%s, %s, %s, %s)"
+            if upsert:
+                sql_statement += " ON DUPLICATE KEY UPDATE `value`=VALUES(`value`)"
+            row_count = cursor.executemany(sql_statement, timeseries)
+        connection.commit()
+        return row_count
+    finally:
+        connection.close()
+
+
+def clean(ts):
+    ts.delete_timeseries(id_=TMS_ID, fgt=FGT)
+
+
+def timed(label, row_count, function):
+    start = time.perf_counter()
+    function()
+    elapsed = time.perf_counter() - start
+    print("{:<32} {:>8} rows {:>8.2f}s {:>10.0f} rows/s".format(label, row_count, elapsed, row_count / elapsed))
+
+
+try:
+
+    USERNAME = "root"
+    PASSWORD = "password"
+    HOST = "127.0.0.1"
+    PORT = 3306
+    DATABASE = "curw_fcst"
+
+    pool = get_Pool(host=HOST, port=PORT, user=USERNAME, password=PASSWORD, db=DATABASE, local_infile=True)
+
+    ts = Timeseries(pool=pool)
+
+    # the data table references the run table
+    ts.insert_run(run_meta={'tms_id': TMS_ID, 'sim_tag': "bulk_load_benchmark", 'station_id': 1, 'source_id': 1,
+                            'variable_id': 1, 'unit_id': 1, 'start_date': FGT, 'end_date': FGT})
+
+    for row_count in ROW_COUNTS:
+        timeseries = generate_timeseries(row_count)
+
+        for upsert in (False, True):
+            clean(ts)
+            timed("executemany upsert={}".format(upsert), row_count,
+                    lambda: executemany_insert(pool, timeseries, upsert))
+            clean(ts)
+            timed("multi-row insert upsert={}".format(upsert), row_count,
+                    lambda: ts.insert_formatted_data([list(t) for t in timeseries], upsert=upsert))
+            clean(ts)
+            timed("load data upsert={}".format(upsert), row_count,
+                    lambda: ts.bulk_load_data(timeseries, upsert=upsert))
+
+    clean(ts)
+    ts.delete_all_by_hash_id(id_=TMS_ID)
+
+except Exception as e:
+    traceback.print_exc()
+finally:
+    destroy_Pool(pool=pool)
+    print("Process Finished.")
@@ -0,0 +1,109 @@
+import numpy as np
+
+from db_adapter.curw_obs.timeseries.resample_utils import Aggregation, bucket_end_times, _time_buckets, \
+    resample_timeseries_bulk
+
+# Database free checks of the bucket labels and of the LAST reduction of resample_timeseries_bulk.
+# Runs with pytest, or as a script.
+
+
+class _RowsCursor:
+    """Cursor returning fixed rows, in place of the server side cursor of a curw_obs connection"""
+
+    def __init__(self, rows):
+        self.rows = list(rows)
+        self.executed = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+    def execute(self, query, args=None):
+        self.executed.append((query, args))
+        return len(self.rows)
+
+    def fetchmany(self, size):
+        rows, self.rows = self.rows[:size], self.rows[size:]
+        return rows
+
+
+class _RowsConnection:
+
+    def __init__(self, rows):
+        self.cursor_ = _RowsCursor(rows)
+
+    def cursor(self, *args):
+        return self.cursor_
+
+
+def labels(times, step):
+    times = np.array(times, dtype='datetime64[ns]')
+    return [str(t) for t in bucket_end_times(_time_buckets(times, step), step).astype('datetime64[s]')]
+
+
+def test_bucket_labels_at_boundaries():
+
+    assert labels(['2019-08-22T10:00:00', '2019-08-22T10:00:01', '2019-08-22T10:04:59', '2019-08-22T10:05:00',
+                   '2019-08-22T10:05:30'], 5) == \
+        ['2019-08-22T10:00:00', '2019-08-22T10:05:00', '2019-08-22T10:05:00', '2019-08-22T10:05:00',
+         '2019-08-22T10:10:00']
+
+    assert labels(['2019-08-22T10:00:00', '2019-08-22T10:14:00', '2019-08-22T10:15:00', '2019-08-22T10:15:01'],
+            15) == ['2019-08-22T10:00:00', '2019-08-22T10:15:00', '2019-08-22T10:15:00', '2019-08-22T10:30:00']
+
+    # buckets are aligned to multiples of the step, across days
+    assert labels(['2019-08-22T23:30:00', '2019-08-22T23:59:59', '2019-08-23T00:00:00'], 60) == \
+        ['2019-08-23T00:00:00', '2019-08-23T00:00:00', '2019-08-23T00:00:00']
+
+
+def test_bucket_labels_match_former_grouping_on_whole_minutes():
+
+    step = 15
+    times = np.arange(np.datetime64('2019-08-22T00:00'), np.datetime64('2019-08-23T00:00'), np.timedelta64(1, 'm'))
+    minutes = times.astype('datetime64[s]').astype(np.int64) // 60 + 62167219200 // 60
+    former = (np.floor((minutes - 1) / step) + 1) * step  # end minute of FLOOR(((TO_SECONDS(time) / 60) - 1) / N)
+
+    buckets = _time_buckets(times.astype('datetime64[ns]'), step)
+    assert (buckets * step == former).all()
+
+
+def test_last_keeps_the_last_value_of_each_bucket():
+
+    def row(id_, time_, value):
+        return id_, np.datetime64(time_).astype('datetime64[us]').item(), value
+
+    connection = _RowsConnection([
+            row('a', '2019-08-22T10:01:00', 1.0),
+            row('a', '2019-08-22T10:05:00', 2.0),   # last of (10:00, 10:05]
+            row('a', '2019-08-22T10:07:00', 3.0),
+            row('a', '2019-08-22T10:09:00', 4.0),   # last of (10:05, 10:10]
+            row('b', '2019-08-22T10:06:00', 5.0),   # a new id starts a new bucket, even in the same time bucket
+            row('b', '2019-08-22T10:20:00', 6.0),
+            ])
+
+    result = resample_timeseries_bulk(connection, ['a', 'b', 'c'], 5, '2019-08-22 10:00:00',
+            aggregation=Aggregation.LAST)
+
+    times, values = result['a']
+    assert [str(t) for t in times.astype('datetime64[s]')] == ['2019-08-22T10:05:00', '2019-08-22T10:10:00']
+    assert values.tolist() == [2.0, 4.0]
+
+    times, values = result['b']
+    assert [str(t) for t in times.astype('datetime64[s]')] == ['2019-08-22T10:10:00', '2019-08-22T10:20:00']
+    assert values.tolist() == [5.0, 6.0]
+
+    times, values = result['c']
+    assert len(times) == 0 and len(values) == 0
+
+    query, args = connection.cursor_.executed[0]
+    assert "ORDER BY `id`, `time`" in query
+    assert args == ('a', 'b', 'c', '2019-08-22 10:00:00')
+
+
+if __name__ == '__main__':
+    test_bucket_labels_at_boundaries()
+    test_bucket_labels_match_former_grouping_on_whole_minutes()
+    test_last_keeps_the_last_value_of_each_bucket()
+    print("Process Finished.")
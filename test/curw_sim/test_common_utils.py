@@ -0,0 +1,280 @@
+import copy
+from datetime import datetime, timedelta
+
+from db_adapter.curw_sim.common import process_continuous_ts, process_5_min_ts, fill_missing_values, \
+    convert_15_min_ts_to_5_mins_ts, join_ts, append_ts, append_value_for_timestamp, average_timeseries, \
+    summed_timeseries
+
+# Database free check that the list adapters of common_utils give the output of the former list walking
+# implementations (copied below), including edge cases, and of the two bug fixes (fill_missing_values,
+# append_ts). Runs with pytest, or as a script.
+
+START = datetime(2019, 7, 20)
+
+
+def at(minutes):
+    return START + timedelta(minutes=minutes)
+
+
+def generate_timeseries(point_count, timestep, drop_every, offset=0):
+    return [[at(offset + timestep * i), float(i % 100)] for i in range(point_count) if i % drop_every != 0]
+
+
+###################################
+# former list walking implementations
+###################################
+def loop_process_continuous_ts(original_ts, expected_start, filling_value, timestep):
+
+    processed_ts = []
+
+    current_timestamp = expected_start
+    original_ts_index = 0
+
+    while original_ts_index < len(original_ts):
+        if current_timestamp == original_ts[original_ts_index][0]:
+            processed_ts.append(original_ts[original_ts_index])
+            original_ts_index += 1
+            current_timestamp = current_timestamp + timedelta(minutes=timestep)
+        elif current_timestamp < original_ts[original_ts_index][0]:
+            processed_ts.append([current_timestamp, filling_value])
+            current_timestamp = current_timestamp + timedelta(minutes=timestep)
+        else:
+            original_ts_index += 1
+
+    return processed_ts
+
+
+def loop_fill_missing_values(newly_extracted_timeseries, obs_timeseries):
+    """former implementation, with the value assigned (it was compared with ==)"""
+
+    obs_index = 0
+    new_ts_index = 0
+
+    while new_ts_index < len(newly_extracted_timeseries) and obs_index < len(obs_timeseries):
+        if obs_timeseries[obs_index][0] == newly_extracted_timeseries[new_ts_index][0]:
+            if obs_timeseries[obs_index][1] == -99999:
+                obs_timeseries[obs_index][1] = newly_extracted_timeseries[new_ts_index][1]
+            obs_index += 1
+            new_ts_index += 1
+        elif obs_timeseries[obs_index][0] < newly_extracted_timeseries[new_ts_index][0]:
+            obs_index += 1
+        else:
+            new_ts_index += 1
+
+    return obs_timeseries
+
+
+def loop_convert_15_min_ts_to_5_mins_ts(newly_extracted_timeseries, expected_start=None):
+
+    processed_ts = []
+
+    current_timestamp = newly_extracted_timeseries[0][0]
+    if expected_start is not None:
+        current_timestamp = expected_start
+
+    extracted_ts_index = 0
+
+    while extracted_ts_index < len(newly_extracted_timeseries):
+        if current_timestamp > newly_extracted_timeseries[extracted_ts_index][0]:
+            extracted_ts_index += 1
+        elif (newly_extracted_timeseries[extracted_ts_index][0] - current_timestamp) < timedelta(minutes=15):
+            processed_ts.append([current_timestamp, newly_extracted_timeseries[extracted_ts_index][1]/3])
+            current_timestamp = current_timestamp + timedelta(minutes=5)
+        else:
+            processed_ts.append([current_timestamp, -99999])
+            current_timestamp = current_timestamp + timedelta(minutes=5)
+
+    return processed_ts
+
+
+def loop_join_ts(TS1, TS2):
+
+    if TS1[-1][0] > TS2[-1][0]:
+        ts1 = TS1
+        ts2 = TS2
+    else:
+        ts1 = TS2
+        ts2 = TS1
+
+    output_ts = []
+
+    ts1_index = 0
+    ts2_index = 0
+
+    while ts2_index < len(ts2):
+        if ts1[ts1_index][0] == ts2[ts2_index][0]:
+            output_ts.append(ts1[ts1_index])
+            output_ts[-1].append(ts2[ts2_index][1])
+            ts1_index += 1
+            ts2_index += 1
+        elif ts1[ts1_index][0] < ts2[ts2_index][0]:
+            output_ts.append(ts1[ts1_index])
+            ts1_index += 1
+        elif ts1[ts1_index][0] > ts2[ts2_index][0]:
+            output_ts.append(ts2[ts2_index])
+            ts2_index += 1
+
+    output_ts.extend(ts1[ts1_index:])
+
+    return output_ts
+
+
+def loop_append_ts(original_ts, new_ts):
+    """former implementation, with the value appended to the last row (it was appended_ts[original_ts_index])"""
+
+    appended_ts = []
+
+    original_ts_index = 0
+    new_ts_index = 0
+
+    while original_ts_index < len(original_ts):
+
+        if new_ts_index < len(new_ts):
+
+            if original_ts[original_ts_index][0] == new_ts[new_ts_index][0]:
+                appended_ts.append(original_ts[original_ts_index])
+                appended_ts[-1].append(new_ts[new_ts_index][1])
+                original_ts_index += 1
+                new_ts_index += 1
+            elif original_ts[original_ts_index][0] < new_ts[new_ts_index][0]:
+                appended_ts.append(original_ts[original_ts_index])
+                original_ts_index += 1
+            elif original_ts[original_ts_index][0] > new_ts[new_ts_index][0]:
+                appended_ts.append(new_ts[new_ts_index])
+                new_ts_index += 1
+        else:
+            if original_ts_index < len(original_ts):
+                appended_ts.extend(original_ts[original_ts_index:])
+            break
+
+    if new_ts_index < len(new_ts):
+        appended_ts.extend(new_ts[new_ts_index:])
+
+    return appended_ts
+
+
+def loop_summed_timeseries(timeseries):
+
+    return [[row[0], '%.3f' % (sum(row[1:]))] for row in timeseries if len(row) > 1]
+
+
+def loop_average_timeseries(timeseries):
+
+    return [[row[0], '%.3f' % (sum(row[1:]) / (len(row) - 1))] for row in timeseries if len(row) > 1]
+
+
+def same_as_loop(loop_function, adapter, *args):
+    """The former functions modified their inputs, so each gets its own copy"""
+
+    expected = loop_function(*copy.deepcopy(args))
+    inputs = copy.deepcopy(args)
+    result = adapter(*inputs)
+
+    assert [list(row) for row in expected] == result
+    assert list(inputs) == list(args)  # the adapters leave their inputs untouched
+
+
+###########
+# checks  #
+###########
+def test_process_continuous_ts():
+
+    ts_5_min = generate_timeseries(2000, 5, 7)
+
+    same_as_loop(loop_process_continuous_ts, process_continuous_ts, ts_5_min, START, -99999, 5)
+    same_as_loop(loop_process_continuous_ts, process_continuous_ts, ts_5_min, at(-30), 0, 5)  # leading fill
+    same_as_loop(loop_process_continuous_ts, process_continuous_ts, ts_5_min, at(3), -99999, 5)  # off grid start
+    same_as_loop(loop_process_continuous_ts, process_continuous_ts, ts_5_min, START, -99999, 15)  # coarser grid
+    same_as_loop(lambda ts, start: loop_process_continuous_ts(ts, start, -99999, 5), process_5_min_ts,
+            ts_5_min, START)
+
+
+def test_process_continuous_ts_edge_cases():
+
+    # empty input
+    same_as_loop(loop_process_continuous_ts, process_continuous_ts, [], START, -99999, 5)
+    # entries off the grid are dropped
+    off_grid = [[at(0), 1.0], [at(7), 2.0], [at(10), 3.0], [at(12), 4.0], [at(25), 5.0]]
+    same_as_loop(loop_process_continuous_ts, process_continuous_ts, off_grid, START, -99999, 5)
+    # duplicate timestamps keep the first entry
+    duplicates = [[at(0), 1.0], [at(5), 2.0], [at(5), 3.0], [at(10), 4.0], [at(10), 5.0], [at(20), 6.0]]
+    same_as_loop(loop_process_continuous_ts, process_continuous_ts, duplicates, START, -99999, 5)
+    # expected start after the last entry
+    same_as_loop(loop_process_continuous_ts, process_continuous_ts, off_grid, at(60), -99999, 5)
+
+
+def test_fill_missing_values():
+
+    obs_ts = [[at(5 * i), -99999 if i % 3 == 0 else float(i)] for i in range(100)]
+    new_ts = [[at(10 * i), 1000.0 + i] for i in range(40)] + [[at(1000), 1.0]]
+
+    same_as_loop(loop_fill_missing_values, fill_missing_values, new_ts, obs_ts)
+    same_as_loop(loop_fill_missing_values, fill_missing_values, [], obs_ts)
+    same_as_loop(loop_fill_missing_values, fill_missing_values, new_ts, [])
+
+    filled = fill_missing_values([[at(0), 7.0]], [[at(0), -99999], [at(5), -99999]])
+    assert filled == [[at(0), 7.0], [at(5), -99999]]
+
+
+def test_convert_15_min_ts_to_5_mins_ts():
+
+    ts_15_min = generate_timeseries(500, 15, 5)
+
+    same_as_loop(loop_convert_15_min_ts_to_5_mins_ts, convert_15_min_ts_to_5_mins_ts, ts_15_min)
+    same_as_loop(loop_convert_15_min_ts_to_5_mins_ts, convert_15_min_ts_to_5_mins_ts, ts_15_min, at(-20))
+    same_as_loop(loop_convert_15_min_ts_to_5_mins_ts, convert_15_min_ts_to_5_mins_ts, ts_15_min, at(100))
+    same_as_loop(loop_convert_15_min_ts_to_5_mins_ts, convert_15_min_ts_to_5_mins_ts, ts_15_min, at(100000))
+    # the former implementation failed on an empty timeseries
+    assert convert_15_min_ts_to_5_mins_ts([], START) == []
+
+
+def test_join_ts():
+
+    ts_5_min = generate_timeseries(2000, 5, 7)
+    ts_15_min = generate_timeseries(600, 15, 5)
+    off_grid = generate_timeseries(300, 15, 4, offset=2)
+
+    same_as_loop(loop_join_ts, join_ts, ts_5_min, ts_15_min)
+    same_as_loop(loop_join_ts, join_ts, ts_15_min, ts_5_min)
+    same_as_loop(loop_join_ts, join_ts, ts_5_min, off_grid)
+
+
+def test_append_ts():
+
+    ts_5_min = generate_timeseries(200, 5, 7)
+    ts_15_min = generate_timeseries(100, 15, 5, offset=-60)
+
+    same_as_loop(loop_append_ts, append_ts, ts_5_min, ts_15_min)
+    same_as_loop(loop_append_ts, append_ts, ts_15_min, ts_5_min)
+    same_as_loop(loop_append_ts, append_ts, [], ts_5_min)
+    same_as_loop(loop_append_ts, append_ts, ts_5_min, [])
+
+    # a row only in new_ts, before a common timestamp: the value goes to the common row
+    appended = append_ts([[at(5), 1.0], [at(10), 2.0]], [[at(0), 9.0], [at(10), 3.0]])
+    assert appended == [[at(0), 9.0], [at(5), 1.0], [at(10), 2.0, 3.0]]
+
+
+def test_append_value_average_and_sum():
+
+    ts = [[at(5 * i), float(i)] for i in range(50)]
+    appended = ts
+    for factor in (2.0, 0.5):
+        appended = append_value_for_timestamp(appended, [[row[0], row[1] * factor] for row in ts])
+    assert appended[3] == [at(15), 3.0, 6.0, 1.5]
+    assert append_value_for_timestamp(ts, ts[1:]) is ts  # not aligned, unchanged
+
+    ragged = appended + [[at(1000)], [at(1005), 1.0, 2.0]]
+    assert average_timeseries(ragged) == loop_average_timeseries(ragged)
+    assert summed_timeseries(ragged) == loop_summed_timeseries(ragged)
+    assert average_timeseries([]) == [] and summed_timeseries([]) == []
+
+
+if __name__ == '__main__':
+    test_process_continuous_ts()
+    test_process_continuous_ts_edge_cases()
+    test_fill_missing_values()
+    test_convert_15_min_ts_to_5_mins_ts()
+    test_join_ts()
+    test_append_ts()
+    test_append_value_average_and_sum()
+    print("Process Finished.")
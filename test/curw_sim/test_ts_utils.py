@@ -0,0 +1,56 @@
+import random
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from db_adapter.curw_sim.common import fill_ts_missing_entries, fill_ts_missing_entries_batch
+
+# Database free check that fill_ts_missing_entries_batch gives the values of fill_ts_missing_entries called per
+# timeseries. Runs with pytest, or as a script.
+
+START = "2019-08-22 00:00:00"
+END = "2019-08-23 12:00:00"
+TIMESTEP = 15
+
+
+def generate_timeseries_list(count, seed=2):
+
+    random.seed(seed)
+    start = datetime.strptime(START, "%Y-%m-%d %H:%M:%S")
+
+    timeseries_list = []
+    for _ in range(count):
+        timeseries = []
+        for i in range(0, 160, random.choice([1, 2, 3])):
+            if random.random() < 0.6:
+                value = 'x' if random.random() < 0.1 else round(random.random() * 5, 2)  # 'x' coerces to NaN
+                timeseries.append([start + timedelta(minutes=TIMESTEP * i), value])
+        timeseries_list.append(timeseries if len(timeseries) > 0 else [[start, 1.0]])
+
+    return timeseries_list
+
+
+def check_batch_matches_single(interpolation_method):
+
+    timeseries_list = generate_timeseries_list(50)
+    times, values = fill_ts_missing_entries_batch(START, END, timeseries_list, interpolation_method, TIMESTEP)
+
+    assert values.shape == (len(times), len(timeseries_list))
+    for column, timeseries in enumerate(timeseries_list):
+        expected = fill_ts_missing_entries(START, END, timeseries, interpolation_method, TIMESTEP)
+        assert [str(t) for t in times.astype('datetime64[s]').astype(datetime)] == [t[0] for t in expected]
+        assert np.allclose(values[:, column], np.array([t[1] for t in expected], dtype='float64'), equal_nan=True)
+
+
+def test_linear_matches_fill_ts_missing_entries():
+    check_batch_matches_single('linear')
+
+
+def test_pandas_method_matches_fill_ts_missing_entries():
+    check_batch_matches_single('time')
+
+
+if __name__ == '__main__':
+    test_linear_matches_fill_ts_missing_entries()
+    test_pandas_method_matches_fill_ts_missing_entries()
+    print("Process Finished.")
@@ -0,0 +1,149 @@
+from datetime import datetime
+
+from db_adapter.base.delta import ChecksumTracker, changed_rows, insert_timeseries_delta, timeseries_checksum
+
+# Database free checks of the delta writes: value tolerance and NULL handling, the LRU eviction of the checksum
+# tracker, and the normalization of string and datetime times against the existing rows of a stub pool.
+# Runs with pytest, or as a script.
+
+T0 = datetime(2019, 8, 22, 10, 0)
+T1 = datetime(2019, 8, 22, 10, 5)
+T2 = datetime(2019, 8, 22, 10, 10)
+
+
+class _StubCursor:
+    """Answers the existing (time, value) range scan from the stub pool and records the INSERT statements"""
+
+    def __init__(self, pool):
+        self.pool = pool
+        self.rows = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+    def execute(self, query, args=None):
+        if query.startswith("SELECT"):
+            self.pool.selects.append((query, args))
+            self.rows = sorted(self.pool.existing.items())
+            return len(self.rows)
+        self.pool.writes.append((query, args))
+        return len(args) // 3
+
+    def fetchall(self):
+        return self.rows
+
+
+class _StubConnection:
+
+    def __init__(self, pool):
+        self.pool = pool
+
+    def cursor(self, *args):
+        return _StubCursor(self.pool)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class _StubPool:
+
+    def __init__(self, existing):
+        self.existing = existing
+        self.selects = []
+        self.writes = []
+
+    def connection(self):
+        return _StubConnection(self)
+
+
+def test_changed_rows_tolerance():
+
+    existing = {T0: 1.0, T1: 2.0}
+    rows = [('id', T0, 1.0004), ('id', T1, 2.1), ('id', T2, 3.0)]
+
+    assert changed_rows(rows, existing, 1, 2, tolerance=0.001) == [('id', T1, 2.1), ('id', T2, 3.0)]
+    assert changed_rows(rows, existing, 1, 2) == rows
+
+
+def test_changed_rows_null_handling():
+
+    existing = {T0: None, T1: 2.0, T2: None}
+    rows = [('id', T0, None), ('id', T1, None), ('id', T2, 3.0)]
+
+    # NULL to NULL is unchanged, NULL to a value (and back) is a change
+    assert changed_rows(rows, existing, 1, 2) == [('id', T1, None), ('id', T2, 3.0)]
+    # NaN is stored as NULL
+    assert changed_rows([('id', T0, float('nan'))], existing, 1, 2) == []
+
+
+def test_checksum_tracker_evicts_least_recently_used():
+
+    tracker = ChecksumTracker(maxsize=2)
+    tracker.record('a', 'checksum a')
+    tracker.record('b', 'checksum b')
+    assert tracker.is_unchanged('a', 'checksum a')  # 'a' becomes the most recently used
+
+    tracker.record('c', 'checksum c')
+    assert len(tracker) == 2
+    assert not tracker.is_unchanged('b', 'checksum b')  # evicted
+    assert tracker.is_unchanged('a', 'checksum a')
+    assert not tracker.is_unchanged('c', 'other checksum')
+
+    tracker.discard('c')
+    assert len(tracker) == 1
+
+
+def test_checksum_ignores_time_format_and_order():
+
+    assert timeseries_checksum([[T0, 1], [T1, 2.0]]) == \
+        timeseries_checksum([['2019-08-22 10:05:00', 2], ['2019-08-22 10:00:00', 1.0]])
+    assert timeseries_checksum([[T0, 1]]) != timeseries_checksum([[T0, 1.5]])
+
+
+def test_insert_delta_matches_string_times_to_datetime_rows():
+
+    pool = _StubPool({T0: 1.0, T1: 2.0})
+    timeseries = [['2019-08-22 10:00:00', 1.0], ['2019-08-22 10:05:00', 2.5], [T2, 3.0]]
+
+    result = insert_timeseries_delta(pool, timeseries, 'id', key={'fgt': T0})
+    assert result == {'written': 2, 'skipped': 1}
+
+    query, args = pool.selects[0]
+    assert "WHERE `id`=%s AND `fgt`=%s AND `time` BETWEEN %s AND %s" in query
+    assert args == ('id', T0, T0, T2)
+
+    query, args = pool.writes[0]
+    assert query.startswith("INSERT INTO `data` (`id`, `time`, `fgt`, `value`)")
+    assert args == ['id', T1, T0, 2.5, 'id', T2, T0, 3.0]
+
+
+def test_insert_delta_skips_a_tracked_timeseries_in_another_time_format():
+
+    pool = _StubPool({})
+    tracker = ChecksumTracker()
+
+    insert_timeseries_delta(pool, [[T0, 1.0], [T1, 2.0]], 'id', checksum_tracker=tracker)
+    result = insert_timeseries_delta(pool, [['2019-08-22 10:00:00', 1.0], ['2019-08-22 10:05:00', 2.0]], 'id',
+            checksum_tracker=tracker)
+
+    assert result == {'written': 0, 'skipped': 2}
+    assert len(pool.selects) == 1  # the second push did not read the database
+
+
+if __name__ == '__main__':
+    test_changed_rows_tolerance()
+    test_changed_rows_null_handling()
+    test_checksum_tracker_evicts_least_recently_used()
+    test_checksum_ignores_time_format_and_order()
+    test_insert_delta_matches_string_times_to_datetime_rows()
+    test_insert_delta_skips_a_tracked_timeseries_in_another_time_format()
+    print("Process Finished.")
@@ -0,0 +1,60 @@
+from datetime import datetime
+
+import numpy as np
+
+from db_adapter.curw_fcst.timeseries.fgt_index import FgtIndex
+
+# Database free checks of the nearest fgt resolution, on fgts seeded directly into the index.
+# Runs with pytest, or as a script.
+
+FGTS = ['2019-07-20T00:00:00', '2019-07-20T06:00:00', '2019-07-20T12:00:00']
+
+
+def seeded_index():
+    fgt_index = FgtIndex(pool=None)
+    fgt_index._fgts['id'] = np.array(FGTS, dtype='datetime64[ns]')
+    fgt_index._fgts['empty'] = np.array([], dtype='datetime64[ns]')
+    return fgt_index
+
+
+def nearest(expected_fgt, before_only=False, id_='id'):
+    fgt = seeded_index().nearest(id_, expected_fgt, before_only=before_only)
+    return None if fgt is None else str(fgt.astype('datetime64[s]'))
+
+
+def test_nearest_picks_the_closest_fgt():
+
+    assert nearest('2019-07-20 06:00:00') == '2019-07-20T06:00:00'
+    assert nearest('2019-07-20 04:00:00') == '2019-07-20T06:00:00'
+    assert nearest(datetime(2019, 7, 20, 7)) == '2019-07-20T06:00:00'
+
+
+def test_nearest_ties_resolve_to_the_earlier_fgt():
+
+    assert nearest('2019-07-20 03:00:00') == '2019-07-20T00:00:00'
+    assert nearest('2019-07-20 09:00:00') == '2019-07-20T06:00:00'
+
+
+def test_nearest_outside_the_range():
+
+    assert nearest('2019-07-19 20:00:00') == '2019-07-20T00:00:00'
+    assert nearest('2019-07-21 00:00:00') == '2019-07-20T12:00:00'
+    assert nearest('2019-07-20 00:00:00', id_='empty') is None
+
+
+def test_nearest_before_only():
+
+    assert nearest('2019-07-20 05:59:59', before_only=True) == '2019-07-20T00:00:00'
+    assert nearest('2019-07-20 06:00:00', before_only=True) == '2019-07-20T06:00:00'
+    # expected fgt before the first fgt: there is nothing at or before it
+    assert nearest('2019-07-19 23:59:59', before_only=True) is None
+    # expected fgt after the last fgt: the last fgt
+    assert nearest('2019-07-21 00:00:00', before_only=True) == '2019-07-20T12:00:00'
+
+
+if __name__ == '__main__':
+    test_nearest_picks_the_closest_fgt()
+    test_nearest_ties_resolve_to_the_earlier_fgt()
+    test_nearest_outside_the_range()
+    test_nearest_before_only()
+    print("Process Finished.")
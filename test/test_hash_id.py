@@ -0,0 +1,71 @@
+import hashlib
+import json
+
+import pandas as pd
+
+from db_adapter.base.hash_id import generate_hash_id, generate_hash_ids
+
+# Database free checks that the single and batch hash ids match the former json.dumps(sort_keys=True) + sha256
+# scheme, for dicts, DataFrames (int and float values in one column) and process pool chunks.
+# Runs with pytest, or as a script.
+
+HASH_KEYS = ('latitude', 'longitude', 'station_type', 'variable', 'unit', 'unit_type')
+
+RECORDS = [
+        {'latitude': 7, 'longitude': 79.9, 'station_type': 'CUrW_WeatherStation', 'variable': 'Precipitation',
+         'unit': 'mm', 'unit_type': 'Accumulative', 'description': 'not hashed'},
+        {'latitude': 6.8973, 'longitude': 80, 'station_type': 'CUrW_WaterLevelGauge', 'variable': 'Waterlevel',
+         'unit': 'm', 'unit_type': 'Instantaneous', 'description': 'not hashed'},
+        {'latitude': 7.5, 'longitude': 81.25, 'station_type': 'CUrW_WeatherStation', 'variable': 'Temperature',
+         'unit': 'oC', 'unit_type': 'Instantaneous', 'description': 'not hashed'},
+        ]
+
+
+def baseline_hash_id(meta_data):
+    hash_data = {key: meta_data[key] for key in HASH_KEYS}
+    return hashlib.sha256(json.dumps(hash_data, sort_keys=True).encode("ascii")).hexdigest()
+
+
+def test_single_record_matches_baseline():
+
+    for meta_data in RECORDS:
+        assert generate_hash_id(meta_data, HASH_KEYS) == baseline_hash_id(meta_data)
+
+
+def test_dict_records_match_baseline():
+
+    assert generate_hash_ids(RECORDS, HASH_KEYS) == [baseline_hash_id(meta_data) for meta_data in RECORDS]
+
+
+def test_dataframe_with_ints_in_float_columns_matches_baseline():
+
+    frame = pd.DataFrame(RECORDS)
+    assert frame['latitude'].dtype.kind == 'f' and frame['longitude'].dtype.kind == 'f'
+
+    assert generate_hash_ids(frame, HASH_KEYS) == [baseline_hash_id(meta_data) for meta_data in RECORDS]
+
+
+def test_dataframe_object_column_keeps_integral_floats():
+
+    records = [dict(meta_data, latitude=7.0) for meta_data in RECORDS]
+    frame = pd.DataFrame(records).astype({'latitude': object})
+
+    assert generate_hash_ids(frame, HASH_KEYS) == [baseline_hash_id(meta_data) for meta_data in records]
+
+
+def test_process_pool_matches_baseline():
+
+    records = [dict(meta_data, latitude=meta_data['latitude'] + i) for i in range(50) for meta_data in RECORDS]
+    expected = [baseline_hash_id(meta_data) for meta_data in records]
+
+    assert generate_hash_ids(records, HASH_KEYS, processes=2, chunk_size=7) == expected
+    assert generate_hash_ids(pd.DataFrame(records), HASH_KEYS, processes=2, chunk_size=7) == expected
+
+
+if __name__ == '__main__':
+    test_single_record_matches_baseline()
+    test_dict_records_match_baseline()
+    test_dataframe_with_ints_in_float_columns_matches_baseline()
+    test_dataframe_object_column_keeps_integral_floats()
+    test_process_pool_matches_baseline()
+    print("Process Finished.")
@@ -0,0 +1,138 @@
+import hashlib
+
+from db_adapter.base.run_id_index import BloomFilter, RunIdIndex
+
+# Database free checks of the bloom filter and of the run id index, in both keep_ids modes, on a stub pool
+# standing in for the run table. Runs with pytest, or as a script.
+
+
+def make_id(i):
+    return hashlib.sha256(str(i).encode("ascii")).hexdigest()
+
+
+class _StubCursor:
+    """Serves `SELECT id FROM run` (streamed) and `SELECT 1 ... WHERE id=%s` from the ids of the stub pool"""
+
+    def __init__(self, pool):
+        self.pool = pool
+        self.rows = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+    def execute(self, query, args=None):
+        if "WHERE `id`=%s" in query:
+            self.pool.point_queries.append(args)
+            self.rows = [(1,)] if args in self.pool.ids else []
+        else:
+            self.rows = [(id_,) for id_ in sorted(self.pool.ids)]
+        return len(self.rows)
+
+    def fetchmany(self, size):
+        rows, self.rows = self.rows[:size], self.rows[size:]
+        return rows
+
+
+class _StubConnection:
+
+    def __init__(self, pool):
+        self.pool = pool
+
+    def cursor(self, *args):
+        return _StubCursor(self.pool)
+
+    def close(self):
+        pass
+
+
+class _StubPool:
+
+    def __init__(self, ids):
+        self.ids = set(ids)
+        self.point_queries = []
+
+    def connection(self):
+        return _StubConnection(self)
+
+
+def test_bloom_filter_has_no_false_negatives():
+
+    bloom = BloomFilter(capacity=5000, error_rate=0.01)
+    keys = [make_id(i) for i in range(5000)]
+    for key in keys:
+        bloom.add(key)
+
+    assert all(key in bloom for key in keys)
+
+    # the false positive rate stays in the order of error_rate at capacity
+    false_positives = sum(make_id(i) in bloom for i in range(5000, 15000))
+    assert false_positives < 10000 * 0.01 * 3
+
+
+def test_exact_index_add_discard_len():
+
+    pool = _StubPool(make_id(i) for i in range(100))
+    index = RunIdIndex(pool, keep_ids=True)
+
+    assert index.contains_local(make_id(1)) is None  # not loaded yet
+    assert make_id(1) in index  # loads on first lookup
+    assert len(index) == 100
+
+    new_id = make_id(100)
+    assert not index.contains(new_id)
+    index.add(new_id)
+    index.add(new_id)
+    assert index.contains(new_id)
+    assert len(index) == 101
+
+    index.discard(make_id(0))
+    index.discard(make_id(0))
+    assert not index.contains(make_id(0))
+    assert len(index) == 100
+
+    assert pool.point_queries == []  # the exact set never needs the database
+
+
+def test_bloom_index_add_discard_len():
+
+    pool = _StubPool(make_id(i) for i in range(100))
+    index = RunIdIndex(pool, keep_ids=False).load()
+    assert len(index) == 100
+
+    # loaded ids are confirmed against the database, unknown ids are mostly answered locally
+    assert all(index.contains(make_id(i)) for i in range(100))
+    assert len(pool.point_queries) == 100
+    assert index.contains_local(make_id(1)) is None
+
+    new_id = make_id(100)
+    pool.ids.add(new_id)
+    index.add(new_id)
+    index.add(new_id)  # already in the filter, not counted twice
+    assert index.contains(new_id)
+    assert len(index) == 101
+
+    # the filter keeps a discarded id, the database answers for it
+    pool.ids.discard(make_id(0))
+    index.discard(make_id(0))
+    assert len(index) == 100
+    assert not index.contains(make_id(0))
+
+
+def test_add_before_load_is_ignored():
+
+    for keep_ids in (True, False):
+        index = RunIdIndex(_StubPool([]), keep_ids=keep_ids)
+        index.add(make_id(1))
+        index.discard(make_id(1))
+        assert len(index) == 0
+
+
+if __name__ == '__main__':
+    test_bloom_filter_has_no_false_negatives()
+    test_exact_index_add_discard_len()
+    test_bloom_index_add_discard_len()
+    test_add_before_load_is_ignored()
+    print("Process Finished.")
@@ -0,0 +1,99 @@
+from datetime import datetime
+
+from db_adapter.base.watermarks import reduce_watermarks, update_watermarks
+
+# Database free checks of the watermark reduction and of the batched UNION ALL updates, on a recording cursor.
+# Runs with pytest, or as a script.
+
+
+class _RecordingCursor:
+
+    def __init__(self):
+        self.executed = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+    def execute(self, query, args=None):
+        self.executed.append((query, args))
+        return len(args) // 2
+
+
+class _RecordingConnection:
+
+    def __init__(self):
+        self.cursor_ = _RecordingCursor()
+
+    def cursor(self, *args):
+        return self.cursor_
+
+
+UPDATES = [('a', '2019-08-22 10:00:00'), ('b', datetime(2019, 8, 22, 9, 0)), ('a', datetime(2019, 8, 22, 12, 0)),
+           ('a', '2019-08-22 08:00:00'), ('b', None), ('c', None)]
+
+
+def test_reduce_keeps_the_latest_end_date():
+
+    assert reduce_watermarks(UPDATES, later=True) == \
+        {'a': datetime(2019, 8, 22, 12, 0), 'b': datetime(2019, 8, 22, 9, 0)}
+
+
+def test_reduce_keeps_the_earliest_start_date():
+
+    assert reduce_watermarks(UPDATES, later=False) == \
+        {'a': datetime(2019, 8, 22, 8, 0), 'b': datetime(2019, 8, 22, 9, 0)}
+
+
+def test_update_sends_one_union_all_statement_per_chunk():
+
+    connection = _RecordingConnection()
+    updates = [("id{}".format(i), datetime(2019, 8, 22, i % 24)) for i in range(5)] + \
+              [("id0", datetime(2019, 8, 23))]
+
+    row_count = update_watermarks(connection, 'run', 'end_date', updates, later=True, chunk_size=2)
+
+    executed = connection.cursor_.executed
+    assert len(executed) == 3  # 5 distinct ids in chunks of 2
+    assert row_count == 5
+
+    query, args = executed[0]
+    assert query.startswith("UPDATE `run` INNER JOIN (SELECT %s AS `id`, CAST(%s AS DATETIME) AS `date` "
+                            "UNION ALL SELECT %s, CAST(%s AS DATETIME)) AS `watermark`")
+    assert "SET `run`.`end_date`=GREATEST(COALESCE(`run`.`end_date`, `watermark`.`date`), `watermark`.`date`)" \
+        in query
+    assert args == ['id0', datetime(2019, 8, 23), 'id1', datetime(2019, 8, 22, 1)]
+
+    query, args = executed[2]
+    assert "UNION ALL" not in query
+    assert args == ['id4', datetime(2019, 8, 22, 4)]
+
+
+def test_update_start_date_uses_least():
+
+    connection = _RecordingConnection()
+    update_watermarks(connection, 'run', 'start_date', UPDATES, later=False)
+
+    executed = connection.cursor_.executed
+    assert len(executed) == 1
+    query, args = executed[0]
+    assert "SET `run`.`start_date`=LEAST(" in query
+    assert args == ['a', datetime(2019, 8, 22, 8, 0), 'b', datetime(2019, 8, 22, 9, 0)]
+
+
+def test_update_without_dates_sends_nothing():
+
+    connection = _RecordingConnection()
+    assert update_watermarks(connection, 'run', 'end_date', [('a', None)]) == 0
+    assert connection.cursor_.executed == []
+
+
+if __name__ == '__main__':
+    test_reduce_keeps_the_latest_end_date()
+    test_reduce_keeps_the_earliest_start_date()
+    test_update_sends_one_union_all_statement_per_chunk()
+    test_update_start_date_uses_least()
+    test_update_without_dates_sends_nothing()
+    print("Process Finished.")
@@ -0,0 +1,96 @@
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from db_adapter.curw_sim.common import process_continuous_ts, join_ts
+from db_adapter.curw_sim.common.vector_ts_utils import to_datetime64_array, process_continuous, join
+
+# Compare the former list walking implementations of process_continuous_ts and join_ts with the list adapters
+# (common_utils) and the array functions (vector_ts_utils) they now delegate to. No database is needed.
+# The outputs are compared in test/curw_sim/test_common_utils.py.
+
+POINT_COUNTS = [10000, 100000, 1000000]
+
+START = datetime(2019, 7, 20)
+
+
+def generate_timeseries(point_count, timestep, drop_every):
+    return [[START + timedelta(minutes=timestep * i), float(i % 100)] for i in range(point_count)
+            if i % drop_every != 0]
+
+
+def loop_process_continuous_ts(original_ts, expected_start, filling_value, timestep):
+
+    processed_ts = []
+
+    current_timestamp = expected_start
+    original_ts_index = 0
+
+    while original_ts_index < len(original_ts):
+        if current_timestamp == original_ts[original_ts_index][0]:
+            processed_ts.append(original_ts[original_ts_index])
+            original_ts_index += 1
+            current_timestamp = current_timestamp + timedelta(minutes=timestep)
+        elif current_timestamp < original_ts[original_ts_index][0]:
+            processed_ts.append([current_timestamp, filling_value])
+            current_timestamp = current_timestamp + timedelta(minutes=timestep)
+        else:
+            original_ts_index += 1
+
+    return processed_ts
+
+
+def loop_join_ts(ts1, ts2):
+    """ts1 must have the larger last timestamp"""
+
+    output_ts = []
+
+    ts1_index = 0
+    ts2_index = 0
+
+    while ts2_index < len(ts2):
+        if ts1[ts1_index][0] == ts2[ts2_index][0]:
+            output_ts.append(list(ts1[ts1_index]))
+            output_ts[-1].append(ts2[ts2_index][1])
+            ts1_index += 1
+            ts2_index += 1
+        elif ts1[ts1_index][0] < ts2[ts2_index][0]:
+            output_ts.append(ts1[ts1_index])
+            ts1_index += 1
+        else:
+            output_ts.append(ts2[ts2_index])
+            ts2_index += 1
+
+    output_ts.extend(ts1[ts1_index:])
+
+    return output_ts
+
+
+def timed(label, point_count, function):
+    start = time.perf_counter()
+    result = function()
+    elapsed = time.perf_counter() - start
+    print("{:<36} {:>8} points {:>8.3f}s".format(label, point_count, elapsed))
+    return result
+
+
+for point_count in POINT_COUNTS:
+    ts_5_min = generate_timeseries(point_count, 5, 7)
+    ts_15_min = generate_timeseries(point_count // 3, 15, 5)
+
+    times_5_min = to_datetime64_array([t[0] for t in ts_5_min])
+    values_5_min = np.array([t[1] for t in ts_5_min])
+    times_15_min = to_datetime64_array([t[0] for t in ts_15_min])
+    values_15_min = np.array([t[1] for t in ts_15_min])
+
+    timed("loop process_continuous_ts", point_count, lambda: loop_process_continuous_ts(ts_5_min, START, -99999, 5))
+    timed("list process_continuous_ts", point_count, lambda: process_continuous_ts(ts_5_min, START, -99999, 5))
+    timed("array process_continuous", point_count,
+            lambda: process_continuous(times_5_min, values_5_min, START, -99999, 5))
+
+    timed("loop join_ts", point_count, lambda: loop_join_ts(ts_5_min, ts_15_min))
+    timed("list join_ts", point_count, lambda: join_ts(ts_5_min, ts_15_min))
+    timed("array join", point_count, lambda: join(times_5_min, values_5_min, times_15_min, values_15_min))
+
+print("Process Finished.")